@@ -0,0 +1,81 @@
+"""Copying menus row by row against the set-based clone_menus.
+
+Copies ``menus`` menus of ``foods`` foods each, first with one INSERT per
+food as menu.copy used to, then with clone_menus, one menu per transaction
+and all of them in one.
+
+Run from the repository root::
+
+    python benchmarks/bench_clone.py [menus] [foods]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lsg_web import create_app  # noqa: E402
+from lsg_web.db import close_pool, get_db, init_db  # noqa: E402
+from lsg_web.menu import clone_menus  # noqa: E402
+
+
+def row_by_row(db, ids):
+    for id in ids:
+        menu = db.execute('SELECT * FROM menu WHERE id_menu = ?', (id,)).fetchone()
+        db.execute(
+            'INSERT INTO menu (name, information, actif, id_person) VALUES (?, ?, ?, ?)',
+            (menu['name'] + '_copy', menu['information'], 1, 1)
+        )
+        id_copy = db.execute('SELECT last_insert_rowid();').fetchone()[0]
+        for e in db.execute('SELECT * FROM composed WHERE id_menu = ?', (id,)).fetchall():
+            db.execute('INSERT INTO composed(id_menu, id_food, quantity) VALUES (?, ?, ?)',
+                       (id_copy, e['id_food'], e['quantity']))
+        db.commit()
+
+
+def one_by_one(db, ids):
+    for id in ids:
+        clone_menus(db, [id], 1)
+        db.commit()
+
+
+def batch(db, ids):
+    clone_menus(db, ids, 1)
+    db.commit()
+
+
+def main():
+    menus = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    foods = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    db_fd, db_path = tempfile.mkstemp()
+    app = create_app({'TESTING': True, 'DATABASE': db_path})
+    try:
+        with app.app_context():
+            init_db()
+            db = get_db()
+            db.execute('INSERT INTO person (name, birthdate, gender, weight, actif) VALUES ("a", "2000-01-01", 1, 1, 1)')
+            db.executemany('INSERT INTO food (name, id_category, information, id_person) VALUES (?, 1, "x", 1)',
+                           [('food {0}'.format(i),) for i in range(foods)])
+            db.executemany('INSERT INTO menu (name, information, actif, id_person) VALUES (?, "x", 1, 1)',
+                           [('menu {0}'.format(i),) for i in range(menus)])
+            db.executemany('INSERT INTO composed (id_menu, id_food, quantity) VALUES (?, ?, 100)',
+                           [(menu, food) for menu in range(1, menus + 1) for food in range(1, foods + 1)])
+            db.commit()
+            ids = list(range(1, menus + 1))
+
+            print('{0} menus of {1} foods'.format(menus, foods))
+            for label, method in (('row by row', row_by_row), ('clone_menus, one by one', one_by_one),
+                                  ('clone_menus, batch', batch)):
+                start = time.perf_counter()
+                method(db, ids)
+                elapsed = time.perf_counter() - start
+                print('{0:<25} {1:8.1f} ms {2:10.0f} rows/s'.format(label, elapsed * 1000, menus * foods / elapsed))
+    finally:
+        close_pool(app)
+        os.close(db_fd)
+        os.unlink(db_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Requests per second with pooled connections against connect-per-request.
+
+Run from the repository root::
+
+    python benchmarks/bench_db_pool.py [requests] [threads]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lsg_web import create_app  # noqa: E402
+from lsg_web.db import close_pool, init_db  # noqa: E402
+
+
+def run(pool_size, requests, threads):
+    db_fd, db_path = tempfile.mkstemp()
+    app = create_app({'TESTING': True, 'DATABASE': db_path, 'DATABASE_POOL_SIZE': pool_size})
+    with app.app_context():
+        init_db()
+
+    def worker(count):
+        client = app.test_client()
+        client.post('/auth/login', data={'mail': 'admin@admin.be', 'password': 'admin'})
+        for _ in range(count):
+            client.get('/')
+
+    pool = [threading.Thread(target=worker, args=(requests // threads,)) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    close_pool(app)
+    os.close(db_fd)
+    os.unlink(db_path)
+    return (requests // threads) * threads / elapsed
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    for label, size in (('connect per request', 0), ('pooled', 8)):
+        print('{0:<20} {1:8.1f} req/s'.format(label, run(size, requests, threads)))
+
+
+if __name__ == '__main__':
+    main()
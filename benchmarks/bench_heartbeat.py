@@ -0,0 +1,87 @@
+"""Sustained /tray/connect throughput, one write per heartbeat against coalesced writes.
+
+Each worker is a separate process with its own app, like a pre-forking server.
+
+Run from the repository root::
+
+    python benchmarks/bench_heartbeat.py [trays] [workers] [seconds]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lsg_web import create_app  # noqa: E402
+from lsg_web.db import close_pool, get_db, init_db  # noqa: E402
+from lsg_web.heartbeat import get_heartbeats  # noqa: E402
+
+
+def make_app(db_path, interval):
+    app = create_app({'DATABASE': db_path, 'TRAY_HEARTBEAT_INTERVAL': interval})
+    app.logger.disabled = True
+    return app
+
+
+def worker(db_path, interval, trays, offset, workers, seconds, results):
+    app = make_app(db_path, interval)
+    client = app.test_client()
+    ok = failed = 0
+    i = offset
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        response = client.post('/tray/connect', data={'name': 'tray-{0}'.format(i % trays), 'ip': '10.0.0.1'})
+        if response.status_code == 200:
+            ok += 1
+        else:
+            failed += 1
+        i += workers
+    with app.app_context():
+        get_heartbeats().stop()
+    results.put((ok, failed))
+
+
+def run(interval, trays, workers, seconds):
+    db_fd, db_path = tempfile.mkstemp()
+    app = make_app(db_path, interval)
+    with app.app_context():
+        init_db()
+        db = get_db()
+        db.executemany(
+            'INSERT INTO tray (name, id_version, information, ip, online, actif, on_use, timestamp)'
+            ' VALUES (?, 1, "", "None", 0, 1, 0, datetime("now"))',
+            [('tray-{0}'.format(i),) for i in range(trays)]
+        )
+        db.commit()
+
+    close_pool(app)
+
+    results = multiprocessing.Queue()
+    pool = [multiprocessing.Process(target=worker, args=(db_path, interval, trays, i, workers, seconds, results))
+            for i in range(workers)]
+    for p in pool:
+        p.start()
+    totals = [results.get() for _ in pool]
+    for p in pool:
+        p.join()
+
+    os.close(db_fd)
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(db_path + suffix):
+            os.unlink(db_path + suffix)
+    return sum(ok for ok, _ in totals) / seconds, sum(failed for _, failed in totals)
+
+
+def main():
+    trays = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 5
+    for label, interval in (('write per heartbeat', 0), ('coalesced (1s)', 1)):
+        rate, failed = run(interval, trays, workers, seconds)
+        print('{0:<20} {1:8.1f} heartbeats/s {2:6d} failed'.format(label, rate, failed))
+
+
+if __name__ == '__main__':
+    main()
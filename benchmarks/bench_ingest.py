@@ -0,0 +1,136 @@
+"""Tray telemetry throughput, HTTP requests against the MQTT ingest worker.
+
+The same traffic, heartbeats and measurement batches of a fleet of trays, is
+replayed through /tray/connect and /tray/data, then published on a local
+stand-in broker read by the ingest worker.
+
+Run from the repository root::
+
+    python benchmarks/bench_ingest.py [trays] [messages per tray] [rows per batch]
+"""
+import io
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tests'))
+
+from broker import Broker  # noqa: E402
+from lsg_web import create_app  # noqa: E402
+from lsg_web.db import close_pool, get_db, init_db  # noqa: E402
+from lsg_web.ingest import TelemetryIngestor  # noqa: E402
+from lsg_web.outbox import create_client  # noqa: E402
+
+
+def record(trays, messages, rows):
+    """Return the traffic as (tray, kind, value) in arrival order."""
+    traffic = []
+    for i in range(messages):
+        for tray in range(trays):
+            name = 'Tray-{0}'.format(tray)
+            if i % 2:
+                batch = ''.join('{0},{1:.1f}\n'.format(i * rows + r, 500 - r * 0.1) for r in range(rows))
+                traffic.append((name, 'DATA', ('{0}.csv'.format(tray), batch)))
+            else:
+                traffic.append((name, 'HEARTBEAT', '10.0.0.{0}'.format(tray % 250)))
+    return traffic
+
+
+def make_app(db_path, folder, port=1883):
+    app = create_app({
+        'DATABASE': db_path,
+        'DATA_UPLOADS': folder,
+        'TRAY_HEARTBEAT_INTERVAL': 1,
+        'MQTT_PUBLISHER_ENABLED': False,
+        'MQTT_BROKER_URL': '127.0.0.1',
+        'MQTT_BROKER_PORT': port,
+    })
+    app.logger.disabled = True
+    return app
+
+
+def over_http(app, traffic):
+    client = app.test_client()
+    start = time.perf_counter()
+    for name, kind, value in traffic:
+        if kind == 'HEARTBEAT':
+            client.post('/tray/connect', data={'name': name, 'ip': value})
+        else:
+            filename, batch = value
+            client.post('/tray/data', data={
+                'data': (io.BytesIO(batch.encode('utf8')), filename),
+                'image': (io.BytesIO(b'\xff\xd8'), filename.replace('.csv', '.jpg')),
+            })
+    return time.perf_counter() - start
+
+
+def over_mqtt(app, traffic):
+    broker = Broker()
+    app.config['MQTT_BROKER_PORT'] = broker.port
+    ingestor = TelemetryIngestor(app, 0.25)
+
+    def serve():
+        with app.app_context():
+            ingestor.run(create_client(app.config))
+
+    thread = threading.Thread(target=serve)
+    thread.start()
+    broker.wait_for_subscribers()
+
+    start = time.perf_counter()
+    for name, kind, value in traffic:
+        if kind == 'HEARTBEAT':
+            payload = '{0}\tHEARTBEAT\t{1}'.format(name, value)
+        else:
+            payload = '{0}\tDATA\t{1}\n{2}'.format(name, value[0], value[1])
+        broker.publish('lsg/' + name.lower(), payload)
+    while ingestor.received + ingestor.rejected < len(traffic):
+        time.sleep(0.01)
+    ingestor.stop()
+    thread.join()
+    elapsed = time.perf_counter() - start
+    broker.close()
+    return elapsed
+
+
+def run(method, traffic, trays):
+    db_fd, db_path = tempfile.mkstemp()
+    folder = tempfile.mkdtemp()
+    app = make_app(db_path, folder)
+    with app.app_context():
+        init_db()
+        db = get_db()
+        db.executemany(
+            'INSERT INTO tray (name, id_version, information, ip, online, actif, on_use, timestamp)'
+            ' VALUES (?, 1, "", "None", 0, 1, 0, datetime("now"))',
+            [('Tray-{0}'.format(i),) for i in range(trays)]
+        )
+        db.commit()
+
+    elapsed = method(app, traffic)
+
+    close_pool(app)
+    os.close(db_fd)
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(db_path + suffix):
+            os.unlink(db_path + suffix)
+    shutil.rmtree(folder)
+    return len(traffic) / elapsed
+
+
+def main():
+    trays = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    messages = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    rows = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+    traffic = record(trays, messages, rows)
+    for label, method in (('HTTP requests', over_http), ('MQTT ingest', over_mqtt)):
+        rate = run(method, traffic, trays)
+        print('{0:<15} {1:8.1f} messages/s'.format(label, rate))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Typeahead lookups against the full lists the forms used to render.
+
+Fills ``persons`` persons and as many foods with random names, then times
+the query of the whole person list of the meal forms and the lookups of a
+few texts, short ones read from the index of the names, the others from the
+trigram index.
+
+Run from the repository root::
+
+    python benchmarks/bench_lookup.py [persons]
+"""
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lsg_web import create_app  # noqa: E402
+from lsg_web.db import close_pool, get_db, init_db  # noqa: E402
+from lsg_web.lookup import lookup  # noqa: E402
+
+TEXTS = ('e', 'er', 'ere', 'eren', 'xyzzy')
+REPEAT = 200
+
+
+def name(random):
+    return '{0} {1}'.format(
+        ''.join(random.choice(string.ascii_lowercase) for _ in range(random.randint(3, 9))).capitalize(),
+        ''.join(random.choice(string.ascii_lowercase) for _ in range(random.randint(4, 12))).capitalize()
+    )
+
+
+def timed(method):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        result = method()
+    return (time.perf_counter() - start) / REPEAT * 1000, len(result)
+
+
+def main():
+    persons = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    generator = random.Random(0)
+    db_fd, db_path = tempfile.mkstemp()
+    app = create_app({'TESTING': True, 'DATABASE': db_path})
+    try:
+        with app.app_context():
+            init_db()
+            db = get_db()
+            db.executemany('INSERT INTO person (name, birthdate, gender, weight, actif) VALUES (?, "2000-01-01", 1, 1, 1)',
+                           [(name(generator),) for _ in range(persons)])
+            db.executemany('INSERT INTO food (name, id_category, information, id_person) VALUES (?, 1, "x", 1)',
+                           [(name(generator),) for _ in range(persons)])
+            db.commit()
+
+            print('{0} persons and foods'.format(persons))
+            elapsed, rows = timed(lambda: db.execute('SELECT * FROM person ORDER BY id_person ASC').fetchall())
+            print('{0:<25} {1:8.3f} ms {2:6d} rows'.format('whole person list', elapsed, rows))
+            for kind in ('person', 'food'):
+                for text in TEXTS:
+                    elapsed, rows = timed(lambda: lookup(db, kind, text, 10))
+                    print('{0:<25} {1:8.3f} ms {2:6d} rows'.format('{0} {1!r}'.format(kind, text), elapsed, rows))
+    finally:
+        close_pool(app)
+        os.close(db_fd)
+        os.unlink(db_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Reading a meal recording from the raw CSV against the columnar series file.
+
+Compares the time and the peak Python memory to get the columns of a meal:
+with the csv module, with the one-pass parser of lsg_web.series, and by
+mapping the .series file.
+
+Run from the repository root::
+
+    python benchmarks/bench_series.py [rows] [sensors]
+"""
+import csv
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lsg_web.series import build_series, load_series, parse_csv  # noqa: E402
+
+
+def record(path, rows, sensors):
+    weights = [random.uniform(300, 800) for _ in range(sensors)]
+    with open(path, 'w') as f:
+        f.write(','.join(['time'] + ['sensor{0}'.format(i) for i in range(1, sensors + 1)]) + '\n')
+        for row in range(rows):
+            weights = [max(w - random.random() * 0.05, 0) for w in weights]
+            f.write('{0:.2f},'.format(row * 0.1) + ','.join('{0:.1f}'.format(w) for w in weights) + '\n')
+
+
+def with_csv_module(folder):
+    with open(os.path.join(folder, '1.csv'), newline='') as f:
+        reader = csv.reader(f)
+        names = next(reader)
+        columns = [[] for _ in names]
+        for row in reader:
+            for column, value in zip(columns, row):
+                column.append(float(value))
+    return sum(columns[1])
+
+
+def with_parse_csv(folder):
+    with open(os.path.join(folder, '1.csv'), 'rb') as f:
+        names, columns = parse_csv(f.read())
+    return sum(columns[1])
+
+
+def with_series(folder):
+    with load_series(folder, 1) as series:
+        return sum(series.weights['sensor1'])
+
+
+def with_series_first_value(folder):
+    with load_series(folder, 1) as series:
+        return series.weights['sensor1'][0]
+
+
+def measure(method, folder):
+    start = time.perf_counter()
+    method(folder)
+    elapsed = time.perf_counter() - start
+    # tracing slows the allocations down, so the peak is measured on a second run
+    tracemalloc.start()
+    method(folder)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    sensors = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    folder = tempfile.mkdtemp()
+    try:
+        record(os.path.join(folder, '1.csv'), rows, sensors)
+        start = time.perf_counter()
+        build_series(folder, 1)
+        print('conversion {0:.3f}s, csv {1:.1f} MiB, series {2:.1f} MiB'.format(
+            time.perf_counter() - start,
+            os.path.getsize(os.path.join(folder, '1.csv')) / 2 ** 20,
+            os.path.getsize(os.path.join(folder, '1.series')) / 2 ** 20,
+        ))
+        for label, method in (('csv module', with_csv_module), ('parse_csv', with_parse_csv),
+                              ('series, sum', with_series), ('series, one value', with_series_first_value)):
+            elapsed, peak = measure(method, folder)
+            print('{0:<18} {1:8.4f}s {2:8.1f} MiB peak'.format(label, elapsed, peak / 2 ** 20))
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    main()
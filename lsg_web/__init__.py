@@ -16,6 +16,24 @@ def create_app(test_config=None):
     app.config["ALLOWED_IMAGE_EXTENSIONS"] = ["JPEG", "JPG", "PNG", "GIF"]
     app.config["IMAGE_UPLOADS"] = app.instance_path + "/../lsg_web/static/img/uploads"
     app.config["DATA_UPLOADS"] = app.instance_path + "/../lsg_web/static/data"
+    # uploads are streamed to disk, each file up to this size
+    app.config["UPLOAD_MAX_FILE_SIZE"] = 64 * 1024 * 1024
+    # uploaded meal CSVs are stored gzip compressed
+    app.config["DATA_COMPRESSION_LEVEL"] = 6
+    # downsampled meal charts, pyramids are kept for SERIES_CACHE_SIZE meals per worker
+    app.config['SERIES_MAX_POINTS'] = 2000
+    app.config['SERIES_CACHE_SIZE'] = 16
+    app.config['SERIES_CACHE_TTL'] = 3600
+    # rows of the list pages sent at once, DataTables asks for more page by page
+    app.config['LISTING_PAGE_SIZE'] = 25
+    app.config['LISTING_MAX_PAGE_SIZE'] = 100
+    # full-text search returns at most SEARCH_MAX_HITS hits
+    app.config['SEARCH_MAX_HITS'] = 50
+    # rendered pages kept per worker process, until a table they read is written
+    app.config['PAGE_CACHE_SIZE'] = 256
+    app.config['PAGE_CACHE_TTL'] = 3600
+    # typeahead lookups of the forms return at most LOOKUP_MAX_HITS names
+    app.config['LOOKUP_MAX_HITS'] = 25
     app.config['TEMPLATES_AUTO_RELOAD'] = True
     app.config['MQTT_BROKER_URL'] = 'localhost'
     app.config['MQTT_BROKER_PORT'] = 1883
@@ -23,6 +41,34 @@ def create_app(test_config=None):
     app.config['MQTT_PASSWORD'] = ''
     app.config['MQTT_KEEPALIVE'] = 5
     app.config['MQTT_TLS_ENABLED'] = False
+    # START/END MEAL commands go through the outbox table, unacknowledged ones are retried
+    app.config['MQTT_PUBLISHER_ENABLED'] = True
+    app.config['MQTT_QOS'] = 1
+    app.config['MQTT_ACK_TIMEOUT'] = 5
+    app.config['MQTT_RETRY_INTERVAL'] = 2
+    app.config['MQTT_OUTBOX_BATCH'] = 100
+    # seconds between two batched writes of `flask lsg ingest`
+    app.config['MQTT_INGEST_INTERVAL'] = 1
+    # connections kept per worker process, 0 opens one connection per request
+    app.config['DATABASE_POOL_SIZE'] = 8
+    app.config['DATABASE_BUSY_TIMEOUT'] = 5000
+    app.config['DATABASE_MMAP_SIZE'] = 64 * 1024 * 1024
+    app.config['DATABASE_CACHE_SIZE'] = -16000
+    # record the SQL of each request, shown in the page when SQL_DEBUG_PANEL is set
+    app.config['SQL_INSTRUMENTATION'] = True
+    app.config['SQL_DEBUG_PANEL'] = False
+    app.config['IDENTITY_CACHE_SIZE'] = 1024
+    app.config['IDENTITY_CACHE_TTL'] = 60
+    # seconds between two batched writes of the tray heartbeats, 0 writes each one
+    app.config['TRAY_HEARTBEAT_INTERVAL'] = 2
+    # seconds a known tray name is trusted before checking the tray table for renames
+    app.config['TRAY_NAMES_TTL'] = 10
+    # a tray is online for TRAY_PRESENCE_TTL seconds after its last heartbeat
+    app.config['TRAY_PRESENCE_TTL'] = 30
+    # live feed: seconds between two polls of the worker, 0 polls only on demand
+    app.config['EVENTS_POLL_INTERVAL'] = 1
+    app.config['EVENTS_KEEPALIVE'] = 15
+    app.config['EVENTS_QUEUE_SIZE'] = 100
 
     if test_config is None:
         # load the instance config, if it exists, when not testing
@@ -40,20 +86,25 @@ def create_app(test_config=None):
     from . import db
     db.init_app(app)
 
+    from . import instrument
+    instrument.init_app(app)
+
+    from . import outbox
+    outbox.init_app(app)
+
+    from . import cli
+    cli.init_app(app)
+
     # a simple page that checks if the server is running
     @app.route('/running')
     def running():
         return 'Server is running'
 
+    from . import meal
+
     @app.context_processor
     def utility_processor():
-        def current_meal():
-            tmp = db.get_db()
-            return tmp.execute(
-                'SELECT count(id_meal) FROM meal WHERE end IS NULL'
-            ).fetchone()[0]
-
-        return dict(current_meal=current_meal)
+        return dict(current_meal=meal.open_meals)
 
     from . import auth
     app.register_blueprint(auth.bp)
@@ -74,7 +125,6 @@ def create_app(test_config=None):
     from . import menu
     app.register_blueprint(menu.bp)
 
-    from . import meal
     app.register_blueprint(meal.bp)
 
     from . import version
@@ -92,6 +142,15 @@ def create_app(test_config=None):
     from . import changelog
     app.register_blueprint(changelog.bp)
 
+    from . import search
+    app.register_blueprint(search.bp)
+
+    from . import api
+    app.register_blueprint(api.bp)
+
+    from . import lookup
+    app.register_blueprint(lookup.bp)
+
     return app
 
 
@@ -0,0 +1,228 @@
+import json
+
+from flask import Blueprint, g, jsonify, request
+from werkzeug.exceptions import abort
+
+from lsg_web.auth import security_required
+from lsg_web.db import get_db
+from lsg_web.menu import clone_menus
+
+bp = Blueprint('api', __name__, url_prefix='/api')
+
+
+def is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def is_quantity(value):
+    # composed.quantity is an INTEGER, as the form asks
+    return is_id(value) and value > 0
+
+
+def is_text(value):
+    return isinstance(value, str) and value != ''
+
+
+def existing(db, table, key, ids):
+    """Return the ids of ``ids`` found in ``table``, in a single query whatever their number."""
+    ids = sorted({id for id in ids if is_id(id)})
+    if not ids:
+        return set()
+    rows = db.execute(
+        'SELECT {1} FROM {0} WHERE {1} IN (SELECT value FROM json_each(?))'.format(table, key), (json.dumps(ids),)
+    )
+    return {row[0] for row in rows}
+
+
+def batch(name):
+    """Return the list of objects ``name`` of the JSON body."""
+    data = request.get_json(silent=True)
+    items = data.get(name) if isinstance(data, dict) else None
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        abort(400, 'Expected a JSON object with a list of {0}.'.format(name))
+    return items
+
+
+def inserted_ids(db, count):
+    """Return the keys of the ``count`` rows inserted by the last statement.
+
+    AUTOINCREMENT keys of the rows of one INSERT, in one transaction, follow
+    each other and end with last_insert_rowid().
+    """
+    last = db.execute('SELECT last_insert_rowid()').fetchone()[0]
+    return list(range(last - count + 1, last + 1))
+
+
+def check_foods(db, foods):
+    categories = existing(db, 'category', 'id_category', [food.get('id_category') for food in foods])
+    known = existing(db, 'food', 'id_food', [food.get('id_food') for food in foods])
+    errors = []
+    for i, food in enumerate(foods):
+        error = None
+        if 'id_food' in food and not (is_id(food['id_food']) and food['id_food'] in known):
+            error = "Food id {0} doesn't exist.".format(food['id_food'])
+        elif not is_text(food.get('name')):
+            error = 'You must enter a name.'
+        elif not food.get('id_category'):
+            error = 'You must enter a category.'
+        elif not is_text(food.get('information')):
+            error = 'You must enter some information.'
+        elif not (is_id(food['id_category']) and food['id_category'] in categories):
+            error = 'You must select a valid category.'
+        if error is not None:
+            errors.append('foods[{0}]: {1}'.format(i, error))
+    return errors
+
+
+def check_composed(prefix, composed, foods):
+    if not isinstance(composed, list) or not all(isinstance(item, dict) for item in composed):
+        return ['{0}: Expected a list of foods and quantities.'.format(prefix)]
+    errors, seen = [], set()
+    for i, item in enumerate(composed):
+        error = None
+        food = item.get('id_food')
+        if not is_id(food):
+            error = 'You must select a food.'
+        elif not is_quantity(item.get('quantity')):
+            error = 'You must enter a quantity.'
+        elif food not in foods:
+            error = 'Food does not exist.'
+        elif food in seen:
+            error = 'Food is already in the menu.'
+        else:
+            seen.add(food)
+        if error is not None:
+            errors.append('{0}[{1}]: {2}'.format(prefix, i, error))
+    return errors
+
+
+def composed_foods(menus):
+    return [item.get('id_food') for menu in menus if isinstance(menu.get('composed'), list)
+            for item in menu['composed'] if isinstance(item, dict)]
+
+
+def check_menus(db, menus):
+    known = existing(db, 'menu', 'id_menu', [menu.get('id_menu') for menu in menus])
+    foods = existing(db, 'food', 'id_food', composed_foods(menus))
+    errors = []
+    for i, menu in enumerate(menus):
+        error = None
+        if 'id_menu' in menu and not (is_id(menu['id_menu']) and menu['id_menu'] in known):
+            error = "Menu id {0} doesn't exist.".format(menu['id_menu'])
+        elif not is_text(menu.get('name')):
+            error = 'You must enter a name.'
+        elif not is_text(menu.get('information')):
+            error = 'You must enter some information.'
+        if error is not None:
+            errors.append('menus[{0}]: {1}'.format(i, error))
+        if 'composed' in menu:
+            errors += check_composed('menus[{0}].composed'.format(i), menu['composed'], foods)
+    return errors
+
+
+def replace_composed(db, menus):
+    """Replace the whole composition of the menus of ``{id_menu: composed}``."""
+    if not menus:
+        return
+    db.executemany('DELETE FROM composed WHERE id_menu = ?', [(id,) for id in menus])
+    db.executemany(
+        'INSERT INTO composed (id_menu, id_food, quantity) VALUES (?, ?, ?)',
+        [(id, item['id_food'], item['quantity']) for id, composed in menus.items() for item in composed]
+    )
+
+
+@bp.route('/foods', methods=('POST',))
+@security_required
+def foods():
+    """Create the foods without ``id_food`` and update the others, all or none."""
+    db = get_db()
+    foods = batch('foods')
+    errors = check_foods(db, foods)
+    if errors:
+        return jsonify(errors=errors), 400
+
+    created = [food for food in foods if 'id_food' not in food]
+    updated = [food for food in foods if 'id_food' in food]
+    if created:
+        db.executemany(
+            'INSERT INTO food (name, id_category, information, id_person) VALUES (?, ?, ?, ?)',
+            [(food['name'], food['id_category'], food['information'], g.user['id_person']) for food in created]
+        )
+        for food, id in zip(created, inserted_ids(db, len(created))):
+            food['id_food'] = id
+    if updated:
+        db.executemany(
+            'UPDATE food SET name = ?, id_category = ?, information = ? WHERE id_food = ?',
+            [(food['name'], food['id_category'], food['information'], food['id_food']) for food in updated]
+        )
+    db.commit()
+    return jsonify(foods=[food['id_food'] for food in foods])
+
+
+@bp.route('/menus', methods=('POST',))
+@security_required
+def menus():
+    """Create the menus without ``id_menu`` and update the others, all or none.
+
+    A menu given with ``composed``, a list of ``id_food`` and ``quantity``,
+    gets exactly these foods.
+    """
+    db = get_db()
+    menus = batch('menus')
+    errors = check_menus(db, menus)
+    if errors:
+        return jsonify(errors=errors), 400
+
+    created = [menu for menu in menus if 'id_menu' not in menu]
+    updated = [menu for menu in menus if 'id_menu' in menu]
+    if created:
+        db.executemany(
+            'INSERT INTO menu (name, information, actif, id_person) VALUES (?, ?, 1, ?)',
+            [(menu['name'], menu['information'], g.user['id_person']) for menu in created]
+        )
+        for menu, id in zip(created, inserted_ids(db, len(created))):
+            menu['id_menu'] = id
+    if updated:
+        db.executemany(
+            'UPDATE menu SET name = ?, information = ? WHERE id_menu = ?',
+            [(menu['name'], menu['information'], menu['id_menu']) for menu in updated]
+        )
+    replace_composed(db, {menu['id_menu']: menu['composed'] for menu in menus if 'composed' in menu})
+    db.commit()
+    return jsonify(menus=[menu['id_menu'] for menu in menus])
+
+
+@bp.route('/menus/clone', methods=('POST',))
+@security_required
+def clone():
+    """Copy a list of menu ids, a week of meals for instance, and return the ids of the copies."""
+    db = get_db()
+    data = request.get_json(silent=True)
+    ids = data.get('menus') if isinstance(data, dict) else None
+    if not isinstance(ids, list) or not all(is_id(id) for id in ids):
+        abort(400, 'Expected a JSON object with a list of menu ids.')
+    known = existing(db, 'menu', 'id_menu', ids)
+    errors = ["menus[{0}]: Menu id {1} doesn't exist.".format(i, id) for i, id in enumerate(ids) if id not in known]
+    if errors:
+        return jsonify(errors=errors), 400
+
+    copies = clone_menus(db, ids, g.user['id_person'])
+    db.commit()
+    return jsonify(menus=copies)
+
+
+@bp.route('/menus/<int:id>/composed', methods=('PUT',))
+@security_required
+def composed(id):
+    """Replace the foods of a menu."""
+    db = get_db()
+    if not existing(db, 'menu', 'id_menu', [id]):
+        abort(404, "Menu id {0} doesn't exist.".format(id))
+    items = batch('composed')
+    errors = check_composed('composed', items, existing(db, 'food', 'id_food', composed_foods([{'composed': items}])))
+    if errors:
+        return jsonify(errors=errors), 400
+
+    replace_composed(db, {id: items})
+    db.commit()
+    return jsonify(id_menu=id, composed=len(items))
@@ -1,14 +1,19 @@
 import functools
 
 from flask import (
-    Blueprint, flash, g, redirect, render_template, request, session, url_for
+    Blueprint, current_app, flash, g, redirect, render_template, request, session, url_for
 )
 from werkzeug.security import check_password_hash
 from werkzeug.exceptions import abort
+from lsg_web.cache import TTLCache
 from lsg_web.db import get_db
+from lsg_web.generation import generation_name, request_counters
 
 bp = Blueprint('auth', __name__, url_prefix='/auth')
 
+# tables the cached identity of a user is read from
+IDENTITY_TABLES = ('user', 'permission', 'person')
+
 
 @bp.route('/login', methods=('GET', 'POST'))
 def login():
@@ -47,15 +52,47 @@ def load_logged_in_user():
         g.user = None
         g.group = None
     else:
-        g.user = get_db().execute(
-            'SELECT * FROM user WHERE id_user = ?', (id_user,)
-        ).fetchone()
-        g.group = get_db().execute(
-            "SELECT * FROM permission WHERE id_permission = ?", (g.user['id_permission'],)
-        ).fetchone()
-        g.person = get_db().execute(
-            'SELECT * FROM person WHERE id_person = ?', (g.user['id_person'],)
-        ).fetchone()
+        g.user, g.group, g.person = load_identity(id_user)
+
+
+def get_identity_cache():
+    cache = current_app.extensions.get('lsg_identity')
+    if cache is None:
+        cache = current_app.extensions.setdefault('lsg_identity', TTLCache(
+            current_app.config['IDENTITY_CACHE_SIZE'], current_app.config['IDENTITY_CACHE_TTL']
+        ))
+    return cache
+
+
+def load_identity(id_user):
+    """Return the user, permission and person rows of ``id_user``.
+
+    The rows are cached per worker process along with the write generations
+    of their tables. A request still costs one query, reading the three
+    generations from the counter table, so a write by any worker reloads the
+    rows at the next request; the rows themselves are read again only then.
+    """
+    names = [generation_name(table) for table in IDENTITY_TABLES]
+    generations = request_counters(names)
+    generations = [generations[name] for name in names]
+    cache = get_identity_cache()
+    entry = cache.get(id_user)
+    if entry is not None and entry[0] == generations:
+        return entry[1]
+    db = get_db()
+    user = db.execute(
+        'SELECT * FROM user WHERE id_user = ?', (id_user,)
+    ).fetchone()
+    group = db.execute(
+        "SELECT * FROM permission WHERE id_permission = ?", (user['id_permission'],)
+    ).fetchone()
+    person = db.execute(
+        'SELECT * FROM person WHERE id_person = ?', (user['id_person'],)
+    ).fetchone()
+    identity = (user, group, person)
+    # read before the rows, a write in between only costs a reload at the next request
+    cache.set(id_user, (generations, identity))
+    return identity
 
 
 @bp.route('/logout')
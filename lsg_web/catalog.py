@@ -0,0 +1,76 @@
+import threading
+
+from flask import current_app
+
+from lsg_web.db import get_db
+from lsg_web.generation import counters, generation_name
+
+# reference list -> table, columns, rows and order of the picklists of the forms
+CATALOG = {
+    'categories': ('category', 'id_category, name', '1', 'name COLLATE NOCASE, id_category'),
+    'versions': ('version', 'id_version, name', '1', 'name COLLATE NOCASE, id_version'),
+    'menus': ('menu', 'id_menu, name', 'actif = 1', 'name COLLATE NOCASE, id_menu'),
+}
+
+
+class Catalog(object):
+    """Reference lists of the forms, cached per worker process.
+
+    A list is rebuilt when the write generation of its table changed, the
+    counter is bumped by triggers whichever blueprint or worker wrote. A read
+    checks the generations of the cached lists it needs in one query and
+    rebuilds only the ones missing or changed.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def lists(self, db, *names):
+        """Return the lists ``names``, as tuples of dicts."""
+        with self._lock:
+            entries = {name: self._entries.get(name) for name in names}
+        cached = [generation_name(CATALOG[name][0]) for name, entry in entries.items() if entry is not None]
+        if cached:
+            generations = counters(db, cached)
+            for name, entry in entries.items():
+                if entry is not None and generations.get(generation_name(CATALOG[name][0])) != entry[0]:
+                    entries[name] = None
+        for name, entry in entries.items():
+            if entry is None:
+                entries[name] = self.build(db, name)
+        return [entries[name][1] for name in names]
+
+    def build(self, db, name):
+        table, columns, where, order = CATALOG[name]
+        # the generation is read by the statement building the list, both from the same snapshot
+        rows = db.execute(
+            'SELECT {0}, (SELECT value FROM counter WHERE name = ?) AS _generation FROM {1} WHERE {2} '
+            'ORDER BY {3}'.format(columns, table, where, order), (generation_name(table),)
+        ).fetchall()
+        if rows:
+            generation = rows[0]['_generation']
+        else:
+            generation = counters(db, [generation_name(table)]).get(generation_name(table))
+        entry = (generation, tuple({key: row[key] for key in row.keys() if key != '_generation'} for row in rows))
+        if generation is not None:
+            with self._lock:
+                self._entries[name] = entry
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def get_catalog():
+    catalog = current_app.extensions.get('lsg_catalog')
+    if catalog is None:
+        catalog = current_app.extensions.setdefault('lsg_catalog', Catalog())
+    return catalog
+
+
+def catalog(*names):
+    """Return the reference lists ``names`` for the current request."""
+    lists = get_catalog().lists(get_db(), *names)
+    return lists[0] if len(names) == 1 else lists
@@ -5,12 +5,14 @@ from werkzeug.exceptions import abort
 
 from lsg_web.auth import login_required, security_required
 from lsg_web.db import get_db
+from lsg_web.pages import cached_page
 
 bp = Blueprint('category', __name__, url_prefix='/category')
 
 
 @bp.route('/list', methods=('GET', ))
 @login_required
+@cached_page('category')
 def listing():
     db = get_db()
     categories = db.execute(
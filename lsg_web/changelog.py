@@ -3,11 +3,13 @@ from flask import (
 )
 
 from lsg_web.auth import login_required
+from lsg_web.pages import cached_page
 
 bp = Blueprint('changelog', __name__)
 
 
 @bp.route('/changelog')
 @login_required
+@cached_page()
 def consult():
     return render_template('changelog/changelog.html')
\ No newline at end of file
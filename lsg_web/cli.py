@@ -0,0 +1,83 @@
+import os
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from lsg_web.db import get_db
+from lsg_web.export import export_meals
+from lsg_web.ingest import ingest_command
+from lsg_web.recording import compress_recording
+from lsg_web.search import rebuild_search
+from lsg_web.series import build_series
+
+
+@click.group('lsg')
+def lsg_command():
+    """Run the services and maintenance tasks of the server."""
+
+
+lsg_command.add_command(ingest_command)
+
+
+@lsg_command.command('build-series')
+@click.argument('ids', nargs=-1, type=int)
+@with_appcontext
+def build_series_command(ids):
+    """Convert the CSV of the given meals, or of all of them, to series files."""
+    folder = current_app.config['DATA_UPLOADS']
+    if not ids:
+        ids = sorted(int(name[:-4]) for name in os.listdir(folder)
+                     if name.endswith('.csv') and name[:-4].isdigit())
+    for id in ids:
+        try:
+            click.echo('Meal {0}: {1} rows.'.format(id, build_series(folder, id)))
+        except (ValueError, OSError) as e:
+            click.echo('Meal {0}: {1}'.format(id, e))
+
+
+@lsg_command.command('compress')
+@with_appcontext
+def compress_command():
+    """Compress the CSV of the finished meals still stored uncompressed."""
+    folder = current_app.config['DATA_UPLOADS']
+    # rows can still be appended to the recordings of the open meals
+    running = set(row[0] for row in get_db().execute('SELECT id_meal FROM meal WHERE end IS NULL'))
+    saved = 0
+    for name in sorted(os.listdir(folder)):
+        if name.endswith('.csv') and name[:-4].isdigit() and int(name[:-4]) not in running:
+            path = os.path.join(folder, name)
+            size = os.path.getsize(path)
+            saved += size - os.path.getsize(compress_recording(path, current_app.config['DATA_COMPRESSION_LEVEL']))
+            click.echo('Compressed {0}.'.format(name))
+    click.echo('Saved {0} bytes.'.format(saved))
+
+
+@lsg_command.command('export')
+@click.argument('output', type=click.File('wb'))
+@click.option('--from', 'start', help='First day, YYYY-MM-DD.')
+@click.option('--to', 'end', help='Last day, YYYY-MM-DD.')
+@click.option('--end-from', help='First day the meals ended, YYYY-MM-DD.')
+@click.option('--end-to', help='Last day the meals ended, YYYY-MM-DD.')
+@click.option('--candidate', type=int, help='Id of the candidate.')
+@click.option('--menu', type=int, help='Id of the menu.')
+@click.option('--tray', type=int, help='Id of the tray.')
+@click.option('--status', type=click.Choice(['open', 'closed']), help='Only the open or the closed meals.')
+@with_appcontext
+def export_command(output, start, end, end_from, end_to, candidate, menu, tray, status):
+    """Write a ZIP archive of the data and manifest of the matching meals."""
+    args = {'from': start, 'to': end, 'end_from': end_from, 'end_to': end_to, 'candidate': candidate, 'menu': menu,
+            'tray': tray, 'status': status}
+    for data in export_meals(get_db(), current_app.config['DATA_UPLOADS'], args):
+        output.write(data)
+
+
+@lsg_command.command('rebuild-search')
+@with_appcontext
+def rebuild_search_command():
+    """Index the foods, menus, bugs and meals for the full-text search again."""
+    click.echo('Indexed {0} entries.'.format(rebuild_search(get_db())))
+
+
+def init_app(app):
+    app.cli.add_command(lsg_command)
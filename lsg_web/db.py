@@ -1,17 +1,105 @@
+import os
+import queue
 import sqlite3
+import threading
 
 import click
 from flask import current_app, g
 from flask.cli import with_appcontext
 
+from lsg_web import migrate
+from lsg_web.instrument import InstrumentedConnection
+
+
+class ConnectionPool(object):
+    """Keep up to ``size`` configured connections to one SQLite database.
+
+    A pool belongs to a single worker process. Connections are created lazily,
+    tuned with the PRAGMAs below once, and reused by the following requests.
+    """
+
+    def __init__(self, database, size, busy_timeout, mmap_size, cache_size):
+        self.database = database
+        self.size = size
+        self.busy_timeout = busy_timeout
+        self.mmap_size = mmap_size
+        self.cache_size = cache_size
+        self.pid = os.getpid()
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def connect(self):
+        db = sqlite3.connect(
+            self.database,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            timeout=self.busy_timeout / 1000,
+            check_same_thread=False,
+            factory=InstrumentedConnection
+        )
+        db.row_factory = sqlite3.Row
+        db.execute('PRAGMA journal_mode = WAL')
+        db.execute('PRAGMA synchronous = NORMAL')
+        db.execute('PRAGMA busy_timeout = {0:d}'.format(self.busy_timeout))
+        db.execute('PRAGMA mmap_size = {0:d}'.format(self.mmap_size))
+        db.execute('PRAGMA cache_size = {0:d}'.format(self.cache_size))
+        return db
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self.connect()
+
+    def release(self, db):
+        if db.in_transaction:
+            db.rollback()
+        try:
+            self._idle.put_nowait(db)
+        except queue.Full:
+            db.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_pool_lock = threading.Lock()
+
+
+def get_pool(app=None):
+    app = app or current_app
+    pool = app.extensions.get('lsg_db_pool')
+    # a pool inherited through fork() shares file descriptors with the parent
+    if pool is None or pool.pid != os.getpid():
+        with _pool_lock:
+            pool = app.extensions.get('lsg_db_pool')
+            if pool is None or pool.pid != os.getpid():
+                pool = ConnectionPool(
+                    app.config['DATABASE'],
+                    app.config['DATABASE_POOL_SIZE'],
+                    app.config['DATABASE_BUSY_TIMEOUT'],
+                    app.config['DATABASE_MMAP_SIZE'],
+                    app.config['DATABASE_CACHE_SIZE'],
+                )
+                app.extensions['lsg_db_pool'] = pool
+    return pool
+
 
 def get_db():
     if 'db' not in g:
-        g.db = sqlite3.connect(
-            current_app.config['DATABASE'],
-            detect_types=sqlite3.PARSE_DECLTYPES
-        )
-        g.db.row_factory = sqlite3.Row
+        if current_app.config['DATABASE_POOL_SIZE'] > 0:
+            g.db = get_pool().acquire()
+        else:
+            g.db = sqlite3.connect(
+                current_app.config['DATABASE'],
+                detect_types=sqlite3.PARSE_DECLTYPES,
+                factory=InstrumentedConnection
+            )
+            g.db.row_factory = sqlite3.Row
+        if current_app.config['SQL_INSTRUMENTATION']:
+            g.db.statements = []
 
     return g.db
 
@@ -20,7 +108,18 @@ def close_db(e=None):
     db = g.pop('db', None)
 
     if db is not None:
-        db.close()
+        db.statements = None
+        if current_app.config['DATABASE_POOL_SIZE'] > 0:
+            get_pool().release(db)
+        else:
+            db.close()
+
+
+def close_pool(app=None):
+    pool = (app or current_app).extensions.pop('lsg_db_pool', None)
+
+    if pool is not None:
+        pool.close()
 
 
 def init_db():
@@ -29,6 +128,9 @@ def init_db():
     with current_app.open_resource('schema.sql') as f:
         db.executescript(f.read().decode('utf8'))
 
+    for _ in migrate.upgrade(db):
+        pass
+
 
 @click.command('init-db')
 @with_appcontext
@@ -38,6 +140,26 @@ def init_db_command():
     click.echo('Initialized the database.')
 
 
+@click.group('db')
+def db_command():
+    """Manage the database schema."""
+
+
+@db_command.command('upgrade')
+@click.option('--target', type=int, help='Stop after this schema version.')
+@with_appcontext
+def upgrade_command(target):
+    """Apply the pending schema migrations without losing data."""
+    db = get_db()
+    try:
+        for version, name, duration in migrate.upgrade(db, target):
+            click.echo('Applied {0:04d}_{1} in {2:.3f}s'.format(version, name, duration))
+    except RuntimeError as error:
+        raise click.ClickException(str(error))
+    click.echo('Database is at version {0}.'.format(migrate.current_version(db)))
+
+
 def init_app(app):
     app.teardown_appcontext(close_db)
-    app.cli.add_command(init_db_command)
\ No newline at end of file
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(db_command)
@@ -0,0 +1,211 @@
+import json
+import os
+import queue
+import threading
+
+from flask import current_app
+
+from lsg_web.db import get_db
+from lsg_web.presence import get_presence
+
+# rows of a live recording sent in one sample event at most
+SAMPLE_ROWS = 200
+# the meal events older than a day are deleted every PRUNE_POLLS polls
+PRUNE_POLLS = 3600
+
+
+def format_event(kind, data, id=None):
+    lines = [] if id is None else ['id: {0}'.format(id)]
+    lines += ['event: ' + kind, 'data: ' + json.dumps(data), '', '']
+    return '\n'.join(lines)
+
+
+class Subscriber(object):
+
+    def __init__(self, meal, size):
+        self.meal = meal
+        self.queue = queue.Queue(size)
+
+    def put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            # a browser too slow to follow misses events rather than holding the others back
+            pass
+
+
+class EventHub(object):
+    """Fan-out of the live events of a worker process to the connected browsers.
+
+    A single thread polls every ``interval`` seconds, whatever the number of
+    subscribers: the meal_event table filled by triggers and the end of the
+    live recording of the meals someone is watching. The transitions of the
+    tray presence are relayed as the registry publishes them. The thread ends
+    once the last subscriber leaves, the next one starts it again. With an
+    interval of 0 no thread is started and ``poll`` is called by hand.
+    """
+
+    def __init__(self, app, interval, queue_size):
+        self.app = app
+        self.interval = interval
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._watched = {}
+        self._last_event = None
+        self._polls = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._listening = None
+
+    def subscribe(self, meal=None):
+        subscriber = Subscriber(meal, self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            if meal is not None:
+                self._watched.setdefault(meal, [0, None])[0] += 1
+        if self.interval > 0:
+            self._start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+            if subscriber.meal is not None and subscriber.meal in self._watched:
+                self._watched[subscriber.meal][0] -= 1
+                if self._watched[subscriber.meal][0] <= 0:
+                    del self._watched[subscriber.meal]
+
+    def publish(self, kind, data, id=None, meal=None):
+        message = format_event(kind, data, id)
+        with self._lock:
+            subscribers = [s for s in self._subscribers if meal is None or s.meal == meal]
+        for subscriber in subscribers:
+            subscriber.put(message)
+
+    def on_presence(self, name, online):
+        self.publish('tray', {'name': name, 'online': online})
+
+    def meal_events(self, db, after):
+        """Return the meal events following ``after`` with the row shown for an open meal."""
+        events = db.execute(
+            'SELECT id_event, e.id_meal, kind, c.name as uname, m.name as mname, m.information as minformation, '
+            't.name as tname FROM meal_event e JOIN meal p ON p.id_meal = e.id_meal '
+            'JOIN person c ON p.id_candidate = c.id_person JOIN menu m ON m.id_menu = p.id_menu '
+            'JOIN tray t ON t.id_tray = p.id_tray WHERE id_event > ? ORDER BY id_event', (after,)
+        ).fetchall()
+        return [(event['id_event'], dict(event)) for event in events]
+
+    def replay(self, subscriber, db, after):
+        """Queue the meal events a reconnecting browser missed, up to the last one published."""
+        for id, event in self.meal_events(db, after):
+            if self._last_event is None or id > self._last_event:
+                break
+            subscriber.put(format_event('meal', event, id))
+
+    def stream(self, subscriber, keepalive):
+        """Generate the text of the event stream of a subscriber."""
+        yield 'retry: 3000\n\n'
+        while True:
+            try:
+                yield subscriber.queue.get(timeout=keepalive)
+            except queue.Empty:
+                # proxies close the connections that stay silent
+                yield ': keepalive\n\n'
+
+    def poll(self):
+        """Publish what changed since the last poll, needs an application context."""
+        db = get_db()
+        if self._last_event is None:
+            self._last_event = db.execute('SELECT coalesce(max(id_event), 0) FROM meal_event').fetchone()[0]
+        for id, event in self.meal_events(db, self._last_event):
+            self.publish('meal', event, id=id)
+            self._last_event = id
+        self._polls += 1
+        if self._polls % PRUNE_POLLS == 0:
+            db.execute('DELETE FROM meal_event WHERE created < datetime("now", "-1 day")')
+            db.commit()
+
+        presence = get_presence()
+        if self._listening is not presence:
+            # the registry publishes the transitions itself, offline ones included
+            presence.subscribe(self.on_presence)
+            self._listening = presence
+
+        with self._lock:
+            watched = list(self._watched.items())
+        for meal, state in watched:
+            rows = self.tail(meal, state)
+            if rows:
+                self.publish('sample', {'id_meal': meal, 'rows': rows[-SAMPLE_ROWS:]}, meal=meal)
+
+    def tail(self, meal, state):
+        """Return the rows appended to the live recording of a meal since the last call."""
+        path = os.path.join(current_app.config['DATA_UPLOADS'], '{0}.csv'.format(meal))
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return []
+        if state[1] is None or size < state[1]:
+            # only what is recorded from now on
+            state[1] = size
+            return []
+        with open(path, 'rb') as f:
+            f.seek(state[1])
+            data = f.read(size - state[1])
+        complete = data.rfind(b'\n') + 1
+        state[1] += complete
+        rows = []
+        for line in data[:complete].splitlines():
+            try:
+                rows.append([float(value) for value in line.replace(b';', b',').split(b',')])
+            except ValueError:
+                pass
+        return rows
+
+    def _start(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._stop.is_set() or self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='live-events', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                if not self._subscribers:
+                    # decided under the lock, a subscribe from now on starts another thread
+                    self._pid = None
+                    return
+            try:
+                with self.app.app_context():
+                    self.poll()
+            except Exception:
+                self.app.logger.exception('Could not poll the live events.')
+
+    def stop(self):
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and self._pid == os.getpid():
+            thread.join()
+
+
+def get_events():
+    hub = current_app.extensions.get('lsg_events')
+    if hub is None:
+        hub = current_app.extensions.setdefault('lsg_events', EventHub(
+            current_app._get_current_object(), current_app.config['EVENTS_POLL_INTERVAL'],
+            current_app.config['EVENTS_QUEUE_SIZE']
+        ))
+    return hub
+
+
+def close_events(app=None):
+    hub = (app or current_app).extensions.pop('lsg_events', None)
+
+    if hub is not None:
+        hub.stop()
@@ -0,0 +1,108 @@
+import csv
+import io
+import os
+import time
+import zipfile
+
+from lsg_web.facets import meal_filter
+from lsg_web.recording import open_recording, recording_paths, recording_size
+
+MANIFEST = (
+    'id_meal', 'start', 'end', 'information', 'id_menu', 'menu', 'menu_information', 'id_candidate', 'candidate',
+    'birthdate', 'gender', 'weight', 'id_tray', 'tray', 'user', 'file'
+)
+
+
+class _Pipe(object):
+    """Write-only file keeping what was written until it is taken."""
+
+    def __init__(self):
+        self._chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        self.size = 0
+        return data
+
+
+def export_meals(db, folder, args, chunk_size=64 * 1024):
+    """Generate a ZIP archive of the recordings of the meals and their manifest.
+
+    The archive is produced piece by piece, only the ids of the meals are
+    kept between the manifest and the recordings, so both come from the same
+    read of the meals. Compressed recordings are stored as they are.
+    """
+    where, parameters = meal_filter(args)
+    names = set(os.listdir(folder))
+    recorded = []
+    pipe = _Pipe()
+    with zipfile.ZipFile(pipe, 'w', zipfile.ZIP_DEFLATED) as archive:
+        with archive.open('manifest.csv', 'w') as entry:
+            lines = io.StringIO()
+            writer = csv.writer(lines)
+            writer.writerow(MANIFEST)
+            rows = db.execute(
+                'SELECT id_meal, start, end, p.information, p.id_menu, m.name, m.information, id_candidate, c.name, '
+                'c.birthdate, c.gender, c.weight, p.id_tray, t.name, u.name FROM meal p '
+                'JOIN menu m ON m.id_menu = p.id_menu JOIN person c ON c.id_person = p.id_candidate '
+                'JOIN tray t ON t.id_tray = p.id_tray JOIN person u ON u.id_person = p.id_user '
+                'WHERE ' + where + ' ORDER BY id_meal', parameters
+            )
+            for row in rows:
+                name = archive_name(names, row[0])
+                if name is not None:
+                    recorded.append(row[0])
+                writer.writerow(tuple(row) + (name,))
+                if lines.tell() >= chunk_size:
+                    entry.write(lines.getvalue().encode('utf8'))
+                    lines.seek(0)
+                    lines.truncate()
+                    yield pipe.take()
+            entry.write(lines.getvalue().encode('utf8'))
+        yield pipe.take()
+
+        for id in recorded:
+            try:
+                paths = recording_paths(folder, id)
+            except FileNotFoundError:
+                continue
+            mtime = max(os.path.getmtime(path) for path in paths)
+            info = zipfile.ZipInfo(entry_name(paths), date_time=time.localtime(mtime)[:6])
+            if len(paths) == 1:
+                size = os.path.getsize(paths[0])
+                info.compress_type = zipfile.ZIP_STORED if paths[0].endswith('.gz') else zipfile.ZIP_DEFLATED
+                source = open(paths[0], 'rb')
+            else:
+                # rows were ingested after the compression, the whole of it is stored decompressed
+                size = recording_size(paths)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                source = open_recording(folder, id)
+            with source, archive.open(info, 'w', force_zip64=size > 2 ** 30) as entry:
+                for data in iter(lambda: source.read(chunk_size), b''):
+                    entry.write(data)
+                    yield pipe.take()
+            yield pipe.take()
+    yield pipe.take()
+
+
+def entry_name(paths):
+    # <id>.csv.gz stored as it is, <id>.csv otherwise
+    return os.path.basename(paths[-1])
+
+
+def archive_name(names, id):
+    """Return the name of the recording of a meal among the names of the files of the folder."""
+    for name in ('{0}.csv'.format(id), '{0}.csv.gz'.format(id)):
+        if name in names:
+            return name
+    return None
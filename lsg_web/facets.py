@@ -0,0 +1,76 @@
+FILTERS = ('from', 'to', 'end_from', 'end_to', 'candidate', 'menu', 'tray', 'status')
+# facet -> meal column, status is the fourth facet
+FACETS = (('tray', 'p.id_tray'), ('menu', 'p.id_menu'), ('candidate', 'p.id_candidate'))
+STATUSES = ('open', 'closed')
+
+
+def meal_filter(args, facets=True):
+    """Return the ``(where, parameters)`` selecting the active meals matching ``args``.
+
+    ``from`` and ``to`` bound the day the meal started, ``end_from`` and
+    ``end_to`` the day it ended, all of them included. ``candidate``, ``menu``
+    and ``tray`` are ids and ``status`` is open or closed. Only the date
+    ranges are applied when ``facets`` is false.
+    """
+    clauses, parameters = ['p.actif = 1'], []
+    for start, end, column in (('from', 'to', 'p.start'), ('end_from', 'end_to', 'p.end')):
+        if args.get(start):
+            clauses.append(column + ' >= date(?)')
+            parameters.append(args[start])
+        if args.get(end):
+            clauses.append(column + ' < date(?, "+1 day")')
+            parameters.append(args[end])
+    if facets:
+        for name, column in FACETS:
+            if args.get(name):
+                clauses.append(column + ' = ?')
+                parameters.append(args[name])
+        if args.get('status') == 'open':
+            clauses.append('p.end IS NULL')
+        elif args.get('status') == 'closed':
+            clauses.append('p.end IS NOT NULL')
+    return ' AND '.join(clauses), parameters
+
+
+def facet_counts(db, args):
+    """Count the meals matching ``args`` per tray, menu, candidate and status.
+
+    A single grouped statement counts the meals of every combination of the
+    four facets in the date range, the combinations are then added up per
+    facet. The values of a facet are counted with the other facets selected
+    but not itself, so that they can be chosen instead of the current one.
+    """
+    where, parameters = meal_filter(args, facets=False)
+    rows = db.execute(
+        'SELECT g.id_tray, t.name as tname, g.id_menu, m.name as mname, g.id_candidate, c.name as cname, g.open, '
+        'g.meals FROM (SELECT p.id_tray, p.id_menu, p.id_candidate, p.end IS NULL AS open, count(*) AS meals '
+        'FROM meal p WHERE ' + where + ' GROUP BY p.id_tray, p.id_menu, p.id_candidate, open) g '
+        'JOIN tray t ON t.id_tray = g.id_tray JOIN menu m ON m.id_menu = g.id_menu '
+        'JOIN person c ON c.id_person = g.id_candidate', parameters
+    ).fetchall()
+
+    selected = {name: str(args[name]) for name, _ in FACETS if args.get(name)}
+    if args.get('status') in STATUSES:
+        selected['status'] = args['status']
+    counts = {name: {} for name in ('tray', 'menu', 'candidate', 'status')}
+    total = 0
+    for row in rows:
+        status = 'open' if row['open'] else 'closed'
+        values = {
+            'tray': (row['id_tray'], row['tname']),
+            'menu': (row['id_menu'], row['mname']),
+            'candidate': (row['id_candidate'], row['cname']),
+            'status': (status, status),
+        }
+        matching = {name for name, (value, _) in values.items() if name not in selected or str(value) == selected[name]}
+        if len(matching) == len(values):
+            total += row['meals']
+        for name, (value, label) in values.items():
+            if len(matching | {name}) == len(values):
+                entry = counts[name].setdefault(value, {'value': value, 'name': label, 'meals': 0})
+                entry['meals'] += row['meals']
+    return {
+        'meals': total,
+        'facets': {name: sorted(entries.values(), key=lambda entry: str(entry['name']))
+                   for name, entries in counts.items()},
+    }
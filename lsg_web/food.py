@@ -1,24 +1,37 @@
 from flask import (
-    Blueprint, flash, g, redirect, render_template, request, url_for
+    Blueprint, flash, g, jsonify, redirect, render_template, request, url_for
 )
 from werkzeug.exceptions import abort
 
 from lsg_web.auth import login_required, security_required
+from lsg_web.catalog import catalog
 from lsg_web.db import get_db
 from lsg_web.category import get_category
+from lsg_web.listing import Listing
+from lsg_web.pages import cached_page
 
 bp = Blueprint('food', __name__, url_prefix='/food')
 
+FOODS = Listing(
+    'f.id_food as idfood, f.name as fname, c.name as cname, information, p.name as uname, f.id_person',
+    'food f JOIN person p ON f.id_person = p.id_person JOIN category c ON f.id_category = c.id_category',
+    key='f.id_food',
+    sortable={'fname': 'f.name', 'cname': 'c.name', 'information': 'f.information', 'uname': 'p.name'},
+    searchable=('f.name', 'c.name', 'f.information', 'p.name')
+)
+
 
 @bp.route('/list')
 @login_required
+@cached_page('food', 'category', 'person')
 def listing():
-    db = get_db()
-    foods = db.execute(
-        'SELECT f.id_food as idfood, f.name as fname, c.name as cname, information, p.name as uname, f.id_person '
-        'FROM food f JOIN person p ON f.id_person = p.id_person JOIN category c ON f.id_category = c.id_category  ORDER BY f.id_food ASC'
-    ).fetchall()
-    return render_template('food/list.html', foods=foods)
+    return render_template('food/list.html', page=FOODS.page(get_db(), request.args))
+
+
+@bp.route('/list/data')
+@login_required
+def listing_data():
+    return jsonify(FOODS.page(get_db(), request.args))
 
 
 @bp.route('/create', methods=('GET', 'POST'))
@@ -38,7 +51,7 @@ def create():
             db.commit()
             return redirect(url_for('food.listing'))
 
-    categories = get_db().execute('SELECT * FROM category').fetchall()
+    categories = catalog('categories')
     return render_template('food/create.html', categories=categories)
 
 
@@ -87,5 +100,5 @@ def update(id):
             )
             db.commit()
             return redirect(url_for('food.listing'))
-    categories = get_db().execute('SELECT * FROM category').fetchall()
+    categories = catalog('categories')
     return render_template('food/update.html', categories=categories, food=food)
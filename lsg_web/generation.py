@@ -0,0 +1,40 @@
+import json
+
+from flask import current_app, g, has_request_context, request
+
+from lsg_web.db import get_db
+
+
+def generation_name(table):
+    """Return the counter bumped by the triggers of migration 0008 on each write to ``table``."""
+    return 'generation_' + table
+
+
+def counters(db, names):
+    """Return ``{name: value}`` of the counters ``names`` that exist, in a single query."""
+    return dict(db.execute(
+        'SELECT name, value FROM counter WHERE name IN (SELECT value FROM json_each(?))', (json.dumps(list(names)),)
+    ).fetchall())
+
+
+def request_counters(names):
+    """Return ``{name: value}`` of the counters ``names`` for the current request.
+
+    The values read are kept until the request writes, so a counter already
+    read by an earlier caller of the same request costs no query. The first
+    read also fetches the ``counters`` declared by the view of the request.
+    A counter that does not exist is None.
+    """
+    db = get_db()
+    declared = ()
+    noted = g.get('counters')
+    if noted is None or noted[0] != db.total_changes:
+        noted = g.counters = (db.total_changes, {})
+        if has_request_context():
+            view = current_app.view_functions.get(request.endpoint)
+            declared = getattr(view, 'counters', ())
+    missing = [name for name in set(names).union(declared) if name not in noted[1]]
+    if missing:
+        values = counters(db, missing)
+        noted[1].update((name, values.get(name)) for name in missing)
+    return {name: noted[1][name] for name in names}
@@ -0,0 +1,137 @@
+import atexit
+import os
+import threading
+import time
+
+from flask import current_app
+
+from lsg_web.db import get_db
+from lsg_web.generation import counters, generation_name
+
+
+class HeartbeatCoalescer(object):
+    """Keep the latest heartbeat of each tray in memory and write them in batches.
+
+    Every ``interval`` seconds a background thread writes all the trays that
+    sent a heartbeat since the last flush in one transaction. With an interval
+    of 0 each heartbeat is written at once.
+
+    The names of the known trays are answered from memory for ``ttl``
+    seconds. After that, or for a name not known yet, the generation of the
+    tray table is checked first, so a tray renamed by any worker is forgotten.
+    """
+
+    def __init__(self, app, interval, ttl):
+        self.app = app
+        self.interval = interval
+        self.ttl = ttl
+        self._dirty = {}
+        self._names = set()
+        self._generation = None
+        self._refreshed = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def refresh(self):
+        """Forget the known trays if the tray table was written since, by any worker."""
+        name = generation_name('tray')
+        generation = counters(get_db(), [name]).get(name)
+        self._refreshed = time.monotonic()
+        if generation != self._generation:
+            self._names = set()
+            self._generation = generation
+
+    def known(self, name):
+        if name in self._names and time.monotonic() - self._refreshed < self.ttl:
+            return True
+        self.refresh()
+        if name in self._names:
+            return True
+        if get_db().execute('SELECT id_tray FROM tray WHERE name = ?', (name,)).fetchone() is None:
+            return False
+        self._names.add(name)
+        return True
+
+    def forget(self, name):
+        self._names.discard(name)
+
+    def beat(self, name, ip):
+        timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+        with self._lock:
+            self._dirty[name] = (ip, timestamp)
+        if self.interval <= 0:
+            self.flush()
+        else:
+            self._start()
+
+    def flush(self):
+        """Write the pending heartbeats and return how many trays were updated."""
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        if not dirty:
+            return 0
+
+        try:
+            with self.app.app_context():
+                db = get_db()
+                db.executemany(
+                    'UPDATE tray SET online = 1, ip = ?, timestamp = ? WHERE name = ?',
+                    [(ip, timestamp, name) for name, (ip, timestamp) in dirty.items()]
+                )
+                db.commit()
+        except Exception:
+            # keep them for the next flush unless a newer heartbeat arrived meanwhile
+            with self._lock:
+                for name, state in dirty.items():
+                    self._dirty.setdefault(name, state)
+            raise
+        return len(dirty)
+
+    def _start(self):
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='tray-heartbeats', daemon=True)
+            self._thread.start()
+            # the heartbeats still pending are written when the worker exits
+            atexit.register(self.stop)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._run_once()
+
+    def _run_once(self):
+        try:
+            self.flush()
+        except Exception:
+            self.app.logger.exception('Could not write the tray heartbeats.')
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._pid == os.getpid():
+            atexit.unregister(self.stop)
+            self._thread.join()
+        self._run_once()
+
+
+def get_heartbeats():
+    coalescer = current_app.extensions.get('lsg_heartbeats')
+    if coalescer is None:
+        coalescer = current_app.extensions.setdefault('lsg_heartbeats', HeartbeatCoalescer(
+            current_app._get_current_object(), current_app.config['TRAY_HEARTBEAT_INTERVAL'],
+            current_app.config['TRAY_NAMES_TTL']
+        ))
+    return coalescer
+
+
+def close_heartbeats(app=None):
+    coalescer = (app or current_app).extensions.pop('lsg_heartbeats', None)
+
+    if coalescer is not None:
+        coalescer.stop()
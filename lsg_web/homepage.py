@@ -1,10 +1,12 @@
 from flask import (
-    Blueprint, flash, g, redirect, render_template, request, url_for
+    Blueprint, Response, flash, g, redirect, render_template, request, url_for
 )
+from flask import current_app as app
 from werkzeug.exceptions import abort
 
 from lsg_web.auth import login_required
 from lsg_web.db import get_db
+from lsg_web.events import get_events
 
 bp = Blueprint('index', __name__)
 
@@ -17,4 +19,20 @@ def index():
         'SELECT p.id_user as uid, id_meal, c.name as uname, m.name as mname, m.information as minformation, t.name as tname '
         'FROM meal p JOIN person c ON p.id_candidate = c.id_person JOIN menu m ON m.id_menu = p.id_menu JOIN tray t ON t.id_tray = p.id_tray WHERE end is NULL ORDER BY p.id_meal ASC'
     ).fetchall()
-    return render_template('index.html', meals=meals)
\ No newline at end of file
+    return render_template('index.html', meals=meals)
+
+
+@bp.route('/events')
+@login_required
+def events():
+    hub = get_events()
+    subscriber = hub.subscribe(request.args.get('meal', type=int))
+    last = request.headers.get('Last-Event-ID', type=int)
+    if last is not None:
+        hub.replay(subscriber, get_db(), last)
+
+    response = Response(hub.stream(subscriber, app.config['EVENTS_KEEPALIVE']), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(lambda: hub.unsubscribe(subscriber))
+    return response
@@ -0,0 +1,164 @@
+"""Tray telemetry received over MQTT.
+
+Trays publish on ``lsg/<tray name in lower case>`` with the tab separated
+format of the server commands, the sender first:
+
+* ``<tray>\\tHEARTBEAT\\t<ip>``
+* ``<tray>\\tDATA\\t<file>.csv`` followed by one measurement row per line
+
+Messages sent by ``SERVER`` on the same topics are ignored.
+"""
+import os
+import threading
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from werkzeug.utils import secure_filename
+
+from lsg_web.heartbeat import get_heartbeats
+from lsg_web.outbox import create_client, tray_topic
+from lsg_web.presence import get_presence
+
+
+class TelemetryIngestor(object):
+    """Decode the tray messages and write them in batches.
+
+    The MQTT network thread only decodes the messages into memory. ``flush``,
+    called every ``interval`` seconds from the thread owning the application
+    context, writes the latest heartbeat of each tray through the heartbeat
+    coalescer and appends the measurement rows to their data file, one write
+    per file.
+    """
+
+    def __init__(self, app, interval):
+        self.app = app
+        self.interval = interval
+        self.received = 0
+        self.rejected = 0
+        self._beats = {}
+        self._rows = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def on_connect(self, client, userdata, flags, rc):
+        # subscribe again after every reconnection
+        if rc == 0:
+            client.subscribe('lsg/+', qos=self.app.config['MQTT_QOS'])
+
+    def on_message(self, client, userdata, message):
+        self.handle(message.topic, message.payload)
+
+    def handle(self, topic, payload):
+        """Decode one message, return False if it was rejected."""
+        try:
+            header, _, body = payload.decode('utf8').partition('\n')
+            fields = header.split('\t')
+            sender, kind = fields[0], fields[1]
+        except (UnicodeDecodeError, IndexError):
+            return self._reject()
+        if sender == 'SERVER':
+            return True
+        if topic != tray_topic(sender):
+            return self._reject()
+
+        if kind == 'HEARTBEAT' and len(fields) == 3:
+            with self._lock:
+                self._beats[sender] = fields[2]
+                self.received += 1
+            return True
+        if kind == 'DATA' and len(fields) == 3:
+            filename = secure_filename(fields[2])
+            if filename.rsplit('.', 1)[-1] not in ('txt', 'csv'):
+                return self._reject()
+            rows = body if body.endswith('\n') or not body else body + '\n'
+            with self._lock:
+                self._rows.setdefault((sender, filename), []).append(rows)
+                self.received += 1
+            return True
+        return self._reject()
+
+    def _reject(self):
+        with self._lock:
+            self.rejected += 1
+        return False
+
+    def flush(self):
+        """Write the buffered messages, needs an application context."""
+        with self._lock:
+            beats, self._beats = self._beats, {}
+            rows, self._rows = self._rows, {}
+
+        heartbeats = get_heartbeats()
+        folder = current_app.config['DATA_UPLOADS']
+        written = 0
+        try:
+            # the measurements first, a heartbeat failing to be written must not lose them
+            for name, filename in list(rows):
+                if heartbeats.known(name):
+                    with open(os.path.join(folder, filename), 'a') as f:
+                        f.write(''.join(rows[name, filename]))
+                    written += len(rows[name, filename])
+                del rows[name, filename]
+        except Exception:
+            # the rows not written yet go before the ones received meanwhile
+            with self._lock:
+                for key, chunks in rows.items():
+                    self._rows[key] = chunks + self._rows.get(key, [])
+            raise
+
+        presence = get_presence()
+        for name, ip in beats.items():
+            if heartbeats.known(name):
+                heartbeats.beat(name, ip)
+                presence.beat(name, ip)
+        # the coalescer keeps the heartbeats it could not write for its next flush
+        heartbeats.flush()
+        return len(beats) + written
+
+    def run(self, client, duration=None):
+        """Process messages until ``duration`` seconds elapsed, forever if None."""
+        config = self.app.config
+        client.on_connect = self.on_connect
+        client.on_message = self.on_message
+        client.connect_async(config['MQTT_BROKER_URL'], config['MQTT_BROKER_PORT'], config['MQTT_KEEPALIVE'])
+        client.loop_start()
+        deadline = None if duration is None else time.monotonic() + duration
+        try:
+            while deadline is None or time.monotonic() < deadline:
+                wait = self.interval if deadline is None else min(self.interval, deadline - time.monotonic())
+                if self._stop.wait(max(wait, 0)):
+                    break
+                self._run_once()
+        finally:
+            client.disconnect()
+            client.loop_stop()
+            self._run_once()
+
+    def _run_once(self):
+        try:
+            self.flush()
+        except Exception:
+            self.app.logger.exception('Could not write the tray telemetry.')
+
+    def stop(self):
+        self._stop.set()
+
+
+@click.command('ingest')
+@click.option('--interval', type=float, help='Seconds between two batched writes.')
+@click.option('--duration', type=float, help='Stop after this many seconds.')
+@with_appcontext
+def ingest_command(interval, duration):
+    """Subscribe to lsg/+ and store the heartbeats and measurements of the trays."""
+    app = current_app._get_current_object()
+    if interval is None:
+        interval = app.config['MQTT_INGEST_INTERVAL']
+    ingestor = TelemetryIngestor(app, interval)
+    click.echo('Listening on {0}:{1}.'.format(app.config['MQTT_BROKER_URL'], app.config['MQTT_BROKER_PORT']))
+    try:
+        ingestor.run(create_client(app.config), duration)
+    except KeyboardInterrupt:
+        pass
+    click.echo('Received {0} messages, rejected {1}.'.format(ingestor.received, ingestor.rejected))
@@ -0,0 +1,144 @@
+import re
+import sqlite3
+import time
+
+from flask import current_app, g, render_template
+
+_literals = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\b\d+(?:\.\d+)?\b")
+_spaces = re.compile(r'\s+')
+
+
+def normalize(sql):
+    """Collapse whitespace and replace literals by ``?`` so equal statements group together."""
+    return _spaces.sub(' ', _literals.sub('?', sql)).strip()
+
+
+class Statement(object):
+    __slots__ = ('sql', 'duration', 'rows')
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.duration = 0.0
+        self.rows = 0
+
+    @property
+    def normalized(self):
+        return normalize(self.sql)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor adding its execution and fetch time to the statement it runs."""
+
+    statement = None
+
+    def _record(self, sql):
+        statements = self.connection.statements
+        if statements is None:
+            self.statement = None
+        else:
+            self.statement = Statement(sql)
+            statements.append(self.statement)
+
+    def _timed(self, method, *args):
+        if self.statement is None:
+            return method(*args)
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self.statement.duration += time.perf_counter() - start
+
+    def execute(self, sql, parameters=()):
+        self._record(sql)
+        self._timed(super().execute, sql, parameters)
+        if self.statement is not None and self.rowcount > 0:
+            self.statement.rows = self.rowcount
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._record(sql)
+        self._timed(super().executemany, sql, seq_of_parameters)
+        if self.statement is not None and self.rowcount > 0:
+            self.statement.rows = self.rowcount
+        return self
+
+    def executescript(self, sql_script):
+        self._record(sql_script)
+        self._timed(super().executescript, sql_script)
+        return self
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is not None and self.statement is not None:
+            self.statement.rows += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, self.arraysize if size is None else size)
+        if self.statement is not None:
+            self.statement.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        if self.statement is not None:
+            self.statement.rows += len(rows)
+        return rows
+
+    def __next__(self):
+        row = self._timed(super().__next__)
+        if self.statement is not None:
+            self.statement.rows += 1
+        return row
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection recording every statement into ``statements`` while it is a list."""
+
+    statements = None
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+def statements():
+    """Return the statements recorded for the current request."""
+    db = g.get('db')
+    if db is None or db.statements is None:
+        return []
+    return db.statements
+
+
+def server_timing(response):
+    if 'db' not in g or not current_app.config['SQL_INSTRUMENTATION']:
+        return response
+
+    recorded = statements()
+    duration = sum(s.duration for s in recorded) * 1000
+    response.headers.add(
+        'Server-Timing',
+        'sql;dur={0:.2f};desc="{1} queries, {2} rows"'.format(
+            duration, len(recorded), sum(s.rows for s in recorded))
+    )
+
+    if (current_app.config['SQL_DEBUG_PANEL'] and response.mimetype == 'text/html'
+            and not response.direct_passthrough and not response.is_streamed):
+        panel = render_template('debug/queries.html', statements=recorded, duration=duration)
+        body = response.get_data(as_text=True)
+        index = body.rfind('</body>')
+        if index != -1:
+            response.set_data(body[:index] + panel + body[index:])
+    return response
+
+
+def init_app(app):
+    app.after_request(server_timing)
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import re
+
+from flask import current_app
+from werkzeug.exceptions import abort
+
+
+def like_pattern(word):
+    return '%' + word.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+class Listing(object):
+    """Server side processing of a list page, in the format of the DataTables plugin.
+
+    Sorting, searching and counting are done by SQLite. A page carries the sort
+    value and the key of its last row as ``next``: the following page is asked
+    with ``after=<next>`` and starts with an index seek instead of an OFFSET.
+    Jumping to an arbitrary page falls back to ``start``. The rows are counted
+    apart, see ``count``, unless they all fit in the first page.
+    """
+
+    def __init__(self, columns, tables, key, sortable, searchable, where='1'):
+        self.columns = columns
+        self.tables = tables
+        # the first table, with its alias, the rows are counted on
+        self.table = re.split(r'\s+(?:INNER\s+)?JOIN\s+', tables, 1, flags=re.IGNORECASE)[0]
+        self.key = key
+        # column name sent by DataTables -> SQL expression, NULL free so that rows compare
+        self.sortable = sortable
+        self.searchable = searchable
+        self.where = where
+
+    def search(self, text):
+        """Return the ``(clause, parameters)`` matching rows containing every word of ``text``."""
+        clauses, parameters = [], []
+        for word in text.split():
+            clauses.append('(' + ' OR '.join(column + " LIKE ? ESCAPE '\\'" for column in self.searchable) + ')')
+            parameters += [like_pattern(word)] * len(self.searchable)
+        return ' AND '.join(clauses), parameters
+
+    def count(self, db, base, parameters, search='', search_parameters=()):
+        """Return the number of rows matching ``base`` and of the ones matching ``search`` too.
+
+        The rows are counted on the first table alone, through its indexes; the
+        joins, which every row has through its foreign keys, are only added to
+        count the rows a search matches.
+        """
+        if not search:
+            total = db.execute('SELECT count(*) FROM {0} WHERE {1}'.format(self.table, base), parameters).fetchone()[0]
+            return total, total
+        return tuple(db.execute(
+            'SELECT (SELECT count(*) FROM {0} WHERE {1}), (SELECT count(*) FROM {2} WHERE {1} AND {3})'.format(
+                self.table, base, self.tables, search
+            ), list(parameters) + list(parameters) + list(search_parameters)
+        ).fetchone())
+
+    def page(self, db, args, where=None, parameters=()):
+        """Return the page asked by ``args``, ``where`` replaces the base filter of the listing."""
+        config = current_app.config
+        start = max(args.get('start', 0, type=int), 0)
+        length = args.get('length', config['LISTING_PAGE_SIZE'], type=int)
+        if length <= 0 or length > config['LISTING_MAX_PAGE_SIZE']:
+            length = config['LISTING_MAX_PAGE_SIZE']
+        column = args.get('order[0][column]')
+        name = args.get('columns[{0}][data]'.format(column)) if column is not None else None
+        sort = self.sortable.get(name, self.key)
+        direction = 'DESC' if args.get('order[0][dir]') == 'desc' else 'ASC'
+        text = ' '.join(args.get('search[value]', '').split())
+        search, search_parameters = self.search(text)
+        base, base_parameters = where or self.where, list(parameters)
+        # a cursor made for another order, search or filter is ignored; the digest keeps them from the browser
+        signature = hashlib.sha1(repr((base, text, base_parameters, sort, direction)).encode('utf8')).hexdigest()
+
+        clauses, parameters = [base], list(base_parameters)
+        if search:
+            clauses.append(search)
+            parameters += search_parameters
+        after = None
+        if args.get('after'):
+            try:
+                after = json.loads(args['after'])
+                valid = isinstance(after, list) and len(after) == 3
+            except ValueError:
+                valid = False
+            if not valid:
+                abort(400, 'Invalid cursor.')
+            if after[0] != signature:
+                after = None
+        if after is not None:
+            operator = '<' if direction == 'DESC' else '>'
+            if sort == self.key:
+                clauses.append('{0} {1} ?'.format(self.key, operator))
+                parameters.append(after[2])
+            else:
+                clauses.append('({0}, {1}) {2} (?, ?)'.format(sort, self.key, operator))
+                parameters += after[1:]
+            start_offset = 0
+        else:
+            start_offset = start
+
+        order = '{0} {1}'.format(sort, direction)
+        if sort != self.key:
+            order += ', {0} {1}'.format(self.key, direction)
+        rows = db.execute(
+            'SELECT {0}, {1} AS _sort, {2} AS _key FROM {3} WHERE {4} ORDER BY {5} LIMIT ? OFFSET ?'.format(
+                self.columns, sort, self.key, self.tables, ' AND '.join(clauses), order
+            ), parameters + [length, start_offset]
+        ).fetchall()
+
+        if after is None and not start and len(rows) < length:
+            # the whole result fits in the first page
+            filtered = len(rows)
+            total = filtered if not search else self.count(db, base, base_parameters)[0]
+        else:
+            total, filtered = self.count(db, base, base_parameters, search, search_parameters)
+
+        data = []
+        for row in rows:
+            data.append({column: row[column] for column in row.keys() if column not in ('_sort', '_key')})
+        cursor = None
+        if len(rows) == length:
+            cursor = [signature, rows[-1]['_sort'], rows[-1]['_key']]
+        return {
+            'draw': args.get('draw', 0, type=int),
+            'recordsTotal': total,
+            'recordsFiltered': filtered,
+            'start': start,
+            'length': length,
+            'data': data,
+            'next': cursor,
+        }
@@ -0,0 +1,72 @@
+from flask import Blueprint, jsonify, request
+from flask import current_app as app
+
+from lsg_web.auth import login_required
+from lsg_web.db import get_db
+from lsg_web.listing import like_pattern
+
+bp = Blueprint('lookup', __name__, url_prefix='/lookup')
+
+# kind -> key and rows of the table looked up, as indexed by migration 0009
+KINDS = {
+    'person': ('id_person', 'person WHERE actif = 1'),
+    'food': ('id_food', 'food WHERE 1'),
+}
+
+
+def prefix_pattern(text):
+    return like_pattern(text)[1:]
+
+
+def lookup(db, kind, text, limit, exclude=None, parameters=()):
+    """Return the ``limit`` first names of ``kind`` containing ``text``, the ones starting with it first.
+
+    Three characters or more are looked up in the trigram index, fewer in
+    the index of the names. ``exclude`` is a subquery of ids left out.
+    """
+    text = ' '.join(text.split())
+    if not text:
+        return []
+    key, source = KINDS[kind]
+    if len(text) >= 3:
+        clauses, values = ['lookup MATCH ?', 'kind = ?'], ['"{0}"'.format(text.replace('"', '""')), kind]
+        if exclude is not None:
+            clauses.append('id NOT IN ({0})'.format(exclude))
+            values += parameters
+        rows = db.execute(
+            "SELECT id, name FROM lookup WHERE {0} ORDER BY name NOT LIKE ? ESCAPE '\\', name COLLATE NOCASE, id "
+            'LIMIT ?'.format(' AND '.join(clauses)), values + [prefix_pattern(text), limit]
+        ).fetchall()
+    else:
+        clauses, values = ["name LIKE ? ESCAPE '\\'"], [prefix_pattern(text)]
+        if exclude is not None:
+            clauses.append('{0} NOT IN ({1})'.format(key, exclude))
+            values += parameters
+        rows = db.execute(
+            'SELECT {0} AS id, name FROM {1} AND {2} ORDER BY name COLLATE NOCASE, {0} LIMIT ?'.format(
+                key, source, ' AND '.join(clauses)
+            ), values + [limit]
+        ).fetchall()
+    return [{'id': row['id'], 'name': row['name']} for row in rows]
+
+
+def hits(kind, exclude=None, parameters=()):
+    limit = min(max(request.args.get('limit', 10, type=int), 1), app.config['LOOKUP_MAX_HITS'])
+    text = request.args.get('q', '')
+    return jsonify({'query': text, 'hits': lookup(get_db(), kind, text, limit, exclude, parameters)})
+
+
+@bp.route('/person')
+@login_required
+def person():
+    return hits('person')
+
+
+@bp.route('/food')
+@login_required
+def food():
+    """Foods matching ``q``, without the ones already in the menu ``menu`` if given."""
+    menu = request.args.get('menu', type=int)
+    if menu is None:
+        return hits('food')
+    return hits('food', 'SELECT id_food FROM composed WHERE id_menu = ?', [menu])
@@ -1,38 +1,88 @@
 from flask import (
-    Blueprint, flash, g, redirect, render_template, request, url_for
+    Blueprint, Response, flash, g, jsonify, redirect, render_template, request, stream_with_context, url_for
 )
 from flask import current_app as app
-from flask import send_from_directory
 
 from werkzeug.exceptions import abort
 
 from lsg_web.auth import login_required, security_required
+from lsg_web.cache import TTLCache
+from lsg_web.catalog import catalog
 from lsg_web.db import get_db
+from lsg_web.export import export_meals
+from lsg_web.facets import FILTERS, facet_counts, meal_filter
+from lsg_web.generation import request_counters
+from lsg_web.listing import Listing
+from lsg_web.outbox import enqueue, get_publisher, tray_topic
+from lsg_web.presence import get_presence
+from lsg_web.recording import recording_mtime, send_recording
+from lsg_web.series import Pyramid, load_series
 from lsg_web.useful import set_actif
 
-import paho.mqtt.publish as publish
-
 bp = Blueprint('meal', __name__, url_prefix='/meal')
 
+MEALS = Listing(
+    'id_meal, u.name as uname, m.name as mname, m.information as minformation, t.name as tname, c.name as cname, end',
+    'meal p JOIN person u ON p.id_user = u.id_person JOIN menu m ON m.id_menu = p.id_menu '
+    'JOIN tray t ON t.id_tray = p.id_tray JOIN person c ON p.id_candidate = c.id_person',
+    key='p.id_meal',
+    sortable={'uname': 'u.name', 'cname': 'c.name', 'mname': 'm.name', 'minformation': "coalesce(m.information, '')",
+              'end': "coalesce(p.end, '')", 'tname': 't.name'},
+    searchable=('u.name', 'c.name', 'm.name', 'm.information', 't.name', 'p.information')
+)
+
+
+def open_meals():
+    """Return the number of meals without an end.
+
+    The counter is kept by triggers on the meal table, so reading it does not
+    depend on the size of the meal history.
+    """
+    value = request_counters(['open_meals'])['open_meals']
+    if value is None or value < 0:
+        return recount_open_meals()
+    return value
+
+
+def recount_open_meals():
+    """Count the open meals again, store the count in its own transaction and return it."""
+    db = get_db()
+    if db.in_transaction:
+        # while a page is rendered, what its view left pending is not ours to commit
+        return db.execute('SELECT count(id_meal) FROM meal WHERE end IS NULL').fetchone()[0]
+    db.execute(
+        "INSERT OR REPLACE INTO counter (name, value) "
+        "SELECT 'open_meals', count(id_meal) FROM meal WHERE end IS NULL"
+    )
+    db.commit()
+    return db.execute("SELECT value FROM counter WHERE name = 'open_meals'").fetchone()[0]
+
 
 @bp.route('/list')
 @login_required
 def listing():
-    db = get_db()
-    meals = db.execute(
-        'SELECT id_meal, u.name as uname, m.name as mname, m.information as minformation, t.name as tname, '
-        'c.name as cname, end FROM meal p JOIN person u ON p.id_user = u.id_person JOIN menu m '
-        'ON m.id_menu = p.id_menu JOIN tray t ON t.id_tray = p.id_tray JOIN person c ON p.id_candidate = c.id_person '
-        'WHERE p.actif == 1 ORDER BY p.id_meal ASC'
-    ).fetchall()
-    return render_template('meal/list.html', meals=meals)
+    filters = {name: request.args[name] for name in FILTERS if request.args.get(name)}
+    page = MEALS.page(get_db(), request.args, *meal_filter(filters))
+    return render_template('meal/list.html', page=page, filters=filters)
+
+
+@bp.route('/list/data')
+@login_required
+def listing_data():
+    return jsonify(MEALS.page(get_db(), request.args, *meal_filter(request.args)))
+
+
+@bp.route('/facets')
+@login_required
+def facets():
+    return jsonify(facet_counts(get_db(), request.args))
 
 
 @bp.route('/create', methods=('GET', 'POST'))
 @security_required
 def create():
     if request.method == 'POST':
-        error = check_meal_create(request)
+        error, tray = check_meal_create(request)
 
         if error is not None:
             flash(error)
@@ -47,16 +97,28 @@ def create():
             tmp_id = db.execute("SELECT last_insert_rowid();").fetchone()[0]
 
             db.execute('UPDATE tray SET on_use = 1 WHERE id_tray = ?', (request.form['tray'],))
-            trayname = db.execute("SELECT name FROM tray WHERE id_tray = ?", (request.form['tray'],)).fetchone()[0]
-            #publish.single("lsg/" + trayname.lower(), "SERVER\tSTART MEAL\t" + str(tmp_id) + ".csv", hostname=app.config['MQTT_BROKER_URL'])
+            trayname = tray['name']
+            enqueue(db, tray_topic(trayname), "SERVER\tSTART MEAL\t" + str(tmp_id) + ".csv")
             db.commit()
+            get_presence().set_on_use(trayname, 1)
+            get_publisher().notify()
             return redirect(url_for('index'))
 
-    menus = get_db().execute('SELECT * FROM menu WHERE actif = 1').fetchall()
-    trays = get_db().execute('SELECT * FROM tray WHERE actif = 1 AND on_use = 0 AND online = 1 AND timestamp > datetime("now", "-30 seconds")').fetchall()
-    trays = get_db().execute('SELECT * FROM tray WHERE actif = 1 AND on_use = 0').fetchall()
-    persons = get_db().execute('SELECT * FROM person ORDER BY id_person ASC').fetchall()
-    return render_template('meal/create.html', menus=menus, trays=trays, persons=persons)
+    menus = catalog('menus')
+    trays = get_db().execute(
+        'SELECT id_tray, name, ip, on_use, CAST(strftime("%s", timestamp) AS INTEGER) AS seen FROM tray '
+        'WHERE actif = 1 AND on_use = 0'
+    ).fetchall()
+    presence = get_presence()
+    for tray in trays:
+        presence.merge(tray['name'], tray['ip'], tray['on_use'], tray['seen'])
+    # online trays first, offline ones stay selectable
+    trays = sorted(
+        ({'id_tray': tray['id_tray'], 'name': tray['name'], 'online': presence.is_online(tray['name'])} for tray in trays),
+        key=lambda tray: not tray['online']
+    )
+    # the candidates are looked up as they are typed, see lsg_web/lookup.py
+    return render_template('meal/create.html', menus=menus, trays=trays)
 
 
 @bp.route('/<int:id>/update', methods=('GET', 'POST'))
@@ -77,14 +139,17 @@ def update(id):
             db.commit()
             return redirect(url_for('meal.listing'))
 
-    menus = get_db().execute('SELECT * FROM menu WHERE actif = 1').fetchall()
-    persons = get_db().execute('SELECT * FROM person ORDER BY id_person ASC').fetchall()
-    return render_template('meal/update.html', meal=meal, menus=menus, persons=persons)
+    menus = catalog('menus')
+    candidate = get_db().execute(
+        'SELECT id_person, name FROM person WHERE id_person = ?', (meal['id_candidate'],)
+    ).fetchone()
+    return render_template('meal/update.html', meal=meal, menus=menus, candidate=candidate)
 
 
 def check_meal(request):
     menu = request.form['menu']
-    person = request.form['person']
+    # the candidate select is empty until a name is looked up
+    person = request.form.get('person', '')
     information = request.form['information']
 
     if not menu:
@@ -104,16 +169,16 @@ def check_meal(request):
 
 
 def check_meal_create(request):
+    """Return the error of the form, if any, and the tray it selects."""
     error = check_meal(request)
-    tray = request.form['tray']
-
-    if not tray:
-        return 'You must select a tray.'
-    elif get_db().execute(
-            'SELECT * FROM tray WHERE id_tray = ? AND actif = 1 AND on_use = 0', (tray,)
-    ).fetchone() is None:
-        return 'You must select a valid tray.'
-    return error
+    if not request.form.get('tray'):
+        return 'You must select a tray.', None
+    tray = get_db().execute(
+        'SELECT * FROM tray WHERE id_tray = ? AND actif = 1 AND on_use = 0', (request.form['tray'],)
+    ).fetchone()
+    if tray is None:
+        return 'You must select a valid tray.', None
+    return error, tray
 
 
 def get_meal(id):
@@ -136,8 +201,10 @@ def finished(id):
     db.execute('UPDATE meal SET end = datetime("now", "localtime") WHERE id_meal = ?', (id,))
     db.execute('UPDATE tray SET on_use = 0 WHERE id_tray = ?', (meal['id_tray'],))
     trayname = db.execute("SELECT name FROM tray WHERE id_tray = ?", (meal['id_tray'],)).fetchone()[0]
-    #publish.single("lsg/" + trayname.lower(), "SERVER\tEND MEAL\t", hostname=app.config['MQTT_BROKER_URL'])
+    enqueue(db, tray_topic(trayname), "SERVER\tEND MEAL\t")
     db.commit()
+    get_presence().set_on_use(trayname, 0)
+    get_publisher().notify()
     return redirect(url_for('index'))
 
 
@@ -156,12 +223,54 @@ def info(id):
     return render_template('meal/info.html', meal=meal, imgname="data/" + str(id) + ".png")
 
 
+def get_pyramid(id):
+    cache = app.extensions.get('lsg_pyramids')
+    if cache is None:
+        cache = app.extensions.setdefault('lsg_pyramids', TTLCache(
+            app.config['SERIES_CACHE_SIZE'], app.config['SERIES_CACHE_TTL']
+        ))
+    folder = app.config["DATA_UPLOADS"]
+    # a new recording of the meal gets a new pyramid
+    key = (id, recording_mtime(folder, id))
+    pyramid = cache.get(key)
+    if pyramid is None:
+        pyramid = Pyramid(load_series(folder, id))
+        cache.set(key, pyramid)
+    return pyramid
+
+
+@bp.route('/<int:id>/series', methods=('GET',))
+@login_required
+def series(id):
+    get_meal(id)
+    points = min(request.args.get('points', 500, type=int), app.config['SERIES_MAX_POINTS'])
+    if points < 1:
+        abort(400, "You must ask for at least one point.")
+    try:
+        pyramid = get_pyramid(id)
+    except (OSError, ValueError):
+        abort(404, "Meal id {0} has no data.".format(id))
+    return jsonify(id=id, **pyramid.query(
+        points, request.args.get('from', type=float), request.args.get('to', type=float)
+    ))
+
+
 @bp.route('/<int:id>/download', methods=('GET',))
 @login_required
 def download(id):
-    meal = get_meal(id)
-    filename = str(id) + ".csv"
-    return send_from_directory(app.config["DATA_UPLOADS"], filename=filename)
+    get_meal(id)
+    return send_recording(app.config["DATA_UPLOADS"], id)
+
+
+@bp.route('/export', methods=('GET',))
+@login_required
+def export():
+    response = Response(
+        stream_with_context(export_meals(get_db(), app.config["DATA_UPLOADS"], request.args)),
+        mimetype='application/zip'
+    )
+    response.headers['Content-Disposition'] = 'attachment; filename=meals.zip'
+    return response
 
 
 @bp.route('/<int:id>/delete', methods=('POST',))
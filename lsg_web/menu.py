@@ -1,25 +1,39 @@
+import json
+
 from flask import (
-    Blueprint, flash, g, redirect, render_template, request, url_for
+    Blueprint, flash, g, jsonify, redirect, render_template, request, url_for
 )
 from werkzeug.exceptions import abort
 
 from lsg_web.auth import login_required, security_required
 from lsg_web.db import get_db
 from lsg_web.food import get_food
+from lsg_web.listing import Listing
+from lsg_web.pages import cached_page
 from lsg_web.useful import set_actif
 
 bp = Blueprint('menu', __name__, url_prefix='/menu')
 
+MENUS = Listing(
+    'id_menu , m.name as mname, p.name as pname, m.information as minformation',
+    'menu m INNER JOIN person p on m.id_person = p.id_person',
+    key='m.id_menu',
+    sortable={'mname': 'm.name', 'minformation': "coalesce(m.information, '')", 'pname': 'p.name'},
+    searchable=('m.name', 'm.information', 'p.name'),
+    where='m.actif = 1'
+)
+
 
 @bp.route('/list')
 @login_required
 def listing():
-    db = get_db()
-    menus = db.execute(
-        'SELECT id_menu , m.name as mname, p.name as pname, m.information as minformation '
-        'FROM menu m INNER JOIN person p on m.id_person = p.id_person WHERE m.actif = 1 ORDER BY m.id_menu ASC'
-    ).fetchall()
-    return render_template('menu/list.html', menus=menus)
+    return render_template('menu/list.html', page=MENUS.page(get_db(), request.args))
+
+
+@bp.route('/list/data')
+@login_required
+def listing_data():
+    return jsonify(MENUS.page(get_db(), request.args))
 
 
 @bp.route('/create', methods=('GET', 'POST'))
@@ -70,6 +84,7 @@ def check_composed(quantity, id1, id2):
 
 @bp.route('/<int:id>/info', methods=('GET',))
 @login_required
+@cached_page('menu', 'composed', 'food', 'category', 'person')
 def info(id):
     db = get_db()
     get_menu(id)
@@ -117,7 +132,8 @@ def add(id):
     db = get_db()
     menu = get_menu(id, True)
     if request.method == 'POST':
-        error = check_composed(request.form['quantity'], id, request.form['food'])
+        # the food select is empty until a name is looked up
+        error = check_composed(request.form['quantity'], id, request.form.get('food'))
         if error is not None:
             flash(error)
         else:
@@ -129,11 +145,8 @@ def add(id):
             )
             db.commit()
             return redirect(url_for('menu.info', id=id))
-    foods = db.execute(
-        'SELECT * FROM food WHERE id_food NOT IN (SELECT id_food FROM composed WHERE id_menu = ? )',
-        (id,)
-    )
-    return render_template('menu/add.html', foods=foods, menu=menu)
+    # the foods are looked up as they are typed, see lsg_web/lookup.py
+    return render_template('menu/add.html', menu=menu)
 
 
 @bp.route('/<int:id>/delete', methods=('POST',))
@@ -168,32 +181,37 @@ def update(id):
     return render_template('menu/update.html', menu=menu)
 
 
-@bp.route('/<int:id>/copy', methods=('POST', ))
-@security_required
-def copy(id):
-    menu = get_menu(id)
+def clone_menus(db, ids, id_person):
+    """Copy the menus of ``ids`` with their foods and return the ids of the copies, in the same order.
 
-    db = get_db()
+    Two statements whatever the number of menus and foods: the menus are copied
+    by one INSERT ... SELECT, whose AUTOINCREMENT keys follow each other, then
+    all their foods by another. The caller commits.
+    """
+    if not ids:
+        return []
     db.execute(
-        'INSERT INTO menu (name, information, actif, id_person)'
-        ' VALUES (?, ?, ?, ?)',
-        (menu['name']+'_copy', menu['information'], 1, g.user['id_person'])
+        "INSERT INTO menu (name, information, actif, id_person) "
+        "SELECT m.name || '_copy', m.information, 1, ? FROM json_each(?) j JOIN menu m ON m.id_menu = j.value "
+        "ORDER BY j.key", (id_person, json.dumps(ids))
     )
-    id_copy = db.execute(
-        "SELECT last_insert_rowid();"
-    ).fetchone()[0]
+    last = db.execute('SELECT last_insert_rowid()').fetchone()[0]
+    copies = list(range(last - len(ids) + 1, last + 1))
+    db.execute(
+        "INSERT INTO composed (id_menu, id_food, quantity) "
+        "SELECT json_extract(j.value, '$[1]'), c.id_food, c.quantity "
+        "FROM json_each(?) j JOIN composed c ON c.id_menu = json_extract(j.value, '$[0]')",
+        (json.dumps(list(zip(ids, copies))),)
+    )
+    return copies
 
-    all_composed = db.execute(
-        "SELECT * FROM composed WHERE id_menu = ?",
-        (id,)
-    ).fetchall()
-
-    for e in all_composed:
-        db.execute(
-            "INSERT INTO composed(id_menu, id_food, quantity) VALUES "
-            "(?, ?, ?)",
-            (id_copy, e['id_food'], e['quantity'])
-        )
+
+@bp.route('/<int:id>/copy', methods=('POST', ))
+@security_required
+def copy(id):
+    get_menu(id)
+    db = get_db()
+    id_copy = clone_menus(db, [id], g.user['id_person'])[0]
     db.commit()
     return redirect(url_for('menu.info', id=id_copy))
 
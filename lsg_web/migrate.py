@@ -0,0 +1,104 @@
+import importlib.util
+import os
+import re
+import time
+
+MIGRATIONS = os.path.join(os.path.dirname(__file__), 'migrations')
+
+_filename = re.compile(r'^(\d+)_(\w+)\.(sql|py)$')
+
+
+def find_migrations(path=None):
+    """Return ``(version, name, filename)`` for every migration in ``path``.
+
+    Migrations are named ``<version>_<name>.sql`` or ``<version>_<name>.py``.
+    A Python migration defines ``upgrade(db)``.
+    """
+    path = path or MIGRATIONS
+    migrations = []
+    for filename in os.listdir(path) if os.path.isdir(path) else ():
+        match = _filename.match(filename)
+        if match is not None:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(path, filename)))
+    migrations.sort()
+
+    versions = [m[0] for m in migrations]
+    if len(set(versions)) != len(versions):
+        raise RuntimeError('Two migrations share the same version in {0}.'.format(path))
+    return migrations
+
+
+def current_version(db):
+    db.execute(
+        'CREATE TABLE IF NOT EXISTS schema_version ('
+        'version INTEGER PRIMARY KEY, name TEXT NOT NULL, applied DATETIME NOT NULL, duration REAL NOT NULL)'
+    )
+    return db.execute('SELECT max(version) FROM schema_version').fetchone()[0] or 0
+
+
+def apply(db, version, name, filename):
+    """Run one migration and record it in ``schema_version``.
+
+    SQL migrations run in a single transaction and must not contain BEGIN or
+    COMMIT themselves. Python migrations manage their own transactions, so a
+    long rewrite can commit between batches; they must be safe to run again if
+    interrupted.
+    """
+    start = time.perf_counter()
+    try:
+        if filename.endswith('.sql'):
+            with open(filename, encoding='utf8') as f:
+                db.executescript('BEGIN;\n' + f.read())
+        else:
+            spec = importlib.util.spec_from_file_location('lsg_web.migrations.m{0:04d}'.format(version), filename)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            module.upgrade(db)
+        duration = time.perf_counter() - start
+        db.execute(
+            'INSERT INTO schema_version (version, name, applied, duration) VALUES (?, ?, datetime("now"), ?)',
+            (version, name, duration)
+        )
+        db.commit()
+    except Exception:
+        if db.in_transaction:
+            db.rollback()
+        raise
+    return duration
+
+
+def upgrade(db, target=None, path=None):
+    """Apply the pending migrations up to ``target``.
+
+    Yields ``(version, name, duration)`` after each applied step.
+    """
+    version = current_version(db)
+    for step, name, filename in find_migrations(path):
+        if step <= version or (target is not None and step > target):
+            continue
+        yield step, name, apply(db, step, name, filename)
+
+
+def run_in_batches(db, table, key, statement, batch_size=5000, pause=0):
+    """Run ``statement`` over ``table`` one ``key`` range at a time.
+
+    ``statement`` takes the exclusive lower and inclusive upper bound of the
+    range as its two parameters, e.g. ``... WHERE id_meal > ? AND id_meal <= ?``.
+    Each range is committed on its own so writers are never locked out for
+    longer than one batch.
+    """
+    low, high = db.execute(
+        'SELECT min({1}), max({1}) FROM {0}'.format(table, key)
+    ).fetchone()
+    if low is None:
+        return 0
+
+    rows = 0
+    bound = low - 1
+    while bound < high:
+        rows += db.execute(statement, (bound, bound + batch_size)).rowcount
+        db.commit()
+        bound += batch_size
+        if pause:
+            time.sleep(pause)
+    return rows
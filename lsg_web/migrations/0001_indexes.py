@@ -0,0 +1,35 @@
+"""Indexes of the pages and lookups, the names of the trays become unique."""
+
+INDEXES = '''
+-- open meals, read by the current_meal badge and the homepage
+CREATE INDEX IF NOT EXISTS meal_open ON meal(id_meal) WHERE end IS NULL;
+CREATE INDEX IF NOT EXISTS meal_actif ON meal(id_meal) WHERE actif = 1;
+CREATE INDEX IF NOT EXISTS meal_candidate ON meal(id_candidate, id_meal);
+
+CREATE INDEX IF NOT EXISTS composed_menu_food ON composed(id_menu, id_food, quantity);
+
+CREATE UNIQUE INDEX IF NOT EXISTS tray_name ON tray(name);
+CREATE INDEX IF NOT EXISTS tray_free ON tray(id_tray) WHERE actif = 1 AND on_use = 0;
+
+CREATE INDEX IF NOT EXISTS menu_actif ON menu(id_menu) WHERE actif = 1;
+
+CREATE INDEX IF NOT EXISTS user_person ON user(id_person);
+
+CREATE INDEX IF NOT EXISTS bug_open ON bug(id_bug) WHERE corrected = 0;
+CREATE INDEX IF NOT EXISTS bug_title ON bug(title);
+
+CREATE INDEX IF NOT EXISTS category_name ON category(name);
+CREATE INDEX IF NOT EXISTS version_name ON version(name);
+'''
+
+
+def upgrade(db):
+    duplicates = [row[0] for row in db.execute(
+        'SELECT name FROM tray GROUP BY name HAVING count(id_tray) > 1 ORDER BY name'
+    ).fetchall()]
+    if duplicates:
+        raise RuntimeError(
+            'The tray names must be unique but {0} are registered more than once, '
+            'rename the duplicates and upgrade again.'.format(', '.join(repr(name) for name in duplicates))
+        )
+    db.executescript('BEGIN;' + INDEXES + 'COMMIT;')
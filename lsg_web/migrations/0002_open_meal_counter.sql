@@ -0,0 +1,25 @@
+-- live counters shared by every worker process, kept in step by triggers
+CREATE TABLE counter(
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+) WITHOUT ROWID;
+
+INSERT INTO counter (name, value)
+SELECT 'open_meals', count(id_meal) FROM meal WHERE end IS NULL;
+
+CREATE TRIGGER meal_open_insert AFTER INSERT ON meal WHEN NEW.end IS NULL
+BEGIN
+    UPDATE counter SET value = value + 1 WHERE name = 'open_meals';
+END;
+
+CREATE TRIGGER meal_open_update AFTER UPDATE OF end ON meal
+WHEN (OLD.end IS NULL) != (NEW.end IS NULL)
+BEGIN
+    UPDATE counter SET value = value + (CASE WHEN NEW.end IS NULL THEN 1 ELSE -1 END)
+    WHERE name = 'open_meals';
+END;
+
+CREATE TRIGGER meal_open_delete AFTER DELETE ON meal WHEN OLD.end IS NULL
+BEGIN
+    UPDATE counter SET value = value - 1 WHERE name = 'open_meals';
+END;
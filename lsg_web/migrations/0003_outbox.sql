@@ -0,0 +1,14 @@
+-- MQTT messages written with the change that produced them, deleted once the
+-- broker acknowledged them
+CREATE TABLE outbox(
+    id_message INTEGER PRIMARY KEY AUTOINCREMENT,
+    topic TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    qos INTEGER NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available REAL NOT NULL,
+    claim TEXT
+);
+
+CREATE INDEX outbox_available ON outbox(available);
+CREATE INDEX outbox_claim ON outbox(claim);
@@ -0,0 +1,15 @@
+-- resumable uploads of the meal recordings, the data lives in DATA_UPLOADS/.<id_meal>.csv.part
+CREATE TABLE upload(
+    id_meal INTEGER PRIMARY KEY,
+    opened TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (id_meal) REFERENCES meal(id_meal)
+);
+
+CREATE TABLE upload_chunk(
+    id_meal INTEGER NOT NULL,
+    number INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    PRIMARY KEY (id_meal, number),
+    FOREIGN KEY (id_meal) REFERENCES upload(id_meal)
+) WITHOUT ROWID;
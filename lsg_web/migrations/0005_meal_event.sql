@@ -0,0 +1,20 @@
+-- starts and ends of meals, read by the live feed of every worker process
+CREATE TABLE meal_event(
+    id_event INTEGER PRIMARY KEY AUTOINCREMENT,
+    id_meal INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    created TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX meal_event_created ON meal_event(created);
+
+CREATE TRIGGER meal_event_start AFTER INSERT ON meal WHEN NEW.end IS NULL
+BEGIN
+    INSERT INTO meal_event (id_meal, kind) VALUES (NEW.id_meal, 'start');
+END;
+
+CREATE TRIGGER meal_event_finish AFTER UPDATE OF end ON meal
+WHEN OLD.end IS NULL AND NEW.end IS NOT NULL
+BEGIN
+    INSERT INTO meal_event (id_meal, kind) VALUES (NEW.id_meal, 'finish');
+END;
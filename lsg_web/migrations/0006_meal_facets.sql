@@ -0,0 +1,7 @@
+-- faceted meal filters: the listing keeps its order on id_meal for one tray or menu,
+-- the counts per facet read a covering index, all of it or a range of days
+CREATE INDEX meal_tray ON meal(id_tray, id_meal) WHERE actif = 1;
+CREATE INDEX meal_menu ON meal(id_menu, id_meal) WHERE actif = 1;
+CREATE INDEX meal_facets ON meal(actif, id_tray, id_menu, id_candidate, end, start);
+CREATE INDEX meal_started ON meal(actif, start, id_tray, id_menu, id_candidate, end);
+CREATE INDEX meal_ended ON meal(actif, end, id_tray, id_menu, id_candidate, start);
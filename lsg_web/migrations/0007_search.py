@@ -0,0 +1,42 @@
+"""Full-text index of the free text of foods, menus, bugs and meals, kept in sync by triggers."""
+
+from lsg_web.search import SOURCES as TABLES
+
+# the rowid of an entry is key * 4 + position of its kind, `lsg rebuild-search` writes the same ones
+TRIGGERS = '''
+CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table} WHEN {new_condition} BEGIN
+    INSERT INTO search (rowid, kind, id, title, body)
+    VALUES (NEW.{key} * 4 + {position}, '{kind}', NEW.{key}, {new_title}, NEW.{body});
+END;
+CREATE TRIGGER IF NOT EXISTS {table}_search_update AFTER UPDATE OF {columns} ON {table} BEGIN
+    DELETE FROM search WHERE rowid = OLD.{key} * 4 + {position};
+    INSERT INTO search (rowid, kind, id, title, body)
+    SELECT NEW.{key} * 4 + {position}, '{kind}', NEW.{key}, {new_title}, NEW.{body} WHERE {new_condition};
+END;
+CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table} BEGIN
+    DELETE FROM search WHERE rowid = OLD.{key} * 4 + {position};
+END;
+'''
+
+
+def upgrade(db):
+    db.executescript(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search USING fts5("
+        "kind UNINDEXED, id UNINDEXED, title, body, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3');"
+    )
+    # a word of the title weighs as much as ten of the body
+    db.execute("INSERT INTO search (search, rank) VALUES ('rank', 'bm25(0, 0, 10, 1)')")
+    db.execute('DELETE FROM search')
+    for position, (kind, table, key, title, body, condition) in enumerate(TABLES):
+        db.executescript(TRIGGERS.format(
+            table=table, key=key, position=position, kind=kind, body=body, new_condition=condition.format('NEW'),
+            new_title=title if title == 'NULL' else 'NEW.' + title,
+            columns=', '.join(column for column in (title, body, 'actif' if 'actif' in condition else 'NULL') if column != 'NULL')
+        ))
+        db.execute(
+            'INSERT INTO search (rowid, kind, id, title, body) SELECT {key} * 4 + {position}, ?, {key}, {title}, {body} '
+            'FROM {table} WHERE {condition}'.format(
+                key=key, position=position, title=title, body=body, table=table, condition=condition.format(table)
+            ), (kind,)
+        )
+    db.commit()
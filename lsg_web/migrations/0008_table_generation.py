@@ -0,0 +1,26 @@
+"""Write generation of the tables the caches of the workers are read from, bumped by triggers."""
+
+TABLES = ('category', 'version', 'menu', 'composed', 'food', 'person', 'user', 'permission', 'tray')
+
+# columns whose update bumps the generation, all of them if not listed
+UPDATED = {
+    # the heartbeats and the meals write the other ones all the time
+    'tray': 'name',
+}
+
+TRIGGER = '''
+CREATE TRIGGER IF NOT EXISTS {table}_generation_{name} AFTER {event} ON {table} BEGIN
+    UPDATE counter SET value = value + 1 WHERE name = 'generation_{table}';
+END;
+'''
+
+
+def upgrade(db):
+    for table in TABLES:
+        db.execute("INSERT OR IGNORE INTO counter (name, value) VALUES ('generation_' || ?, 0)", (table,))
+        for name in ('insert', 'update', 'delete'):
+            event = name.upper()
+            if name == 'update' and table in UPDATED:
+                event += ' OF ' + UPDATED[table]
+            db.executescript(TRIGGER.format(table=table, name=name, event=event))
+    db.commit()
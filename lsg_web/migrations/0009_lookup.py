@@ -0,0 +1,43 @@
+"""Trigram index of the names of the active persons and the foods for the typeahead lookups, kept in sync by triggers."""
+
+# kind, table, key, rows indexed; the rowid of an entry is key * 2 + position of its kind
+TABLES = (
+    ('person', 'person', 'id_person', '{0}.actif = 1'),
+    ('food', 'food', 'id_food', '1'),
+)
+
+TRIGGERS = '''
+CREATE TRIGGER IF NOT EXISTS {table}_lookup_insert AFTER INSERT ON {table} WHEN {new_condition} BEGIN
+    INSERT INTO lookup (rowid, kind, id, name) VALUES (NEW.{key} * 2 + {position}, '{kind}', NEW.{key}, NEW.name);
+END;
+CREATE TRIGGER IF NOT EXISTS {table}_lookup_update AFTER UPDATE OF {columns} ON {table} BEGIN
+    DELETE FROM lookup WHERE rowid = OLD.{key} * 2 + {position};
+    INSERT INTO lookup (rowid, kind, id, name)
+    SELECT NEW.{key} * 2 + {position}, '{kind}', NEW.{key}, NEW.name WHERE {new_condition};
+END;
+CREATE TRIGGER IF NOT EXISTS {table}_lookup_delete AFTER DELETE ON {table} BEGIN
+    DELETE FROM lookup WHERE rowid = OLD.{key} * 2 + {position};
+END;
+'''
+
+
+def upgrade(db):
+    db.executescript(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS lookup USING fts5(kind UNINDEXED, id UNINDEXED, name, tokenize = 'trigram');"
+        # the queries too short for a trigram read the names in order
+        'CREATE INDEX IF NOT EXISTS person_name ON person(name COLLATE NOCASE) WHERE actif = 1;'
+        'CREATE INDEX IF NOT EXISTS food_name ON food(name COLLATE NOCASE);'
+    )
+    db.execute('DELETE FROM lookup')
+    for position, (kind, table, key, condition) in enumerate(TABLES):
+        db.executescript(TRIGGERS.format(
+            table=table, key=key, position=position, kind=kind, new_condition=condition.format('NEW'),
+            columns='name, actif' if 'actif' in condition else 'name'
+        ))
+        db.execute(
+            'INSERT INTO lookup (rowid, kind, id, name) SELECT {key} * 2 + {position}, ?, {key}, name '
+            'FROM {table} WHERE {condition}'.format(
+                key=key, position=position, table=table, condition=condition.format(table)
+            ), (kind,)
+        )
+    db.commit()
@@ -0,0 +1,197 @@
+import atexit
+import os
+import threading
+import time
+import uuid
+
+import paho.mqtt.client as mqtt
+from flask import current_app
+
+from lsg_web.db import get_db
+
+
+def create_client(config):
+    """Return a paho client set up from the MQTT_* settings, not connected yet."""
+    client = mqtt.Client()
+    if config['MQTT_USERNAME']:
+        client.username_pw_set(config['MQTT_USERNAME'], config['MQTT_PASSWORD'] or None)
+    if config['MQTT_TLS_ENABLED']:
+        client.tls_set()
+    return client
+
+
+def tray_topic(name):
+    return 'lsg/' + name.lower()
+
+
+def enqueue(db, topic, payload, qos=None):
+    """Add a message to the outbox inside the current transaction of ``db``.
+
+    Nothing is sent before the caller commits, and nothing is lost if the
+    broker is down when it does.
+    """
+    if qos is None:
+        qos = current_app.config['MQTT_QOS']
+    db.execute(
+        'INSERT INTO outbox (topic, payload, qos, available) VALUES (?, ?, ?, ?)',
+        (topic, payload, qos, time.time())
+    )
+
+
+class OutboxPublisher(object):
+    """Long-lived MQTT client of a worker process delivering the outbox table.
+
+    A background thread claims the due messages, publishes them and deletes
+    the ones the broker acknowledged within ``MQTT_ACK_TIMEOUT`` seconds. The
+    others are published again later with an exponential backoff, so a
+    message can be received more than once but is never lost.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.enabled = app.config['MQTT_PUBLISHER_ENABLED']
+        self.ack_timeout = app.config['MQTT_ACK_TIMEOUT']
+        self.retry = app.config['MQTT_RETRY_INTERVAL']
+        self.batch = app.config['MQTT_OUTBOX_BATCH']
+        self._client = None
+        self._connected = threading.Event()
+        self._published = threading.Condition()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _connect(self):
+        config = self.app.config
+        client = create_client(config)
+        client.on_connect = self._on_connect
+        client.on_disconnect = self._on_disconnect
+        client.on_publish = self._on_publish
+        client.connect_async(config['MQTT_BROKER_URL'], config['MQTT_BROKER_PORT'], config['MQTT_KEEPALIVE'])
+        client.loop_start()
+        return client
+
+    def _on_connect(self, client, userdata, flags, rc):
+        if rc == 0:
+            self._connected.set()
+            self._wakeup.set()
+
+    def _on_disconnect(self, client, userdata, rc):
+        self._connected.clear()
+
+    def _on_publish(self, client, userdata, mid):
+        with self._published:
+            self._published.notify_all()
+
+    def notify(self):
+        """Wake the publisher up after a commit that added messages."""
+        if not self.enabled:
+            return
+        self._start()
+        self._wakeup.set()
+
+    def backoff(self, attempts):
+        return min(self.retry * 2 ** attempts, 300)
+
+    def deliver(self):
+        """Publish one batch of due messages and return how many were acknowledged."""
+        if not self._connected.wait(self.ack_timeout):
+            return 0
+
+        claim = uuid.uuid4().hex
+        now = time.time()
+        with self.app.app_context():
+            db = get_db()
+            # lease the batch so that the publishers of other workers skip it
+            db.execute(
+                'UPDATE outbox SET claim = ?, available = ? WHERE id_message IN ('
+                'SELECT id_message FROM outbox WHERE available <= ? ORDER BY id_message LIMIT ?)',
+                (claim, now + self.ack_timeout + self.retry, now, self.batch)
+            )
+            db.commit()
+            messages = db.execute(
+                'SELECT id_message, topic, payload, qos, attempts FROM outbox WHERE claim = ? ORDER BY id_message',
+                (claim,)
+            ).fetchall()
+            if not messages:
+                return 0
+
+            sent = [(message, self._client.publish(message['topic'], message['payload'], qos=message['qos']))
+                    for message in messages]
+            with self._published:
+                self._published.wait_for(lambda: all(info.is_published() for _, info in sent), self.ack_timeout)
+            delivered = [message['id_message'] for message, info in sent if info.is_published()]
+            failed = [message for message, info in sent if not info.is_published()]
+
+            db.executemany('DELETE FROM outbox WHERE id_message = ?', [(id,) for id in delivered])
+            db.executemany(
+                'UPDATE outbox SET attempts = attempts + 1, claim = NULL, available = ? WHERE id_message = ?',
+                [(time.time() + self.backoff(message['attempts']), message['id_message']) for message in failed]
+            )
+            db.commit()
+        return len(delivered)
+
+    def _start(self):
+        if self.started() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self.started() and self._thread.is_alive():
+                return
+            # the client and its network thread do not survive a fork
+            self._pid = os.getpid()
+            self._connected.clear()
+            self._client = self._connect()
+            self._thread = threading.Thread(target=self._run, name='mqtt-outbox', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.retry)
+            self._wakeup.clear()
+            if not self._stop.is_set():
+                self._run_once()
+
+    def _run_once(self):
+        try:
+            while self.deliver() >= self.batch:
+                pass
+        except Exception:
+            self.app.logger.exception('Could not deliver the MQTT outbox.')
+
+    def started(self):
+        """Return whether this process started the publisher, it may have been stopped since."""
+        return self._pid == os.getpid()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+        if self._client is not None and self._pid == os.getpid():
+            atexit.unregister(self.stop)
+            self._client.disconnect()
+            self._client.loop_stop()
+
+
+def get_publisher():
+    publisher = current_app.extensions.get('lsg_publisher')
+    if publisher is None:
+        publisher = current_app.extensions.setdefault('lsg_publisher', OutboxPublisher(
+            current_app._get_current_object()
+        ))
+    return publisher
+
+
+def deliver_left_over():
+    """Start the publisher of the worker with its first request, for what a previous run left in the outbox.
+
+    The commands of the command line, which serve no request, never start it.
+    """
+    if current_app.config['MQTT_PUBLISHER_ENABLED']:
+        publisher = get_publisher()
+        if not publisher.started():
+            publisher.notify()
+
+
+def init_app(app):
+    app.before_request(deliver_left_over)
@@ -0,0 +1,73 @@
+import functools
+import hashlib
+
+from flask import current_app, g, make_response, request, session
+
+from lsg_web.cache import TTLCache
+from lsg_web.generation import generation_name, request_counters
+
+
+def get_page_cache():
+    cache = current_app.extensions.get('lsg_pages')
+    if cache is None:
+        cache = current_app.extensions.setdefault('lsg_pages', TTLCache(
+            current_app.config['PAGE_CACHE_SIZE'], current_app.config['PAGE_CACHE_TTL']
+        ))
+    return cache
+
+
+def page_etag(tables):
+    """Return the entity tag of the page of the current request, built from ``tables``.
+
+    It covers the route, its arguments, what the header of the layout shows
+    of the user, the number of open meals of its badge and the write
+    generation of every table the page reads.
+    """
+    names = [generation_name(table) for table in tables] + ['open_meals']
+    values = request_counters(names)
+    identity = None if g.user is None else (
+        g.user['id_user'], g.user['id_permission'], g.user['filename'], g.group['name'], g.person['name']
+    )
+    key = (
+        request.endpoint, sorted(request.view_args.items()), sorted(request.args.items(multi=True)), identity,
+        [values[name] for name in names]
+    )
+    return hashlib.sha1(repr(key).encode('utf8')).hexdigest()
+
+
+def cached_page(*tables):
+    """Serve the rendered page again while the tables it reads are not written.
+
+    A browser sending the ETag of the current page gets a 304 Not Modified,
+    the others get the HTML kept by the worker; either way neither the
+    queries of the view nor its template run again. Pages carrying a flashed
+    message are never kept.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapped_view(**kwargs):
+            if request.method != 'GET' or '_flashes' in session:
+                return view(**kwargs)
+            etag = page_etag(tables)
+            if etag in request.if_none_match:
+                response = current_app.response_class(status=304)
+            else:
+                cache = get_page_cache()
+                body = cache.get(etag)
+                if body is None:
+                    response = make_response(view(**kwargs))
+                    if response.status_code != 200 or session.modified:
+                        return response
+                    cache.set(etag, response.get_data())
+                else:
+                    response = current_app.response_class(body, mimetype='text/html')
+            response.set_etag(etag)
+            # the browser asks again each time, a page unchanged costs it no body
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+
+        # read with the first counters of the request, the identity check before the view
+        wrapped_view.counters = [generation_name(table) for table in tables] + ['open_meals']
+        return wrapped_view
+
+    return decorator
@@ -1,25 +1,36 @@
 from flask import (
-    Blueprint, flash, g, redirect, render_template, request, url_for
+    Blueprint, flash, g, jsonify, redirect, render_template, request, url_for
 )
 from werkzeug.exceptions import abort
 
 
 from lsg_web.auth import login_required, security_required
 from lsg_web.db import get_db
+from lsg_web.listing import Listing
 from lsg_web.useful import set_actif
 from datetime import date as dtdate
 
 bp = Blueprint('person', __name__, url_prefix='/person')
 
+PERSONS = Listing(
+    'id_person, name, birthdate, weight, gender, actif',
+    'person',
+    key='id_person',
+    sortable={'name': 'name', 'birthdate': 'birthdate', 'weight': 'weight', 'gender': 'gender'},
+    searchable=('name', 'birthdate', 'gender')
+)
+
 
 @bp.route('/list')
 @login_required
 def listing():
-    db = get_db()
-    persons = db.execute(
-        'SELECT * FROM person ORDER BY id_person ASC'
-    ).fetchall()
-    return render_template('person/list.html', persons=persons)
+    return render_template('person/list.html', page=PERSONS.page(get_db(), request.args))
+
+
+@bp.route('/list/data')
+@login_required
+def listing_data():
+    return jsonify(PERSONS.page(get_db(), request.args))
 
 
 @bp.route('/<int:id>/info', methods=('GET',))
@@ -0,0 +1,153 @@
+import logging
+import os
+import threading
+import time
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+
+class PresenceRegistry(object):
+    """Last heartbeat, ip and on_use state of every tray, kept in memory.
+
+    The registry is fed by events and never polls the tray table: the
+    heartbeats this process receives over HTTP or from the MQTT ingest, the
+    meals starting and ending on a tray, and the durable state of the tray
+    rows that pages read anyway, which carries the heartbeats received by the
+    other processes. A tray is online while its last heartbeat is younger than
+    ``ttl`` seconds, a background thread marks it offline when that expires.
+    Listeners registered with ``subscribe`` are called with ``(name, online)``
+    on every transition.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._trays = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._stopped = False
+        self._thread = None
+        self._pid = None
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _publish(self, transitions):
+        for name, online in transitions:
+            for listener in list(self._listeners):
+                listener(name, online)
+
+    def _entry(self, name):
+        entry = self._trays.get(name)
+        if entry is None:
+            entry = self._trays[name] = {'seen': 0, 'ip': None, 'on_use': 0, 'online': False}
+        return entry
+
+    def beat(self, name, ip, seen=None):
+        seen = time.time() if seen is None else seen
+        transitions = []
+        with self._lock:
+            entry = self._entry(name)
+            if seen >= entry['seen']:
+                entry['seen'] = seen
+                entry['ip'] = ip
+            if not entry['online'] and entry['seen'] > time.time() - self.ttl:
+                entry['online'] = True
+                transitions.append((name, True))
+                # the expiry of this tray may come before the one awaited
+                self._changed.notify()
+        if transitions:
+            self._start()
+        self._publish(transitions)
+
+    def merge(self, name, ip, on_use, seen):
+        """Take the durable state of a tray, ``seen`` is its timestamp in seconds since the epoch."""
+        if seen is not None:
+            self.beat(name, ip, seen)
+        self.set_on_use(name, on_use)
+
+    def set_on_use(self, name, on_use):
+        with self._lock:
+            self._entry(name)['on_use'] = int(on_use)
+
+    def forget(self, name):
+        with self._lock:
+            self._trays.pop(name, None)
+
+    def sweep(self):
+        """Mark the trays whose heartbeat expired as offline."""
+        limit = time.time() - self.ttl
+        transitions = []
+        with self._lock:
+            for name, entry in self._trays.items():
+                if entry['online'] and entry['seen'] <= limit:
+                    entry['online'] = False
+                    transitions.append((name, False))
+        self._publish(transitions)
+
+    def _start(self):
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._stopped or self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='tray-presence', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._changed:
+                if self._stopped:
+                    return
+                expiries = [entry['seen'] + self.ttl for entry in self._trays.values() if entry['online']]
+                # with no tray online, nothing expires before the next heartbeat
+                timeout = min(expiries) - time.time() if expiries else None
+                if timeout is None or timeout > 0:
+                    self._changed.wait(timeout)
+                if self._stopped:
+                    return
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception('Could not publish the tray presence.')
+
+    def stop(self):
+        with self._changed:
+            self._stopped = True
+            self._changed.notify()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join()
+
+    def snapshot(self):
+        """Return ``{name: {'online', 'ip', 'seen', 'on_use'}}`` for every known tray."""
+        self.sweep()
+        with self._lock:
+            return {name: dict(entry) for name, entry in self._trays.items()}
+
+    def is_online(self, name):
+        self.sweep()
+        entry = self._trays.get(name)
+        return entry is not None and entry['online']
+
+
+def get_presence():
+    registry = current_app.extensions.get('lsg_presence')
+    if registry is None:
+        registry = current_app.extensions.setdefault('lsg_presence', PresenceRegistry(
+            current_app.config['TRAY_PRESENCE_TTL']
+        ))
+    return registry
+
+
+def close_presence(app=None):
+    registry = (app or current_app).extensions.pop('lsg_presence', None)
+
+    if registry is not None:
+        registry.stop()
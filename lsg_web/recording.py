@@ -0,0 +1,161 @@
+import gzip
+import io
+import os
+import shutil
+import tempfile
+
+from flask import Response, request
+from werkzeug.exceptions import NotFound
+from werkzeug.wsgi import wrap_file
+
+
+def recording_paths(folder, id):
+    """Return the files holding the CSV recorded for a meal, in the order of their rows.
+
+    The upload is compressed to ``<id>.csv.gz``, the rows ingested after it
+    are appended to a plain ``<id>.csv`` until ``lsg compress`` merges them
+    into the first one. Both are always read, the first one then the other.
+    """
+    paths = [path for path in (os.path.join(folder, '{0}.csv.gz'.format(id)), os.path.join(folder, '{0}.csv'.format(id)))
+             if os.path.exists(path)]
+    if not paths:
+        raise FileNotFoundError('Meal {0} has no recording.'.format(id))
+    return paths
+
+
+def recording_mtime(folder, id):
+    return max(os.path.getmtime(path) for path in recording_paths(folder, id))
+
+
+def recording_size(paths):
+    """Return the size of the content of the files of a recording, decompressed."""
+    return sum(uncompressed_size(path) if path.endswith('.gz') else os.path.getsize(path) for path in paths)
+
+
+class _Chain(io.RawIOBase):
+    """Read-only file reading a list of files one after the other."""
+
+    def __init__(self, files):
+        self._files = list(files)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while self._files:
+            size = self._files[0].readinto(buffer)
+            if size:
+                return size
+            self._files.pop(0).close()
+        return 0
+
+    def close(self):
+        for f in self._files:
+            f.close()
+        self._files = []
+        super().close()
+
+
+def open_recording(folder, id):
+    """Open the CSV recorded for a meal, decompressed, for reading."""
+    files = [gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb') for path in recording_paths(folder, id)]
+    return files[0] if len(files) == 1 else io.BufferedReader(_Chain(files))
+
+
+def compress_recording(path, level=6, append=True):
+    """Compress a CSV to ``<path>.gz``, remove it and return the new path.
+
+    With ``append``, the content of an existing ``<path>.gz`` comes first:
+    the rows ingested after an upload was compressed join it. Otherwise the
+    CSV replaces it, as a new upload does. The size of the content is kept
+    in ``<path>.gz.size``, the gzip trailer only holds it modulo 4 GiB.
+    """
+    target = path + '.gz'
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.gzip-')
+    try:
+        with open(path, 'rb') as source, os.fdopen(fd, 'wb') as raw:
+            with gzip.GzipFile(filename='', mode='wb', compresslevel=level, fileobj=raw, mtime=0) as f:
+                if append and os.path.exists(target):
+                    # a single member again, its size stays in the trailer
+                    with gzip.open(target, 'rb') as previous:
+                        shutil.copyfileobj(previous, f, 64 * 1024)
+                shutil.copyfileobj(source, f, 64 * 1024)
+                size = f.tell()
+        os.replace(tmp, target)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    _write_size(target, size)
+    os.unlink(path)
+    return target
+
+
+def _write_size(path, size):
+    """Store the size of the content of a gzip file along with the size of the file it was counted in."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.size-')
+    with os.fdopen(fd, 'w') as f:
+        f.write('{0} {1}\n'.format(size, os.path.getsize(path)))
+    os.replace(tmp, path + '.size')
+
+
+def uncompressed_size(path):
+    """Return the size of the content of a gzip file.
+
+    It is read from the ``.size`` file written by :func:`compress_recording`
+    while that one still describes this file, otherwise the content is
+    counted once by decompressing it, and the result stored.
+    """
+    try:
+        with open(path + '.size') as f:
+            size, compressed = (int(value) for value in f.read().split())
+        if compressed == os.path.getsize(path):
+            return size
+    except (OSError, ValueError):
+        pass
+    size = 0
+    with gzip.open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            size += len(chunk)
+    try:
+        _write_size(path, size)
+    except OSError:
+        pass
+    return size
+
+
+def send_recording(folder, id):
+    """Send the CSV of a meal, as stored when the client accepts gzip.
+
+    Both representations support If-None-Match and Range requests, a range
+    of the decompressed content is found by decompressing up to its start.
+    """
+    try:
+        paths = recording_paths(folder, id)
+    except FileNotFoundError:
+        raise NotFound()
+
+    stats = [os.stat(path) for path in paths]
+    etag = '-'.join('{0}-{1}'.format(int(stat.st_mtime), stat.st_size) for stat in stats)
+    compressed = paths[0].endswith('.gz')
+    # rows ingested after the compression are only sent decompressed with the others
+    passthrough = compressed and len(paths) == 1 and request.accept_encodings['gzip'] > 0
+    if passthrough or not compressed:
+        data, length = open(paths[0], 'rb'), stats[0].st_size
+    else:
+        data, length = open_recording(folder, id), recording_size(paths)
+        etag += '-identity'
+
+    response = Response(wrap_file(request.environ, data), mimetype='text/csv', direct_passthrough=True)
+    if passthrough:
+        response.headers['Content-Encoding'] = 'gzip'
+    if compressed:
+        response.vary.add('Accept-Encoding')
+    response.content_length = length
+    response.last_modified = max(int(stat.st_mtime) for stat in stats)
+    response.cache_control.no_cache = True
+    response.set_etag(etag)
+    response.make_conditional(request, accept_ranges=True, complete_length=length)
+    if response.status_code == 304:
+        # the body is dropped without being closed
+        data.close()
+    return response
@@ -9,6 +9,14 @@ DROP TABLE IF EXISTS category;
 DROP TABLE IF EXISTS version;
 DROP TABLE IF EXISTS composed;
 DROP TABLE IF EXISTS bug;
+DROP TABLE IF EXISTS schema_version;
+DROP TABLE IF EXISTS counter;
+DROP TABLE IF EXISTS outbox;
+DROP TABLE IF EXISTS upload_chunk;
+DROP TABLE IF EXISTS upload;
+DROP TABLE IF EXISTS meal_event;
+DROP TABLE IF EXISTS search;
+DROP TABLE IF EXISTS lookup;
 
 CREATE TABLE person (
     id_person INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -0,0 +1,92 @@
+import html
+import re
+
+from flask import Blueprint, jsonify, request, url_for
+from flask import current_app as app
+
+from lsg_web.auth import login_required
+from lsg_web.db import get_db
+
+bp = Blueprint('search', __name__, url_prefix='/search')
+
+# kind, table, key, title, body and rows indexed; the rowid of an entry is key * 4 + position of its
+# kind. Migration 0007 creates the triggers from these, a change needs a migration replacing them.
+SOURCES = (
+    ('food', 'food', 'id_food', 'name', 'information', '1'),
+    ('menu', 'menu', 'id_menu', 'name', 'information', '{0}.actif = 1'),
+    ('bug', 'bug', 'id_bug', 'title', 'information', '1'),
+    ('meal', 'meal', 'id_meal', 'NULL', 'information', '{0}.actif = 1'),
+)
+KINDS = tuple(source[0] for source in SOURCES)
+
+
+def match_query(text):
+    """Return the FTS5 query of the entries holding every word of ``text``, the last one as a prefix."""
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+    return ' '.join('"{0}"'.format(word) for word in words) + '*'
+
+
+def highlight(snippet):
+    # the text is escaped, only the marks around the matched words are HTML
+    return html.escape(snippet or '').replace('\x02', '<mark>').replace('\x03', '</mark>')
+
+
+def hit_url(kind, id):
+    if kind == 'food':
+        return url_for('food.update', id=id)
+    if kind == 'bug':
+        return url_for('bug.listing')
+    return url_for(kind + '.info', id=id)
+
+
+def search_entries(db, text, kinds=None, limit=20):
+    """Return the entries matching ``text``, best first, with a snippet of the matching column."""
+    query = match_query(text)
+    if query is None:
+        return []
+    clauses, parameters = ['search MATCH ?'], [query]
+    if kinds:
+        clauses.append('kind IN ({0})'.format(', '.join('?' * len(kinds))))
+        parameters += kinds
+    rows = db.execute(
+        "SELECT kind, id, title, snippet(search, -1, char(2), char(3), '…', 12) AS snippet FROM search "
+        'WHERE ' + ' AND '.join(clauses) + ' ORDER BY rank LIMIT ?', parameters + [limit]
+    ).fetchall()
+    return [{
+        'kind': row['kind'],
+        'id': row['id'],
+        'title': row['title'] or '{0} {1}'.format(row['kind'].capitalize(), row['id']),
+        'snippet': highlight(row['snippet']),
+        'url': hit_url(row['kind'], row['id']),
+    } for row in rows]
+
+
+def rebuild_search(db):
+    """Fill the search table again from the indexed tables and return its number of entries.
+
+    The triggers keep it up to date, this is for the rows written while they
+    were not there, by a bulk import or a restored copy of the tables.
+    """
+    db.execute('DELETE FROM search')
+    for position, (kind, table, key, title, body, condition) in enumerate(SOURCES):
+        db.execute(
+            'INSERT INTO search (rowid, kind, id, title, body) SELECT {key} * 4 + {position}, ?, {key}, {title}, {body} '
+            'FROM {table} WHERE {condition}'.format(
+                key=key, position=position, title=title, body=body, table=table, condition=condition.format(table)
+            ), (kind,)
+        )
+    # merge the b-trees written by the inserts into one
+    db.execute("INSERT INTO search (search) VALUES ('optimize')")
+    db.commit()
+    return db.execute('SELECT count(*) FROM search').fetchone()[0]
+
+
+@bp.route('')
+@login_required
+def search():
+    kinds = [kind for kind in request.args.getlist('kind') if kind in KINDS]
+    limit = min(max(request.args.get('limit', 20, type=int), 1), app.config['SEARCH_MAX_HITS'])
+    text = request.args.get('q', '')
+    return jsonify({'query': text, 'hits': search_entries(get_db(), text, kinds, limit)})
@@ -0,0 +1,192 @@
+import math
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+from bisect import bisect_right
+
+from lsg_web.recording import open_recording, recording_mtime
+
+MAGIC = b'LSGS'
+VERSION = 1
+# magic, version, columns, rows, length of the column names
+HEADER = struct.Struct('<4sHHQI')
+BLOCK_SIZE = 1024 * 1024
+# each level of a pyramid has FACTOR times fewer buckets than the previous one
+FACTOR = 4
+
+
+def series_path(folder, id):
+    return os.path.join(folder, '{0}.series'.format(id))
+
+
+def parse_csv(data):
+    """Parse the CSV recorded by a tray into ``(names, columns)``.
+
+    The first column holds the timestamps in seconds and the others the weight
+    of each sensor. The first line is taken as the column names when it is not
+    numeric. Values are converted in C loops, by splitting large blocks of
+    lines at once and slicing the resulting array per column.
+    """
+    data = data.replace(b';', b',').replace(b'\r', b'')
+    first, _, rest = data.partition(b'\n')
+    try:
+        array('d', map(float, first.split(b',')))
+        names = None
+    except ValueError:
+        names = [name.strip().decode('utf8') for name in first.split(b',')]
+        data = rest
+
+    width = len(names) if names else len(first.split(b','))
+    values = array('d')
+    # blocks of whole lines keep the temporary list of fields small
+    start = 0
+    while start < len(data):
+        end = data.find(b'\n', start + BLOCK_SIZE) + 1 or len(data)
+        values.extend(map(float, data[start:end].replace(b',', b' ').split()))
+        start = end
+    if width < 2 or len(values) % width:
+        raise ValueError('Expected rows of {0} values.'.format(width))
+    if not names:
+        names = ['timestamp'] + ['sensor{0}'.format(i) for i in range(1, width)]
+    return names, [values[i::width] for i in range(width)]
+
+
+def write_series(path, names, columns):
+    """Write the columns one after the other as float64, atomically."""
+    encoded = '\t'.join(names).encode('utf8')
+    # align the columns on 8 bytes so that they can be cast in place
+    padding = -(HEADER.size + len(encoded)) % 8
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.series-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(columns), len(columns[0]), len(encoded)))
+            f.write(encoded + b'\0' * padding)
+            for column in columns:
+                if column.itemsize != 8 or len(column) != len(columns[0]):
+                    raise ValueError('Columns must be float64 arrays of the same length.')
+                column.tofile(f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def build_series(folder, id):
+    """Convert the recording of a meal to ``<id>.series`` and return the number of rows."""
+    with open_recording(folder, id) as f:
+        names, columns = parse_csv(f.read())
+    write_series(series_path(folder, id), names, columns)
+    return len(columns[0])
+
+
+class Series(object):
+    """Columns of a ``.series`` file, memory-mapped.
+
+    ``columns`` maps each name to a read-only float64 memoryview of the file,
+    nothing is copied. Close the series, or use it as a context manager, to
+    release the mapping.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._map)
+        magic, version, width, rows, length = HEADER.unpack(bytes(view[:HEADER.size]).ljust(HEADER.size, b'\0'))
+        start = HEADER.size + length + -(HEADER.size + length) % 8
+        if magic != MAGIC or version != VERSION or len(view) != start + width * rows * 8:
+            view.release()
+            self._map.close()
+            raise ValueError('{0} is not a series file.'.format(path))
+
+        self.names = bytes(view[HEADER.size:HEADER.size + length]).decode('utf8').split('\t')
+        data = view[start:start + width * rows * 8].cast('d')
+        self.columns = {name: data[i * rows:(i + 1) * rows] for i, name in enumerate(self.names)}
+        self._views = [view, data] + list(self.columns.values())
+
+    @property
+    def timestamps(self):
+        return self.columns[self.names[0]]
+
+    @property
+    def weights(self):
+        return {name: self.columns[name] for name in self.names[1:]}
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self.columns = {}
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load_series(folder, id):
+    """Return the Series of a meal, converting its recording first when it is newer."""
+    path = series_path(folder, id)
+    if not os.path.exists(path) or recording_mtime(folder, id) > os.path.getmtime(path):
+        build_series(folder, id)
+    return Series(path)
+
+
+def reduce_groups(function, values, factor):
+    """Apply ``function`` to each group of ``factor`` consecutive values."""
+    if factor == 1:
+        return array('d', values)
+    full = len(values) // factor * factor
+    reduced = array('d', map(function, *[values[i:full:factor] for i in range(factor)]))
+    if full < len(values):
+        reduced.append(function(values[full:]))
+    return reduced
+
+
+class Pyramid(object):
+    """Min/max envelopes of a Series at resolutions divided by FACTOR.
+
+    The first level is the mapped series itself, the last one has at most
+    ``smallest`` buckets. Each bucket starts at the timestamp of its first
+    value.
+    """
+
+    def __init__(self, series, smallest=256):
+        self.series = series
+        self.names = series.names[1:]
+        timestamps, weights = series.timestamps, series.weights
+        self.levels = [(timestamps, weights, weights)]
+        while len(timestamps) > smallest:
+            timestamps, mins, maxs = self.levels[-1]
+            timestamps = array('d', timestamps[::FACTOR])
+            self.levels.append((
+                timestamps,
+                {name: reduce_groups(min, mins[name], FACTOR) for name in self.names},
+                {name: reduce_groups(max, maxs[name], FACTOR) for name in self.names},
+            ))
+
+    def query(self, points, start=None, end=None):
+        """Return at most ``points`` buckets between the timestamps ``start`` and ``end``.
+
+        The finest level with at most FACTOR times too many buckets in the
+        range is reduced further to fit.
+        """
+        for level, (timestamps, mins, maxs) in enumerate(self.levels):
+            # the bucket holding ``start`` begins before it
+            low = 0 if start is None else max(bisect_right(timestamps, start) - 1, 0)
+            high = len(timestamps) if end is None else bisect_right(timestamps, end)
+            if high - low <= points * FACTOR:
+                break
+        factor = max(int(math.ceil((high - low) / float(points))), 1)
+        return {
+            'level': level,
+            'names': self.names,
+            't': reduce_groups(min, timestamps[low:high], factor).tolist(),
+            'min': {name: reduce_groups(min, mins[name][low:high], factor).tolist() for name in self.names},
+            'max': {name: reduce_groups(max, maxs[name][low:high], factor).tolist() for name in self.names},
+        }
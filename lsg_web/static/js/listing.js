@@ -0,0 +1,37 @@
+"use strict";
+
+// Server side processing of the list pages, see lsg_web/listing.py
+var listing = {
+	text: function (data) {
+		return $('<div>').text(data === null ? '' : data).html();
+	},
+
+	number: function (data, type, row, meta) {
+		return meta.settings._iDisplayStart + meta.row + 1;
+	},
+
+	// the first page is rendered in the table, each following page is asked after the last row of the previous one
+	table: function (selector, url, page, columns, filters) {
+		var cursors = {};
+		cursors[page.start + page.data.length] = page.next;
+		return $(selector).DataTable({
+			serverSide: true,
+			processing: true,
+			searchDelay: 400,
+			pageLength: page.length,
+			order: [[0, 'asc']],
+			deferLoading: [page.recordsFiltered, page.recordsTotal],
+			columns: columns,
+			ajax: function (data, callback) {
+				var params = $.extend({}, filters, data);
+				if (cursors[data.start]) {
+					params.after = JSON.stringify(cursors[data.start]);
+				}
+				$.getJSON(url, params, function (json) {
+					cursors[json.start + json.data.length] = json.next;
+					callback(json);
+				});
+			}
+		});
+	}
+};
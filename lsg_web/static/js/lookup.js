@@ -0,0 +1,43 @@
+"use strict";
+
+// Typeahead of the selects too long to be rendered whole, see lsg_web/lookup.py:
+// <select data-lookup="/lookup/person" data-lookup-params='{"menu": 1}'> gets a search field filling its options
+var lookup = {
+	delay: 200,
+
+	select: function (select) {
+		var url = select.data('lookup');
+		var params = select.data('lookup-params') || {};
+		var input = $('<input type="search" class="form-control" autocomplete="off" placeholder="Type a name">');
+		var initial = select.children().clone();
+		var timer = null;
+		select.before(input);
+		input.on('input', function () {
+			clearTimeout(timer);
+			timer = setTimeout(function () {
+				var text = $.trim(input.val());
+				if (!text) {
+					// back to the options rendered with the form, the current candidate of a meal
+					select.empty().append(initial.clone());
+					return;
+				}
+				$.getJSON(url, $.extend({q: text}, params), function (json) {
+					// an answer to a text typed over since then is dropped
+					if (json.query !== $.trim(input.val())) {
+						return;
+					}
+					select.empty();
+					$.each(json.hits, function (i, hit) {
+						select.append($('<option>').val(hit.id).text(hit.name));
+					});
+				});
+			}, lookup.delay);
+		});
+	}
+};
+
+$(function () {
+	$('select[data-lookup]').each(function () {
+		lookup.select($(this));
+	});
+});
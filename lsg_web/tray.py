@@ -8,7 +8,13 @@ from werkzeug.exceptions import abort
 from werkzeug.utils import secure_filename
 
 from lsg_web.auth import security_required
+from lsg_web.catalog import catalog
 from lsg_web.db import get_db
+from lsg_web.heartbeat import get_heartbeats
+from lsg_web.presence import get_presence
+from lsg_web.recording import compress_recording
+from lsg_web.series import build_series
+from lsg_web.upload import StreamingUpload, committed_offset, file_checksum, part_path, write_at
 from lsg_web.useful import set_actif
 
 bp = Blueprint('tray', __name__, url_prefix='/tray')
@@ -19,12 +25,25 @@ bp = Blueprint('tray', __name__, url_prefix='/tray')
 def listing():
     db = get_db()
     trays = db.execute(
-        'SELECT t.id_tray as id_tray,t.name as tname, v.name as vname, t.information as information, ip, online, t.on_use as on_use, t.timestamp as timestamp, DATETIME("now", "-30 seconds") as now '
+        'SELECT t.id_tray as id_tray,t.name as tname, v.name as vname, t.information as information, ip, '
+        't.on_use as on_use, CAST(strftime("%s", timestamp) AS INTEGER) AS seen '
         'FROM tray t INNER JOIN version v on t.id_version = v.id_version ORDER BY id_tray ASC'
     ).fetchall()
+    registry = get_presence()
+    for tray in trays:
+        registry.merge(tray['tname'], tray['ip'], tray['on_use'], tray['seen'])
+    presence = registry.snapshot()
+    trays = [with_presence(dict(tray), presence.get(tray['tname'])) for tray in trays]
     return render_template('tray/list.html', trays=trays)
 
 
+def with_presence(tray, state):
+    tray['online'] = state is not None and state['online']
+    if state is not None and state['ip'] is not None:
+        tray['ip'] = state['ip']
+    return tray
+
+
 @bp.route('/create', methods=('GET', 'POST'))
 @security_required
 def create():
@@ -51,7 +70,7 @@ def create():
             )
             db.commit()
             return redirect(url_for('tray.listing'))
-    versions = get_db().execute('SELECT * FROM version').fetchall()
+    versions = catalog('versions')
     return render_template('tray/create.html', versions=versions)
 
 
@@ -107,8 +126,11 @@ def update(id):
                 (request.form['name'], request.form['version'], request.form['information'], actif, id)
             )
             db.commit()
+            # the other workers see the rename within TRAY_NAMES_TTL
+            get_heartbeats().forget(tray['name'])
+            get_presence().forget(tray['name'])
             return redirect(url_for('tray.listing'))
-    versions = get_db().execute('SELECT * FROM version').fetchall()
+    versions = catalog('versions')
     return render_template('tray/update.html', versions=versions, tray=tray)
 
 
@@ -125,13 +147,10 @@ def delete(id):
 @bp.route('/connect', methods=('POST',))
 def connect():
     name = request.form['name']
-    if get_db().execute('SELECT * FROM tray WHERE name = ?', (name,)).fetchone() is not None:
-        ip = request.form['ip']
-        db = get_db()
-        db.execute('UPDATE tray SET online = 1, ip = ?, timestamp = DATETIME("now") WHERE name = ?',
-                   (ip, name)
-                   )
-        db.commit()
+    heartbeats = get_heartbeats()
+    if heartbeats.known(name):
+        heartbeats.beat(name, request.form['ip'])
+        get_presence().beat(name, request.form['ip'])
         return jsonify(success=True)
     return abort(400)
 
@@ -139,13 +158,14 @@ def connect():
 @bp.route('/data', methods=('POST',))
 def data():
     error = None
-    if not request.files:
-        error = "You must select an image."
-    else:
-        if "data" in request.files and "image" in request.files:
-            data = request.files["data"]
+    with StreamingUpload(app.config["DATA_UPLOADS"], app.config["UPLOAD_MAX_FILE_SIZE"]) as upload:
+        form, files = upload.parse(request)
+        if not files:
+            error = "You must select an image."
+        elif "data" in files and "image" in files:
+            data = files["data"]
             filename = secure_filename(data.filename)
-            image = request.files["image"]
+            image = files["image"]
             fimage = secure_filename(image.filename)
             if filename == "":
                 error = "No Filename."
@@ -158,13 +178,112 @@ def data():
                     error = "Bad type of file"
                 if ext2 not in ("png", "jpeg", "jpg"):
                     error = "Bad type of file"
+                # the tray may send the checksums it computed to detect a corrupted transfer
+                for field, storage in (("data_sha256", data), ("image_sha256", image)):
+                    if form.get(field) and form[field].lower() != storage.stream.hexdigest():
+                        error = "Checksum mismatch for " + storage.filename
 
                 if error is None:
-                    data.save(os.path.join(app.config["DATA_UPLOADS"], filename))
-                    image.save(os.path.join(app.config["DATA_UPLOADS"], fimage))
-                    return jsonify(success=True)
+                    response = jsonify(success=True, data_sha256=upload.save(data, filename),
+                                       image_sha256=upload.save(image, fimage))
+                    stem, ext = filename.rsplit(".", 1)
+                    if stem.isdigit() and ext == "csv":
+                        store_recording(int(stem))
+                    return response
     return abort(404, "Error : " + str(error))
 
 
+def store_recording(id):
+    """Compress the CSV of a meal at rest and parse it once into its columnar series."""
+    folder = app.config["DATA_UPLOADS"]
+    # an upload is the whole recording, it replaces the one stored before
+    compress_recording(os.path.join(folder, str(id) + ".csv"), app.config["DATA_COMPRESSION_LEVEL"], append=False)
+    try:
+        build_series(folder, id)
+    except (ValueError, OSError):
+        # the recording is kept, the series is built again on its next use
+        app.logger.warning('Could not convert the data of meal %s.', id, exc_info=True)
+
+
+def get_upload(id):
+    db = get_db()
+    if db.execute('SELECT id_meal FROM upload WHERE id_meal = ?', (id,)).fetchone() is None:
+        abort(404, "No upload is open for meal {0}.".format(id))
+    return db.execute(
+        'SELECT number, offset, size FROM upload_chunk WHERE id_meal = ? ORDER BY offset', (id,)
+    ).fetchall()
+
+
+def upload_state(id, chunks):
+    return jsonify(id=id, offset=committed_offset([(chunk['offset'], chunk['size']) for chunk in chunks]),
+                   chunks=len(chunks))
 
 
+@bp.route('/upload/<int:id>', methods=('POST',))
+def upload_open(id):
+    db = get_db()
+    if db.execute('SELECT id_meal FROM meal WHERE id_meal = ?', (id,)).fetchone() is None:
+        abort(404, "Meal id {0} doesn't exist.".format(id))
+    db.execute('INSERT OR IGNORE INTO upload (id_meal) VALUES (?)', (id,))
+    db.commit()
+    return upload_state(id, get_upload(id))
+
+
+@bp.route('/upload/<int:id>', methods=('GET',))
+def upload_status(id):
+    return upload_state(id, get_upload(id))
+
+
+@bp.route('/upload/<int:id>/<int:number>', methods=('PUT',))
+def upload_chunk(id, number):
+    chunks = get_upload(id)
+    offset = request.args.get('offset', type=int)
+    size = request.content_length
+    if offset is None or offset < 0 or not size:
+        abort(400, "A chunk needs an offset and a Content-Length.")
+    if offset + size > app.config["UPLOAD_MAX_FILE_SIZE"]:
+        abort(413, "Files are limited to {0} bytes.".format(app.config["UPLOAD_MAX_FILE_SIZE"]))
+
+    for chunk in chunks:
+        if chunk['number'] == number:
+            # a retransmission, answered without reading the body nor touching the disk
+            if (chunk['offset'], chunk['size']) == (offset, size):
+                return upload_state(id, chunks)
+            abort(409, "Chunk {0} was already received with another offset.".format(number))
+        if chunk['offset'] < offset + size and offset < chunk['offset'] + chunk['size']:
+            abort(409, "Chunk {0} overlaps chunk {1}.".format(number, chunk['number']))
+
+    path = part_path(app.config["DATA_UPLOADS"], id)
+    if write_at(path, offset, request.stream, size) != size:
+        abort(400, "Chunk {0} is incomplete.".format(number))
+    db = get_db()
+    db.execute('INSERT OR IGNORE INTO upload_chunk (id_meal, number, offset, size) VALUES (?, ?, ?, ?)',
+               (id, number, offset, size))
+    db.commit()
+    return upload_state(id, get_upload(id))
+
+
+@bp.route('/upload/<int:id>/finish', methods=('POST',))
+def upload_finish(id):
+    chunks = [(chunk['offset'], chunk['size']) for chunk in get_upload(id)]
+    if not chunks:
+        # an empty file would replace the recording already stored
+        abort(409, "No data was received for meal {0}.".format(id))
+    end = max(offset + size for offset, size in chunks)
+    if committed_offset(chunks) != end:
+        abort(409, "The upload of meal {0} has gaps.".format(id))
+
+    path = part_path(app.config["DATA_UPLOADS"], id)
+    with open(path, 'ab') as f:
+        f.truncate(end)
+    checksum = file_checksum(path)
+    if request.form.get('sha256') and request.form['sha256'].lower() != checksum:
+        abort(409, "Checksum mismatch for meal {0}.".format(id))
+
+    os.replace(path, os.path.join(app.config["DATA_UPLOADS"], str(id) + ".csv"))
+    db = get_db()
+    db.execute('DELETE FROM upload_chunk WHERE id_meal = ?', (id,))
+    db.execute('DELETE FROM upload WHERE id_meal = ?', (id,))
+    db.commit()
+    store_recording(id)
+    return jsonify(success=True, size=end, sha256=checksum)
@@ -0,0 +1,136 @@
+import hashlib
+import os
+import tempfile
+
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.formparser import parse_form_data
+
+
+class ChecksumFile(object):
+    """Temporary file of the destination directory hashed while it is written.
+
+    Raises RequestEntityTooLarge as soon as more than ``limit`` bytes are
+    written, so an oversized upload is not read to the end.
+    """
+
+    def __init__(self, folder, limit):
+        self.limit = limit
+        self.size = 0
+        self._hash = hashlib.sha256()
+        fd, self.path = tempfile.mkstemp(dir=folder, prefix='.upload-')
+        self._file = os.fdopen(fd, 'w+b')
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.limit:
+            raise RequestEntityTooLarge('Files are limited to {0} bytes.'.format(self.limit))
+        self._hash.update(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+    def seek(self, *args):
+        return self._file.seek(*args)
+
+    def tell(self):
+        return self._file.tell()
+
+    def read(self, *args):
+        return self._file.read(*args)
+
+    def close(self):
+        self._file.close()
+
+
+class StreamingUpload(object):
+    """Parse a multipart request, writing each file straight into ``folder``.
+
+    Used as a context manager, the temporary files that were not saved are
+    removed when the block exits, whatever happened in it.
+    """
+
+    def __init__(self, folder, limit):
+        self.folder = folder
+        self.limit = limit
+        self._files = []
+
+    def _stream_factory(self, total_content_length, content_type, filename=None, content_length=None):
+        if content_length and content_length > self.limit:
+            raise RequestEntityTooLarge('Files are limited to {0} bytes.'.format(self.limit))
+        stream = ChecksumFile(self.folder, self.limit)
+        self._files.append(stream)
+        return stream
+
+    def parse(self, request):
+        """Return the ``(form, files)`` of the request, files are ChecksumFile backed."""
+        _, form, files = parse_form_data(request.environ, stream_factory=self._stream_factory)
+        return form, files
+
+    def save(self, storage, filename):
+        """Move an uploaded file into place under ``filename``, atomically."""
+        stream = storage.stream
+        stream.close()
+        os.replace(stream.path, os.path.join(self.folder, filename))
+        self._files.remove(stream)
+        return stream.hexdigest()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        for stream in self._files:
+            stream.close()
+            try:
+                os.unlink(stream.path)
+            except OSError:
+                pass
+        del self._files[:]
+
+
+def part_path(folder, id):
+    return os.path.join(folder, '.{0}.csv.part'.format(id))
+
+
+def committed_offset(chunks):
+    """Return where the data received without gap from offset 0 ends.
+
+    ``chunks`` are ``(offset, size)`` pairs sorted by offset.
+    """
+    end = 0
+    for offset, size in chunks:
+        if offset > end:
+            break
+        end = max(end, offset + size)
+    return end
+
+
+def write_at(path, offset, stream, length, buffer_size=64 * 1024):
+    """Copy ``length`` bytes of ``stream`` into ``path`` at ``offset``, return how many were written.
+
+    The data is on disk when this returns, so the chunk can be recorded as committed.
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0o644)
+    try:
+        written = 0
+        while written < length:
+            data = stream.read(min(buffer_size, length - written))
+            if not data:
+                break
+            view = memoryview(data)
+            while view:
+                done = os.pwrite(fd, view, offset + written)
+                view = view[done:]
+                written += done
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    return written
+
+
+def file_checksum(path, buffer_size=64 * 1024):
+    checksum = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for data in iter(lambda: f.read(buffer_size), b''):
+            checksum.update(data)
+    return checksum.hexdigest()
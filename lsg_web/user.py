@@ -1,5 +1,5 @@
 from flask import (
-    Blueprint, flash, g, redirect, render_template, request, url_for
+    Blueprint, flash, g, jsonify, redirect, render_template, request, url_for
 )
 from werkzeug.exceptions import abort
 from werkzeug.security import generate_password_hash
@@ -9,21 +9,32 @@ from flask import current_app as app
 from lsg_web.useful import set_actif
 from lsg_web.auth import security_required
 from lsg_web.db import get_db
+from lsg_web.listing import Listing
 from lsg_web.person import get_person
 import os
 
 bp = Blueprint('user', __name__, url_prefix='/user')
 
+# the password hashes are not part of the listing
+USERS = Listing(
+    'u.id_user, u.actif, p.name, u.mail, u.id_permission',
+    'user u INNER JOIN person p ON u.id_person = p.id_person',
+    key='u.id_user',
+    sortable={'actif': 'u.actif', 'name': 'p.name', 'mail': 'u.mail', 'id_permission': 'u.id_permission'},
+    searchable=('p.name', 'u.mail')
+)
+
 
 @bp.route('/list')
 @security_required
 def listing():
-    db = get_db()
-    users = db.execute(
-        'SELECT *'
-        ' FROM user INNER JOIN person ON user.id_person = person.id_person ORDER BY id_user ASC'
-    ).fetchall()
-    return render_template('user/list.html', users=users)
+    return render_template('user/list.html', page=USERS.page(get_db(), request.args))
+
+
+@bp.route('/list/data')
+@security_required
+def listing_data():
+    return jsonify(USERS.page(get_db(), request.args))
 
 
 @bp.route('/create', methods=('GET', 'POST'))
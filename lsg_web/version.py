@@ -5,12 +5,14 @@ from werkzeug.exceptions import abort
 
 from lsg_web.auth import login_required, security_required
 from lsg_web.db import get_db
+from lsg_web.pages import cached_page
 from datetime import date as dtdate
 bp = Blueprint('version', __name__, url_prefix='/version')
 
 
 @bp.route('/list')
 @security_required
+@cached_page('version')
 def listing():
     db = get_db()
     versions = db.execute(
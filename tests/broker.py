@@ -0,0 +1,157 @@
+import socket
+import socketserver
+import struct
+import threading
+
+CONNECT, CONNACK, PUBLISH, PUBACK = 1, 2, 3, 4
+SUBSCRIBE, SUBACK, PINGREQ, PINGRESP, DISCONNECT = 8, 9, 12, 13, 14
+
+
+def matches(pattern, topic):
+    pattern, topic = pattern.split('/'), topic.split('/')
+    for i, level in enumerate(pattern):
+        if level == '#':
+            return True
+        if i >= len(topic) or (level != '+' and level != topic[i]):
+            return False
+    return len(pattern) == len(topic)
+
+
+def packet(kind, body, flags=0):
+    header = bytearray([kind << 4 | flags])
+    length = len(body)
+    while True:
+        byte, length = length % 128, length // 128
+        header.append(byte | (0x80 if length else 0))
+        if not length:
+            return bytes(header) + body
+
+
+def string(value):
+    value = value.encode('utf8') if isinstance(value, str) else value
+    return struct.pack('!H', len(value)) + value
+
+
+class Session(socketserver.BaseRequestHandler):
+
+    def read(self, size):
+        data = b''
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError()
+            data += chunk
+        return data
+
+    def read_packet(self):
+        first = self.read(1)[0]
+        length, shift = 0, 0
+        while True:
+            byte = self.read(1)[0]
+            length |= (byte & 0x7f) << shift
+            shift += 7
+            if not byte & 0x80:
+                break
+        return first >> 4, first & 0x0f, self.read(length)
+
+    def send(self, data):
+        with self.lock:
+            self.request.sendall(data)
+
+    def handle(self):
+        broker = self.server.broker
+        self.lock = threading.Lock()
+        self.subscriptions = []
+        broker.sessions.append(self)
+        try:
+            while True:
+                kind, flags, body = self.read_packet()
+                if kind == CONNECT:
+                    self.send(packet(CONNACK, b'\x00\x00'))
+                elif kind == PUBLISH:
+                    qos = (flags >> 1) & 3
+                    size = struct.unpack('!H', body[:2])[0]
+                    topic = body[2:2 + size].decode('utf8')
+                    offset = 2 + size
+                    if qos:
+                        mid = body[offset:offset + 2]
+                        offset += 2
+                    payload = body[offset:]
+                    if qos and broker.drop_acks > 0:
+                        broker.drop_acks -= 1
+                        continue
+                    broker.receive(topic, payload)
+                    if qos:
+                        self.send(packet(PUBACK, mid))
+                elif kind == SUBSCRIBE:
+                    mid, offset, granted = body[:2], 2, b''
+                    while offset < len(body):
+                        size = struct.unpack('!H', body[offset:offset + 2])[0]
+                        self.subscriptions.append(body[offset + 2:offset + 2 + size].decode('utf8'))
+                        offset += 3 + size
+                        granted += b'\x00'
+                    self.send(packet(SUBACK, mid + granted))
+                    with broker.received:
+                        broker.received.notify_all()
+                elif kind == PINGREQ:
+                    self.send(packet(PINGRESP, b''))
+                elif kind == DISCONNECT:
+                    return
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            broker.sessions.remove(self)
+
+
+class Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class Broker(object):
+    """In-process MQTT 3.1.1 stand-in broker with QoS 0 delivery to subscribers.
+
+    Every published message is kept in ``messages``. Setting ``drop_acks``
+    makes it ignore that many QoS 1 publishes without acknowledging them.
+    """
+
+    def __init__(self):
+        self.messages = []
+        self.sessions = []
+        self.drop_acks = 0
+        self.received = threading.Condition()
+        self.server = Server(('127.0.0.1', 0), Session)
+        self.server.broker = self
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def receive(self, topic, payload):
+        with self.received:
+            self.messages.append((topic, payload))
+            self.received.notify_all()
+        for session in list(self.sessions):
+            if any(matches(pattern, topic) for pattern in session.subscriptions):
+                session.send(packet(PUBLISH, string(topic) + payload))
+
+    def publish(self, topic, payload):
+        """Deliver a message to the subscribers as if a client had sent it."""
+        self.receive(topic, payload.encode('utf8') if isinstance(payload, str) else payload)
+
+    def wait_for(self, count, timeout=5):
+        with self.received:
+            return self.received.wait_for(lambda: len(self.messages) >= count, timeout)
+
+    def wait_for_subscribers(self, count=1, timeout=5):
+        with self.received:
+            return self.received.wait_for(
+                lambda: sum(1 for s in self.sessions if s.subscriptions) >= count, timeout)
+
+    def close(self):
+        self.server.shutdown()
+        for session in list(self.sessions):
+            try:
+                session.request.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self.server.server_close()
\ No newline at end of file
@@ -1,9 +1,17 @@
+import contextlib
 import os
+import shutil
 import tempfile
 
 import pytest
 from lsg_web import create_app
-from lsg_web.db import get_db, init_db
+from lsg_web.db import close_pool, get_db, init_db
+from lsg_web.events import close_events
+from lsg_web.heartbeat import close_heartbeats
+from lsg_web.presence import close_presence
+from lsg_web.instrument import statements
+
+from broker import Broker
 
 with open(os.path.join(os.path.dirname(__file__), 'data.sql'), 'rb') as f:
     _data_sql = f.read().decode('utf8')
@@ -12,10 +20,16 @@ with open(os.path.join(os.path.dirname(__file__), 'data.sql'), 'rb') as f:
 @pytest.fixture
 def app():
     db_fd, db_path = tempfile.mkstemp()
+    data_path = tempfile.mkdtemp()
+    shutil.copy(os.path.join(os.path.dirname(__file__), '..', 'lsg_web', 'static', 'data', '1.csv'), data_path)
 
     app = create_app({
         'TESTING': True,
         'DATABASE': db_path,
+        'DATA_UPLOADS': data_path,
+        'TRAY_HEARTBEAT_INTERVAL': 0,
+        'MQTT_PUBLISHER_ENABLED': False,
+        'EVENTS_POLL_INTERVAL': 0,
     })
 
     with app.app_context():
@@ -24,8 +38,13 @@ def app():
 
     yield app
 
+    close_events(app)
+    close_heartbeats(app)
+    close_presence(app)
+    close_pool(app)
     os.close(db_fd)
     os.unlink(db_path)
+    shutil.rmtree(data_path)
 
 
 @pytest.fixture
@@ -38,6 +57,44 @@ def runner(app):
     return app.test_cli_runner()
 
 
+@pytest.fixture
+def broker():
+    broker = Broker()
+    yield broker
+    broker.close()
+
+
+@pytest.fixture
+def query_budget(app):
+    counts = []
+
+    @app.after_request
+    def count_queries(response):
+        counts.append(len(statements()))
+        return response
+
+    @contextlib.contextmanager
+    def budget(maximum):
+        del counts[:]
+        yield counts
+        assert counts, 'No request was made.'
+        assert max(counts) <= maximum, '{0} queries, the budget is {1}.'.format(max(counts), maximum)
+
+    return budget
+
+
+@pytest.fixture
+def sql(app):
+    executed = []
+
+    @app.after_request
+    def record(response):
+        executed.append([statement.sql for statement in statements()])
+        return response
+
+    return executed
+
+
 class AuthActions(object):
     def __init__(self, client):
         self._client = client
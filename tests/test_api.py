@@ -0,0 +1,172 @@
+import pytest
+from lsg_web.db import get_db
+
+
+def composition(app, id):
+    with app.app_context():
+        return [tuple(row) for row in get_db().execute(
+            'SELECT id_food, quantity FROM composed WHERE id_menu = ? ORDER BY id_food', (id,)
+        )]
+
+
+@pytest.mark.parametrize(('method', 'path'), (
+    ('post', '/api/foods'), ('post', '/api/menus'), ('post', '/api/menus/clone'), ('put', '/api/menus/1/composed'),
+))
+def test_security_required(client, auth, method, path):
+    assert getattr(client, method)(path, json={}).headers['Location'] == 'http://localhost/auth/login'
+    auth.login(mail='simple@user.be')
+    assert getattr(client, method)(path, json={}).status_code == 403
+
+
+def test_foods(client, auth, app):
+    auth.login()
+    response = client.post('/api/foods', json={'foods': [
+        {'name': 'Rice', 'id_category': 4, 'information': 'white rice'},
+        {'id_food': 1, 'name': 'Water', 'id_category': 1, 'information': 'still'},
+        {'name': 'Pear', 'id_category': 5, 'information': 'ripe'},
+    ]})
+    assert response.get_json() == {'foods': [6, 1, 7]}
+
+    with app.app_context():
+        foods = get_db().execute('SELECT id_food, name, id_person FROM food WHERE id_food IN (1, 6, 7)').fetchall()
+    assert [tuple(food) for food in foods] == [(1, 'Water', 1), (6, 'Rice', 1), (7, 'Pear', 1)]
+
+
+def test_foods_validated_together(client, auth, app):
+    auth.login()
+    response = client.post('/api/foods', json={'foods': [
+        {'name': 'Rice', 'id_category': 4, 'information': 'white rice'},
+        {'name': '', 'id_category': 4, 'information': 'x'},
+        {'name': 'Pear', 'id_category': 99, 'information': 'ripe'},
+        {'id_food': 42, 'name': 'Ghost', 'id_category': 1, 'information': 'x'},
+        {'name': 'Bool', 'id_category': True, 'information': 'x'},
+        {'name': ['x'], 'id_category': 1, 'information': 'x'},
+        {'name': 'List', 'id_category': 1, 'information': {'text': 'x'}},
+    ]})
+    assert response.status_code == 400
+    assert response.get_json()['errors'] == [
+        'foods[1]: You must enter a name.',
+        'foods[2]: You must select a valid category.',
+        "foods[3]: Food id 42 doesn't exist.",
+        'foods[4]: You must select a valid category.',
+        'foods[5]: You must enter a name.',
+        'foods[6]: You must enter some information.',
+    ]
+    with app.app_context():
+        assert get_db().execute('SELECT count(*) FROM food').fetchone()[0] == 5
+
+
+@pytest.mark.parametrize('body', (None, [], {'foods': {}}, {'foods': [1]}))
+def test_malformed(client, auth, body):
+    auth.login()
+    assert client.post('/api/foods', json=body).status_code == 400
+
+
+def test_menus(client, auth, app):
+    auth.login()
+    response = client.post('/api/menus', json={'menus': [
+        {'name': 'Lunch', 'information': 'a lunch', 'composed': [
+            {'id_food': 2, 'quantity': 200}, {'id_food': 3, 'quantity': 80},
+        ]},
+        {'id_menu': 1, 'name': 'Super-Menu', 'information': 'renamed', 'composed': [{'id_food': 5, 'quantity': 1}]},
+        {'name': 'Empty', 'information': 'nothing yet'},
+    ]})
+    assert response.get_json() == {'menus': [2, 1, 3]}
+    assert composition(app, 2) == [(2, 200), (3, 80)]
+    assert composition(app, 1) == [(5, 1)]
+    assert composition(app, 3) == []
+    with app.app_context():
+        menus = get_db().execute('SELECT id_menu, information, actif FROM menu ORDER BY id_menu').fetchall()
+    assert [tuple(menu) for menu in menus] == [(1, 'renamed', 1), (2, 'a lunch', 1), (3, 'nothing yet', 1)]
+
+
+def test_menus_validated_together(client, auth, app):
+    auth.login()
+    response = client.post('/api/menus', json={'menus': [
+        {'name': 'Lunch', 'information': 'a lunch', 'composed': [
+            {'id_food': 2, 'quantity': 200}, {'id_food': 2, 'quantity': 80}, {'id_food': 9, 'quantity': 1},
+            {'id_food': 3, 'quantity': 0}, {'id_food': 4, 'quantity': 12.5},
+        ]},
+        {'id_menu': 7, 'name': 'Ghost', 'information': 'x', 'composed': 'all'},
+        {'name': 1, 'information': 'x'},
+    ]})
+    assert response.status_code == 400
+    assert response.get_json()['errors'] == [
+        'menus[0].composed[1]: Food is already in the menu.',
+        'menus[0].composed[2]: Food does not exist.',
+        'menus[0].composed[3]: You must enter a quantity.',
+        'menus[0].composed[4]: You must enter a quantity.',
+        "menus[1]: Menu id 7 doesn't exist.",
+        'menus[1].composed: Expected a list of foods and quantities.',
+        'menus[2]: You must enter a name.',
+    ]
+    assert composition(app, 1) == [(1, 150), (2, 300)]
+
+
+def test_composed(client, auth, app):
+    auth.login()
+    response = client.put('/api/menus/1/composed', json={'composed': [
+        {'id_food': 4, 'quantity': 250}, {'id_food': 1, 'quantity': 330},
+    ]})
+    assert response.get_json() == {'id_menu': 1, 'composed': 2}
+    assert composition(app, 1) == [(1, 330), (4, 250)]
+
+    assert client.put('/api/menus/5/composed', json={'composed': []}).status_code == 404
+    response = client.put('/api/menus/1/composed', json={'composed': [{'id_food': 12, 'quantity': 1}]})
+    assert response.get_json() == {'errors': ['composed[0]: Food does not exist.']}
+    assert composition(app, 1) == [(1, 330), (4, 250)]
+
+
+def test_one_round_trip(client, auth, app, query_budget):
+    with app.app_context():
+        db = get_db()
+        db.executemany(
+            'INSERT INTO food (name, id_category, information, id_person) VALUES (?, 1, "x", 1)',
+            [('food {0}'.format(i),) for i in range(30)]
+        )
+        db.commit()
+    auth.login()
+    menu = {'name': 'Buffet', 'information': 'thirty foods',
+            'composed': [{'id_food': id, 'quantity': 10 * id} for id in range(6, 36)]}
+    # the generations and the rows of the user, one to validate and four to write
+    with query_budget(9):
+        assert client.post('/api/menus', json={'menus': [menu]}).get_json() == {'menus': [2]}
+    assert len(composition(app, 2)) == 30
+
+
+def test_clone(client, auth, app):
+    auth.login()
+    client.post('/api/menus', json={'menus': [{'name': 'Dinner', 'information': 'a dinner', 'composed': [
+        {'id_food': 3, 'quantity': 120},
+    ]}]})
+
+    response = client.post('/api/menus/clone', json={'menus': [2, 1, 2]})
+    assert response.get_json() == {'menus': [3, 4, 5]}
+    assert composition(app, 3) == composition(app, 5) == [(3, 120)]
+    assert composition(app, 4) == [(1, 150), (2, 300)]
+    with app.app_context():
+        names = get_db().execute('SELECT name, actif FROM menu WHERE id_menu > 2 ORDER BY id_menu').fetchall()
+    assert [tuple(name) for name in names] == [('Dinner_copy', 1), ('Super-Menu_copy', 1), ('Dinner_copy', 1)]
+
+
+def test_clone_validated(client, auth, app):
+    auth.login()
+    response = client.post('/api/menus/clone', json={'menus': [1, 8]})
+    assert response.get_json() == {'errors': ["menus[1]: Menu id 8 doesn't exist."]}
+    assert client.post('/api/menus/clone', json={'menus': ['1']}).status_code == 400
+    assert client.post('/api/menus/clone', json={'menus': []}).get_json() == {'menus': []}
+    with app.app_context():
+        assert get_db().execute('SELECT count(*) FROM menu').fetchone()[0] == 1
+
+
+def test_clone_set_based(client, auth, app, query_budget):
+    auth.login()
+    client.post('/api/menus', json={'menus': [
+        {'name': 'Day {0}'.format(day), 'information': 'x', 'composed': [
+            {'id_food': id, 'quantity': (day + 1) * id} for id in range(1, 6)
+        ]} for day in range(7)
+    ]})
+    # the queries loading the user, one to validate and three to write
+    with query_budget(7):
+        copies = client.post('/api/menus/clone', json={'menus': list(range(2, 9))}).get_json()['menus']
+    assert [composition(app, id) for id in copies] == [composition(app, id) for id in range(2, 9)]
@@ -1,3 +1,5 @@
+import sqlite3
+
 import pytest
 from flask import g, session
 
@@ -27,4 +29,48 @@ def test_logout(client, auth):
 
     with client:
         auth.logout()
-        assert 'user_id' not in session
\ No newline at end of file
+        assert 'user_id' not in session
+
+
+def test_identity_cache(client, auth, query_budget):
+    auth.login()
+    client.get('/')
+
+    # the user, permission and person rows come from the cache, checked in one query
+    with query_budget(3):
+        client.get('/')
+
+
+def test_identity_check(client, auth):
+    auth.login()
+    with client:
+        client.get('/running')
+        # the generations of the identity only, the badge of the layout reads its own counter
+        assert sorted(g.counters[1]) == ['generation_permission', 'generation_person', 'generation_user']
+
+
+def test_identity_cache_invalidation(client, auth):
+    auth.login()
+    client.get('/')
+    client.post('/person/1/update',
+                data={"name": "Renamed", "birthdate": "1991-08-27", "gender": "homme", "weight": "65", "actif": 1})
+    assert b'Renamed' in client.get('/').data
+
+    client.post('/user/1/update', data={"person": "1", "mail": "admin@admin.be", "password1": "admin",
+                                        "password2": "admin", "permission": "2", "actif": 1})
+    assert client.get('/user/list').status_code == 403
+
+
+def test_identity_written_elsewhere(app, client, auth):
+    auth.login()
+    client.get('/')
+
+    # as another worker would, with its own connection
+    db = sqlite3.connect(app.config['DATABASE'])
+    db.execute("UPDATE person SET name = 'Renamed' WHERE id_person = 1")
+    db.execute('UPDATE user SET id_permission = 2 WHERE id_user = 1')
+    db.commit()
+    db.close()
+
+    assert b'Renamed' in client.get('/').data
+    assert client.get('/user/list').status_code == 403
\ No newline at end of file
@@ -0,0 +1,60 @@
+import pytest
+from lsg_web.catalog import catalog, get_catalog
+from lsg_web.db import get_db
+
+
+def picklist_queries(executed, table):
+    return [sql for sql in executed if 'FROM ' + table + ' ORDER BY' in sql or 'FROM ' + table + ' WHERE actif' in sql]
+
+
+def test_lists_are_sorted(app):
+    with app.app_context():
+        categories, menus = catalog('categories', 'menus')
+        names = [category['name'] for category in categories]
+        assert names == sorted(names, key=str.lower)
+        assert set(menus[0]) == {'id_menu', 'name'}
+        active = get_db().execute('SELECT count(*) FROM menu WHERE actif = 1').fetchone()[0]
+        assert len(menus) == active
+
+
+@pytest.mark.parametrize(('path', 'tables'), (
+    ('/food/create', ('category',)),
+    ('/food/1/update', ('category',)),
+    ('/tray/create', ('version',)),
+    ('/tray/1/update', ('version',)),
+    ('/meal/create', ('menu',)),
+    ('/meal/1/update', ('menu',)),
+))
+def test_forms_read_the_cache(client, auth, sql, path, tables):
+    auth.login()
+    assert client.get(path).status_code == 200
+    del sql[:]
+    assert client.get(path).status_code == 200
+    for table in tables:
+        assert picklist_queries(sql[0], table) == []
+
+
+def test_write_invalidates(client, auth, app):
+    auth.login()
+    client.get('/food/create')
+    client.post('/category/create', data={'name': 'Aaa soup'})
+    assert b'Aaa soup' in client.get('/food/create').data
+
+    client.post('/api/menus', json={'menus': [{'name': 'Brand new menu', 'information': 'x'}]})
+    assert b'Brand new menu' in client.get('/meal/create').data
+
+    with app.app_context():
+        get_db().execute('UPDATE menu SET actif = 0 WHERE name = ?', ('Brand new menu',))
+        get_db().commit()
+    assert b'Brand new menu' not in client.get('/meal/create').data
+
+
+def test_other_worker_write(app):
+    with app.app_context():
+        versions = catalog('versions')
+        db = get_db()
+        db.execute('INSERT INTO version(name, release_date) VALUES ("Zeta", date("2022-01-01"))')
+        db.commit()
+        assert len(catalog('versions')) == len(versions) + 1
+        get_catalog().clear()
+        assert catalog('versions')[-1]['name'] == 'Zeta'
\ No newline at end of file
@@ -1,10 +1,11 @@
 import sqlite3
 
 import pytest
-from lsg_web.db import get_db
+from lsg_web.db import ConnectionPool, get_db
 
 
 def test_get_close_db(app):
+    app.config['DATABASE_POOL_SIZE'] = 0
     with app.app_context():
         db = get_db()
         assert db is get_db()
@@ -15,6 +16,42 @@ def test_get_close_db(app):
     assert 'closed' in str(e.value)
 
 
+def test_pooled_db(app):
+    with app.app_context():
+        db = get_db()
+        assert db is get_db()
+        assert db.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert db.execute('PRAGMA synchronous').fetchone()[0] == 1
+        assert db.execute('PRAGMA busy_timeout').fetchone()[0] == 5000
+
+    # the connection went back to the pool and is handed out again
+    assert db.execute('SELECT 1').fetchone()[0] == 1
+    with app.app_context():
+        assert get_db() is db
+
+
+def test_pooled_db_rollback(app):
+    with app.app_context():
+        get_db().execute('DELETE FROM bug')
+
+    with app.app_context():
+        assert get_db().execute('SELECT COUNT(id_bug) FROM bug').fetchone()[0] == 1
+
+
+def test_pool_size(app):
+    pool = ConnectionPool(app.config['DATABASE'], 1, 5000, 0, -2000)
+    first = pool.acquire()
+    second = pool.acquire()
+    assert first is not second
+    pool.release(first)
+    pool.release(second)
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        second.execute('SELECT 1')
+    assert first.execute('SELECT 1').fetchone()[0] == 1
+    pool.close()
+
+
 def test_init_db_command(runner, monkeypatch):
     class Recorder(object):
         called = False
@@ -25,4 +62,4 @@ def test_init_db_command(runner, monkeypatch):
     monkeypatch.setattr('lsg_web.db.init_db', fake_init_db)
     result = runner.invoke(args=['init-db'])
     assert 'Initialized' in result.output
-    assert Recorder.called
\ No newline at end of file
+    assert Recorder.called
@@ -0,0 +1,125 @@
+import os
+
+import pytest
+from lsg_web.db import get_db
+from lsg_web.events import close_events, format_event, get_events
+from lsg_web.presence import get_presence
+
+
+def received(subscriber):
+    messages = []
+    while not subscriber.queue.empty():
+        messages.append(subscriber.queue.get_nowait())
+    return messages
+
+
+def test_login_required(client):
+    response = client.get('/events')
+    assert response.headers['Location'] == 'http://localhost/auth/login'
+
+
+def test_stream(client, auth, app):
+    auth.login()
+    response = client.get('/events', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    assert response.headers['Cache-Control'] == 'no-cache'
+
+    stream = iter(response.response)
+    assert next(stream) == b'retry: 3000\n\n'
+    with app.app_context():
+        get_events().publish('tray', {'name': 'Super-Tray', 'online': True})
+    assert next(stream) == format_event('tray', {'name': 'Super-Tray', 'online': True}).encode('utf8')
+
+    response.close()
+    with app.app_context():
+        assert not get_events()._subscribers
+
+
+def test_meal_started_and_finished(client, auth, app):
+    with app.app_context():
+        hub = get_events()
+        subscriber = hub.subscribe()
+        hub.poll()
+
+    auth.login()
+    client.post("/meal/create", data={"menu": "1", "person": "4", "tray": 1, "information": "created information"})
+    client.post('/meal/2/finished')
+
+    with app.app_context():
+        hub.poll()
+    messages = received(subscriber)
+    assert len(messages) == 2
+    assert messages[0].startswith('id: 1\nevent: meal\n')
+    assert '"kind": "start"' in messages[0]
+    assert '"uname": "Bob"' in messages[0]
+    assert '"tname": "Super-Tray"' in messages[0]
+    assert messages[1].startswith('id: 2\nevent: meal\n')
+    assert '"kind": "finish"' in messages[1]
+
+
+def test_replay(client, auth, app):
+    with app.app_context():
+        hub = get_events()
+        hub.poll()
+    auth.login()
+    client.post("/meal/create", data={"menu": "1", "person": "4", "tray": 1, "information": "created information"})
+    client.post('/meal/2/finished')
+
+    with app.app_context():
+        hub.poll()
+        subscriber = hub.subscribe()
+        hub.replay(subscriber, get_db(), 1)
+    messages = received(subscriber)
+    assert len(messages) == 1
+    assert messages[0].startswith('id: 2\n')
+
+
+def test_tray_presence(app):
+    with app.app_context():
+        hub = get_events()
+        subscriber = hub.subscribe()
+        hub.poll()
+        get_presence().beat('Super-Tray', '10.0.0.2')
+    assert received(subscriber) == [format_event('tray', {'name': 'Super-Tray', 'online': True})]
+
+
+@pytest.mark.parametrize('separator', (b',', b';'))
+def test_samples(app, separator):
+    path = os.path.join(app.config['DATA_UPLOADS'], '1.csv')
+    with app.app_context():
+        hub = get_events()
+        watching = hub.subscribe(1)
+        other = hub.subscribe(2)
+        hub.poll()
+        assert received(watching) == []
+
+        with open(path, 'ab') as f:
+            f.write(separator.join([b'1000.5', b'12.0', b'13.5']) + b'\n' + b'1001')
+        hub.poll()
+        assert received(watching) == [format_event('sample', {'id_meal': 1, 'rows': [[1000.5, 12.0, 13.5]]})]
+
+        with open(path, 'ab') as f:
+            f.write(separator.join([b'.5', b'14.0', b'15.5']) + b'\n')
+        hub.poll()
+        assert received(watching) == [format_event('sample', {'id_meal': 1, 'rows': [[1001.5, 14.0, 15.5]]})]
+
+        hub.unsubscribe(watching)
+        assert 1 not in hub._watched
+    assert received(other) == []
+
+
+def test_thread_ends_without_subscribers(app):
+    with app.app_context():
+        hub = get_events()
+        hub.interval = 0.01
+        subscriber = hub.subscribe()
+        thread = hub._thread
+        hub.unsubscribe(subscriber)
+        thread.join(5)
+        assert not thread.is_alive()
+
+        hub.subscribe()
+        assert hub._thread is not thread and hub._thread.is_alive()
+    close_events(app)
+    assert not hub._thread.is_alive()
+    assert 'lsg_events' not in app.extensions
\ No newline at end of file
@@ -0,0 +1,82 @@
+import csv
+import gzip
+import io
+import os
+import zipfile
+
+from lsg_web.db import get_db
+from lsg_web.export import export_meals
+
+
+def manifest(archive):
+    return list(csv.DictReader(io.TextIOWrapper(archive.open('manifest.csv'), encoding='utf8')))
+
+
+def test_export(client, auth, app):
+    auth.login()
+    client.post("/meal/create", data={"menu": "1", "person": "4", "tray": 2, "information": "created information"})
+    with open(os.path.join(app.config['DATA_UPLOADS'], '2.csv.gz'), 'wb') as f:
+        f.write(gzip.compress(b'0,500\n'))
+
+    response = client.get('/meal/export')
+    assert response.is_streamed
+    assert response.headers['Content-Disposition'] == 'attachment; filename=meals.zip'
+    archive = zipfile.ZipFile(io.BytesIO(response.data))
+    assert archive.namelist() == ['manifest.csv', '1.csv', '2.csv.gz']
+    assert archive.read('1.csv') == b'abcdef'
+    assert gzip.decompress(archive.read('2.csv.gz')) == b'0,500\n'
+    meals = manifest(archive)
+    assert [meal['id_meal'] for meal in meals] == ['1', '2']
+    assert meals[1]['tray'] == 'Super-Tray II'
+    assert meals[1]['file'] == '2.csv.gz'
+
+    archive = zipfile.ZipFile(io.BytesIO(client.get('/meal/export?tray=2').data))
+    assert archive.namelist() == ['manifest.csv', '2.csv.gz']
+    archive = zipfile.ZipFile(io.BytesIO(client.get('/meal/export?candidate=3&to=2000-01-01').data))
+    assert archive.namelist() == ['manifest.csv']
+    assert manifest(archive) == []
+
+
+def test_export_login_required(client):
+    assert client.get('/meal/export').headers['Location'] == 'http://localhost/auth/login'
+
+
+def test_export_streamed(app):
+    with app.app_context():
+        db = get_db()
+        db.executemany(
+            'INSERT INTO meal (id_user, id_menu, id_tray, id_candidate, start, information, actif) '
+            'VALUES (1, 1, 1, 3, datetime("now"), ?, 1)', [('meal {0}'.format(i) * 10,) for i in range(2000)]
+        )
+        chunks = list(export_meals(db, app.config['DATA_UPLOADS'], {}, chunk_size=4096))
+
+    assert len(chunks) > 10
+    assert max(len(chunk) for chunk in chunks) < 16 * 1024
+    assert len(manifest(zipfile.ZipFile(io.BytesIO(b''.join(chunks))))) == 2001
+
+
+def test_export_command(runner, app, tmp_path):
+    output = str(tmp_path / 'meals.zip')
+    runner.invoke(args=['lsg', 'export', output, '--from', '2000-01-01', '--menu', '1'])
+    assert zipfile.ZipFile(output).namelist() == ['manifest.csv', '1.csv']
+
+    runner.invoke(args=['lsg', 'export', output, '--status', 'open'])
+    assert zipfile.ZipFile(output).namelist() == ['manifest.csv']
+
+
+def test_export_consistent(app):
+    with app.app_context():
+        db = get_db()
+        chunks = export_meals(db, app.config['DATA_UPLOADS'], {})
+        first = next(chunks)
+        # a meal recorded once the manifest is written is left for the next export
+        db.execute(
+            'INSERT INTO meal (id_user, id_menu, id_tray, id_candidate, start, information, actif) '
+            'VALUES (1, 1, 2, 3, datetime("now"), "", 1)'
+        )
+        with open(os.path.join(app.config['DATA_UPLOADS'], '2.csv'), 'wb') as f:
+            f.write(b'0,500\n')
+        archive = zipfile.ZipFile(io.BytesIO(first + b''.join(chunks)))
+
+    assert archive.namelist() == ['manifest.csv', '1.csv']
+    assert [meal['file'] for meal in manifest(archive)] == ['1.csv']
\ No newline at end of file
@@ -0,0 +1,122 @@
+import json
+
+import pytest
+from lsg_web.db import get_db
+from lsg_web.facets import facet_counts, meal_filter
+
+
+@pytest.fixture
+def meals(app):
+    with app.app_context():
+        db = get_db()
+        db.executemany(
+            'INSERT INTO meal(id_user, id_menu, id_tray, id_candidate, start, end, information, actif) '
+            'VALUES (1, 1, ?, ?, ?, ?, "", ?)', [
+                (1, 3, '2020-05-01 12:00:00', '2020-05-01 13:00:00', 1),
+                (2, 3, '2020-05-02 12:00:00', None, 1),
+                (2, 4, '2020-05-03 12:00:00', '2020-05-04 00:10:00', 1),
+                (2, 4, '2020-05-03 18:00:00', '2020-05-03 19:00:00', 0),
+            ]
+        )
+        db.commit()
+
+
+def matching(app, args):
+    where, parameters = meal_filter(args)
+    with app.app_context():
+        return [row[0] for row in get_db().execute(
+            'SELECT id_meal FROM meal p WHERE ' + where + ' ORDER BY id_meal', parameters
+        )]
+
+
+@pytest.mark.parametrize(('args', 'ids'), (
+    ({}, [1, 2, 3, 4]),
+    ({'from': '2020-05-02', 'to': '2020-05-03'}, [3, 4]),
+    ({'end_from': '2020-05-04'}, [1, 4]),
+    ({'end_to': '2020-05-01'}, [2]),
+    ({'tray': '2'}, [3, 4]),
+    ({'candidate': 4}, [4]),
+    ({'status': 'open'}, [3]),
+    ({'status': 'closed', 'tray': '2'}, [4]),
+    ({'status': 'other'}, [1, 2, 3, 4]),
+))
+def test_meal_filter(app, meals, args, ids):
+    assert matching(app, args) == ids
+
+
+def test_facet_counts(app, meals):
+    with app.app_context():
+        counts = facet_counts(get_db(), {'tray': '2', 'status': 'closed'})
+
+    assert counts['meals'] == 1
+    facets = counts['facets']
+    # each facet is counted without its own selection
+    assert facets['tray'] == [
+        {'value': 1, 'name': 'Super-Tray', 'meals': 2},
+        {'value': 2, 'name': 'Super-Tray II', 'meals': 1},
+    ]
+    assert facets['status'] == [
+        {'value': 'closed', 'name': 'closed', 'meals': 1},
+        {'value': 'open', 'name': 'open', 'meals': 1},
+    ]
+    assert facets['candidate'] == [{'value': 4, 'name': 'Bob', 'meals': 1}]
+    assert facets['menu'] == [{'value': 1, 'name': 'Super-Menu', 'meals': 1}]
+
+
+def test_facet_counts_single_statement(app, meals):
+    with app.app_context():
+        db = get_db()
+        del db.statements[:]
+        facet_counts(db, {'from': '2020-05-01', 'to': '2020-05-31', 'menu': 1})
+        assert len(db.statements) == 1
+        plan = db.execute('EXPLAIN QUERY PLAN ' + db.statements[0].sql, ['2020-05-01', '2020-05-31']).fetchall()
+        full = db.execute('EXPLAIN QUERY PLAN ' + facet_sql(db)).fetchall()
+    assert 'SEARCH p USING COVERING INDEX meal_started (actif=? AND start>? AND start<?)' in [row['detail'] for row in plan]
+    assert 'SEARCH p USING COVERING INDEX meal_facets (actif=?)' in [row['detail'] for row in full]
+
+
+def facet_sql(db):
+    del db.statements[:]
+    facet_counts(db, {})
+    return db.statements[0].sql
+
+
+def test_facets_view(client, auth, meals):
+    assert client.get('/meal/facets').headers['Location'] == 'http://localhost/auth/login'
+    auth.login()
+    counts = client.get('/meal/facets?from=2020-05-01&to=2020-05-31').get_json()
+    assert counts['meals'] == 3
+    assert [tray['meals'] for tray in counts['facets']['tray']] == [1, 2]
+
+
+def test_filtered_listing(client, auth, meals):
+    auth.login()
+    page = client.get('/meal/list/data?tray=2&status=closed').get_json()
+    assert page['recordsTotal'] == page['recordsFiltered'] == 1
+    assert [meal['id_meal'] for meal in page['data']] == [4]
+
+    response = client.get('/meal/list?status=open')
+    assert b'href="/meal/3/info"' in response.data
+    assert b'href="/meal/1/info"' not in response.data
+    assert b'href="/meal/export?status=open"' in response.data
+
+
+def test_cursor_of_another_filter(client, auth, meals):
+    auth.login()
+    first = client.get('/meal/list/data?length=1&tray=1').get_json()
+    assert [meal['id_meal'] for meal in first['data']] == [1]
+    args = {'length': 1, 'start': 1, 'after': json.dumps(first['next']), 'tray': 2}
+    page = client.get('/meal/list/data', query_string=args).get_json()
+    assert [meal['id_meal'] for meal in page['data']] == [4]
+
+
+def test_cursor_of_another_facet(client, auth, meals):
+    auth.login()
+    first = client.get('/meal/list/data', query_string={'length': 1, 'order[0][dir]': 'desc', 'tray': 1}).get_json()
+    assert [meal['id_meal'] for meal in first['data']] == [2]
+    # opaque to the browser
+    assert 'id_tray' not in json.dumps(first['next'])
+    # the same parameters filtering another column
+    args = {'length': 1, 'start': 1, 'order[0][dir]': 'desc', 'after': json.dumps(first['next']), 'menu': 1}
+    page = client.get('/meal/list/data', query_string=args).get_json()
+    assert [meal['id_meal'] for meal in page['data']] == [3]
\ No newline at end of file
@@ -0,0 +1,89 @@
+import os
+import sqlite3
+import threading
+
+import pytest
+from lsg_web.db import get_db
+from lsg_web.heartbeat import get_heartbeats
+from lsg_web.ingest import TelemetryIngestor
+
+
+@pytest.fixture
+def ingestor(app, tmp_path):
+    app.config['DATA_UPLOADS'] = str(tmp_path)
+    return TelemetryIngestor(app, 0.1)
+
+
+def test_decode(ingestor):
+    assert ingestor.handle('lsg/super-tray', b'Super-Tray\tHEARTBEAT\t10.0.0.7')
+    assert ingestor.handle('lsg/super-tray', b'Super-Tray\tDATA\t2.csv\n1,500\n2,499')
+    assert ingestor.handle('lsg/super-tray', b'SERVER\tSTART MEAL\t2.csv')
+    assert not ingestor.handle('lsg/super-tray', b'Super-Tray\tREBOOT')
+    assert not ingestor.handle('lsg/super-tray', b'Super-Tray\tDATA\t2.exe\n1,500')
+    assert not ingestor.handle('lsg/other', b'Super-Tray\tHEARTBEAT\t10.0.0.7')
+    assert not ingestor.handle('lsg/super-tray', b'\xff')
+    assert (ingestor.received, ingestor.rejected) == (2, 4)
+
+
+def test_flush(app, ingestor, tmp_path):
+    ingestor.handle('lsg/super-tray', b'Super-Tray\tHEARTBEAT\t10.0.0.7')
+    ingestor.handle('lsg/super-tray', b'Super-Tray\tHEARTBEAT\t10.0.0.8')
+    ingestor.handle('lsg/super-tray', b'Super-Tray\tDATA\t2.csv\n1,500\n2,499')
+    ingestor.handle('lsg/super-tray', b'Super-Tray\tDATA\t2.csv\n3,498\n')
+    ingestor.handle('lsg/ghost', b'Ghost\tHEARTBEAT\t10.0.0.9')
+    ingestor.handle('lsg/ghost', b'Ghost\tDATA\t3.csv\n1,500')
+
+    with app.app_context():
+        ingestor.flush()
+        tray = get_db().execute("SELECT * FROM tray WHERE name = 'Super-Tray'").fetchone()
+        assert tray['online'] == 1
+        assert tray['ip'] == '10.0.0.8'
+
+    assert (tmp_path / '2.csv').read_text() == '1,500\n2,499\n3,498\n'
+    assert not os.path.exists(str(tmp_path / '3.csv'))
+
+
+def test_flush_heartbeats_failing(app, ingestor, tmp_path, monkeypatch):
+    ingestor.handle('lsg/super-tray', b'Super-Tray\tHEARTBEAT\t10.0.0.7')
+    ingestor.handle('lsg/super-tray', b'Super-Tray\tDATA\t2.csv\n1,500\n')
+
+    def locked():
+        raise sqlite3.OperationalError('database is locked')
+
+    with app.app_context():
+        monkeypatch.setattr(get_heartbeats(), 'flush', locked)
+        with pytest.raises(sqlite3.OperationalError):
+            ingestor.flush()
+    assert (tmp_path / '2.csv').read_text() == '1,500\n'
+
+
+def test_flush_rows_failing(app, ingestor, tmp_path):
+    ingestor.handle('lsg/super-tray', b'Super-Tray\tDATA\t2.csv\n1,500\n')
+    os.mkdir(str(tmp_path / '2.csv'))
+    with app.app_context():
+        with pytest.raises(OSError):
+            ingestor.flush()
+        ingestor.handle('lsg/super-tray', b'Super-Tray\tDATA\t2.csv\n2,499\n')
+        os.rmdir(str(tmp_path / '2.csv'))
+        ingestor.flush()
+    assert (tmp_path / '2.csv').read_text() == '1,500\n2,499\n'
+
+
+def test_command(app, runner, broker, tmp_path):
+    app.config.update({'MQTT_BROKER_URL': '127.0.0.1', 'MQTT_BROKER_PORT': broker.port,
+                       'DATA_UPLOADS': str(tmp_path)})
+
+    def tray():
+        assert broker.wait_for_subscribers()
+        broker.publish('lsg/super-tray', 'Super-Tray\tHEARTBEAT\t10.0.0.7')
+        broker.publish('lsg/super-tray', 'Super-Tray\tDATA\t2.csv\n1,500')
+
+    thread = threading.Thread(target=tray)
+    thread.start()
+    result = runner.invoke(args=['lsg', 'ingest', '--duration', '1', '--interval', '0.1'])
+    thread.join()
+
+    assert 'Received 2 messages, rejected 0.' in result.output
+    assert (tmp_path / '2.csv').read_text() == '1,500\n'
+    with app.app_context():
+        assert get_db().execute("SELECT ip FROM tray WHERE name = 'Super-Tray'").fetchone()[0] == '10.0.0.7'
\ No newline at end of file
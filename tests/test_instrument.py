@@ -0,0 +1,66 @@
+import pytest
+from lsg_web.db import get_db
+from lsg_web.instrument import normalize, statements
+
+
+def test_normalize():
+    assert normalize(
+        "SELECT * FROM meal\n   WHERE id_meal = 12 AND end > datetime('now', \"-30 seconds\")"
+    ) == 'SELECT * FROM meal WHERE id_meal = ? AND end > datetime(?, ?)'
+
+
+def test_statements(app):
+    with app.test_request_context():
+        db = get_db()
+        db.execute('SELECT * FROM person').fetchall()
+        for _ in db.execute('SELECT * FROM food WHERE id_category < ?', (3,)):
+            pass
+        db.execute('UPDATE bug SET corrected = 0')
+        recorded = statements()
+        assert [s.rows for s in recorded] == [6, 2, 1]
+        assert recorded[1].normalized == 'SELECT * FROM food WHERE id_category < ?'
+        assert all(s.duration > 0 for s in recorded)
+
+
+def test_server_timing(client, auth):
+    auth.login()
+    response = client.get('/')
+    assert response.headers['Server-Timing'].startswith('sql;dur=')
+    assert 'queries' in response.headers['Server-Timing']
+    assert b'sql-debug-panel' not in response.data
+
+    auth.logout()
+    assert 'Server-Timing' not in client.get('/running').headers
+
+
+def test_debug_panel(app, client, auth):
+    app.config['SQL_DEBUG_PANEL'] = True
+    auth.login()
+    response = client.get('/meal/list')
+    assert b'sql-debug-panel' in response.data
+    assert b'FROM meal p JOIN person u' in response.data
+    assert response.data.rstrip().endswith(b'</html>')
+
+
+@pytest.mark.parametrize(('path', 'budget'), (
+    ('/', 6),
+    ('/meal/list', 6),
+    ('/meal/1/info', 7),
+    ('/meal/create', 8),
+    ('/meal/1/update', 8),
+    ('/menu/list', 6),
+    ('/menu/1/info', 7),
+    ('/menu/1/add', 6),
+    ('/food/list', 5),
+    ('/person/list', 6),
+    ('/person/1/info', 7),
+    ('/user/list', 6),
+    ('/tray/list', 6),
+    ('/category/list', 5),
+    ('/bug/list', 6),
+    ('/changelog', 4),
+))
+def test_query_budget(client, auth, query_budget, path, budget):
+    auth.login()
+    with query_budget(budget):
+        assert client.get(path).status_code == 200
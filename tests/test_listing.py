@@ -0,0 +1,134 @@
+import json
+
+import pytest
+from lsg_web.db import get_db
+
+
+@pytest.fixture
+def meals(app):
+    with app.app_context():
+        db = get_db()
+        db.executemany(
+            'INSERT INTO meal(id_user, id_menu, id_tray, id_candidate, start, end, information, actif) '
+            'VALUES (1, 1, ?, ?, datetime("now"), NULL, ?, ?)',
+            [(1 + i % 2, 3 + i % 3, 'meal {0}'.format(i), int(i != 5)) for i in range(20)]
+        )
+        db.commit()
+
+
+def pages(client, path, **args):
+    """Follow the ``next`` cursors, return every page."""
+    args.setdefault('length', 4)
+    response = client.get(path, query_string=args)
+    result = [response.get_json()]
+    while result[-1]['next']:
+        start = result[-1]['start'] + len(result[-1]['data'])
+        response = client.get(path, query_string=dict(args, start=start, after=json.dumps(result[-1]['next'])))
+        result.append(response.get_json())
+    return result
+
+
+@pytest.mark.parametrize('path', ('/meal/list/data', '/food/list/data', '/person/list/data', '/menu/list/data'))
+def test_login_required(client, path):
+    assert client.get(path).headers['Location'] == 'http://localhost/auth/login'
+
+
+def test_security_required(client, auth):
+    auth.login(mail='simple@user.be')
+    assert client.get('/user/list/data').status_code == 403
+
+
+def test_first_page(client, auth, meals):
+    auth.login()
+    page = client.get('/meal/list/data', query_string={'length': 4, 'draw': 3}).get_json()
+    assert page['draw'] == 3
+    assert page['recordsTotal'] == page['recordsFiltered'] == 20
+    assert [meal['id_meal'] for meal in page['data']] == [1, 2, 3, 4]
+    assert page['data'][0]['cname'] == 'Alice'
+    assert page['next'] is not None
+
+
+def test_keyset_matches_offset(client, auth, meals):
+    auth.login()
+    followed = pages(client, '/meal/list/data')
+    # the last page is full, the one after it is empty
+    assert len(followed) == 6
+    assert followed[-1]['data'] == []
+    ids = [meal['id_meal'] for page in followed for meal in page['data']]
+    assert ids == [1, 2, 3, 4, 5, 6, 8] + list(range(9, 22))
+    assert all(page['recordsFiltered'] == 20 for page in followed)
+
+    offset = client.get('/meal/list/data', query_string={'length': 4, 'start': 8}).get_json()
+    assert offset['data'] == followed[2]['data']
+
+
+def test_sort(client, auth, meals):
+    auth.login()
+    args = {'columns[3][data]': 'cname', 'order[0][column]': 3, 'order[0][dir]': 'desc'}
+    followed = pages(client, '/meal/list/data', **args)
+    rows = [(meal['cname'], meal['id_meal']) for page in followed for meal in page['data']]
+    assert rows == sorted(rows, reverse=True)
+    assert len(rows) == 20
+
+
+def test_search(client, auth, meals):
+    auth.login()
+    followed = pages(client, '/meal/list/data', **{'search[value]': ' super-tray  II '})
+    ids = [meal['id_meal'] for page in followed for meal in page['data']]
+    assert ids == [3, 5] + list(range(9, 22, 2))
+    assert followed[0]['recordsTotal'] == 20
+    assert followed[0]['recordsFiltered'] == 9
+
+    page = client.get('/meal/list/data', query_string={'search[value]': '100%'}).get_json()
+    assert page['recordsFiltered'] == 0
+    assert page['data'] == []
+
+
+def test_cursor_of_another_order(client, auth, meals):
+    auth.login()
+    first = client.get('/meal/list/data', query_string={'length': 4}).get_json()
+    args = {'length': 4, 'start': 4, 'after': json.dumps(first['next']), 'order[0][column]': 0, 'order[0][dir]': 'desc'}
+    page = client.get('/meal/list/data', query_string=args).get_json()
+    assert [meal['id_meal'] for meal in page['data']] == [17, 16, 15, 14]
+
+
+def test_invalid_cursor(client, auth):
+    auth.login()
+    assert client.get('/meal/list/data', query_string={'after': 'nope'}).status_code == 400
+    assert client.get('/meal/list/data', query_string={'after': '[1]'}).status_code == 400
+
+
+def test_page_size(app, client, auth, meals):
+    app.config['LISTING_MAX_PAGE_SIZE'] = 10
+    auth.login()
+    assert len(client.get('/meal/list/data', query_string={'length': -1}).get_json()['data']) == 10
+    assert len(client.get('/meal/list/data', query_string={'length': 50}).get_json()['data']) == 10
+
+
+def test_list_page(app, client, auth, meals):
+    app.config['LISTING_PAGE_SIZE'] = 4
+    auth.login()
+    response = client.get('/meal/list')
+    assert b'href="/meal/4/info"' in response.data
+    assert b'href="/meal/5/info"' not in response.data
+    assert b'"recordsTotal": 20' in response.data
+
+
+def test_users_without_passwords(client, auth):
+    auth.login()
+    page = client.get('/user/list/data').get_json()
+    assert page['recordsTotal'] == 3
+    assert [user['mail'] for user in page['data']] == ['admin@admin.be', 'simple@user.be', 'alice@user.be']
+    assert all('password' not in user for user in page['data'])
+
+
+def test_counted_on_the_first_table(client, auth, meals, sql):
+    auth.login()
+    first = client.get('/meal/list/data', query_string={'length': 4}).get_json()
+    client.get('/meal/list/data', query_string={'length': 4, 'start': 4, 'after': json.dumps(first['next'])})
+    client.get('/meal/list/data', query_string={'length': 4, 'search[value]': 'Alice'})
+    counts = [[statement for statement in executed if 'count(' in statement] for executed in sql[-3:]]
+    # without a search the joins are left out
+    assert counts[0] == counts[1] == ['SELECT count(*) FROM meal p WHERE p.actif = 1']
+    assert 'JOIN' in counts[2][0]
+    assert not any('OVER' in statement for executed in sql for statement in executed)
\ No newline at end of file
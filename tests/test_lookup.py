@@ -0,0 +1,73 @@
+import pytest
+from lsg_web.db import get_db
+from lsg_web.lookup import lookup
+
+
+def names(client, path, **args):
+    response = client.get(path, query_string=args)
+    assert response.status_code == 200
+    return [hit['name'] for hit in response.get_json()['hits']]
+
+
+def test_login_required(client):
+    assert client.get('/lookup/person?q=ali').headers['Location'] == 'http://localhost/auth/login'
+
+
+@pytest.mark.parametrize(('text', 'expected'), (
+    ('a', ['Administrator', 'Alice']),
+    ('JU', ['Justine']),
+    ('lic', ['Alice']),
+    ('  ICE ', ['Alice']),
+    ('', []),
+    ('zzz', []),
+))
+def test_person(client, auth, text, expected):
+    auth.login()
+    assert names(client, '/lookup/person', q=text) == expected
+
+
+def test_prefix_first(client, auth):
+    auth.login()
+    assert names(client, '/lookup/food', q='super')[:2] == ['Super-Dessert', 'Super-Meat']
+    assert names(client, '/lookup/food', q='eat') == ['Super-Meat']
+    assert names(client, '/lookup/food', q='super', limit=2) == ['Super-Dessert', 'Super-Meat']
+
+
+def test_food_not_in_menu(client, auth):
+    auth.login()
+    assert names(client, '/lookup/food', q='super', menu=1) == ['Super-Dessert', 'Super-Starchy', 'Super-Vegetable']
+    assert names(client, '/lookup/food', q='s', menu=1) == ['Super-Dessert', 'Super-Starchy', 'Super-Vegetable']
+
+
+def test_index_follows_writes(app):
+    with app.app_context():
+        db = get_db()
+        db.execute('UPDATE person SET name = "Alicia" WHERE name = "Alice"')
+        db.execute('UPDATE person SET actif = 0 WHERE name = "Justine"')
+        db.execute('INSERT INTO food (name, id_category, information, id_person) VALUES ("Apple pie", 5, "x", 1)')
+        db.commit()
+        assert [hit['name'] for hit in lookup(db, 'person', 'alici', 10)] == ['Alicia']
+        assert lookup(db, 'person', 'justine', 10) == []
+        assert lookup(db, 'person', 'ju', 10) == []
+        assert [hit['name'] for hit in lookup(db, 'food', 'pie', 10)] == ['Apple pie']
+
+
+def test_forms_use_lookup(client, auth):
+    auth.login()
+    assert b'Justine' not in client.get('/meal/create').data
+    response = client.get('/meal/1/update').data
+    assert b'data-lookup="/lookup/person"' in response
+    assert b'<option value="3" selected>Alice</option>' in response
+    assert b'Super-Dessert' not in client.get('/menu/1/add').data
+
+
+@pytest.mark.parametrize(('path', 'data', 'message'), (
+    ('/meal/create', {'menu': '1', 'tray': 1, 'information': 'x'}, b'You must select a person.'),
+    ('/meal/1/update', {'menu': '1', 'information': 'x'}, b'You must select a person.'),
+    ('/menu/1/add', {'quantity': '100'}, b'You must select a food.'),
+))
+def test_nothing_looked_up(client, auth, path, data, message):
+    auth.login()
+    response = client.post(path, data=data)
+    assert response.status_code == 200
+    assert message in response.data
\ No newline at end of file
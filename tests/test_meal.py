@@ -1,5 +1,10 @@
+import gzip
+import io
+import os
+
 import pytest
 from lsg_web.db import get_db
+from lsg_web.meal import open_meals
 from datetime import datetime
 
 
@@ -160,4 +165,115 @@ def test_meal_download(client, auth):
     assert response.status_code == 200
 
     response = client.get('/meal/25/download')
-    assert response.status_code == 404
\ No newline at end of file
+    assert response.status_code == 404
+
+
+def test_open_meals(client, auth, app):
+    auth.login()
+    with app.app_context():
+        assert open_meals() == 0
+
+    client.post("/meal/create", data={"menu": "1", "person": "4", "tray": 1, "information": "created information"})
+    client.post("/meal/create", data={"menu": "1", "person": "5", "tray": 2, "information": "created information"})
+    assert b'<span class="badge badge-count">2</span>' in client.get('/').data
+
+    client.post('/meal/2/finished')
+    with app.app_context():
+        assert open_meals() == 1
+        db = get_db()
+        db.execute('DELETE FROM meal WHERE id_meal = 3')
+        db.commit()
+        assert open_meals() == 0
+
+
+def test_open_meals_drift(app):
+    with app.app_context():
+        db = get_db()
+        db.execute("UPDATE counter SET value = -3 WHERE name = 'open_meals'")
+        db.execute('UPDATE meal SET end = NULL')
+        db.commit()
+        assert open_meals() == 1
+
+        db.execute("DELETE FROM counter")
+        db.commit()
+        assert open_meals() == 1
+
+
+def test_recount_keeps_pending_writes(app):
+    with app.app_context():
+        db = get_db()
+        db.execute("DELETE FROM counter WHERE name = 'open_meals'")
+        db.commit()
+        db.execute('INSERT INTO category (name) VALUES ("Pending")')
+        assert open_meals() == 0
+        db.rollback()
+        assert db.execute('SELECT * FROM category WHERE name = "Pending"').fetchone() is None
+        assert open_meals() == 0
+        assert db.execute("SELECT value FROM counter WHERE name = 'open_meals'").fetchone()[0] == 0
+
+
+def test_series(client, auth, app, tmp_path):
+    app.config['DATA_UPLOADS'] = str(tmp_path)
+    (tmp_path / '1.csv').write_text(''.join('{0},{1}\n'.format(i, i % 100) for i in range(10000)))
+    auth.login()
+
+    series = client.get('/meal/1/series?points=100').get_json()
+    assert series['names'] == ['sensor1']
+    assert 25 <= len(series['t']) <= 100
+    assert series['t'][0] == 0
+    assert max(series['max']['sensor1']) == 99
+    assert min(series['min']['sensor1']) == 0
+
+    series = client.get('/meal/1/series?points=100&from=1000&to=1049').get_json()
+    assert series['level'] == 0
+    assert series['t'] == list(range(1000, 1050))
+    assert series['max']['sensor1'] == series['min']['sensor1'] == list(range(0, 50))
+
+    app.config['SERIES_MAX_POINTS'] = 10
+    assert len(client.get('/meal/1/series?points=5000').get_json()['t']) <= 10
+
+
+def test_series_validate(client, auth, app, tmp_path):
+    app.config['DATA_UPLOADS'] = str(tmp_path)
+    assert client.get('/meal/1/series').headers['Location'] == 'http://localhost/auth/login'
+    auth.login()
+    assert client.get('/meal/1/series').status_code == 404
+    assert client.get('/meal/25/series').status_code == 404
+    (tmp_path / '1.csv').write_text('0,500\n')
+    assert client.get('/meal/1/series?points=0').status_code == 400
+
+
+def test_download_compressed(client, auth, app):
+    content = b''.join(b'%d,500\n' % i for i in range(1000))
+    client.post('/tray/data', content_type='multipart/form-data', data={
+        'image': (io.BytesIO(b"abcdef"), '1.jpg'), 'data': (io.BytesIO(content), '1.csv')
+    })
+    folder = app.config['DATA_UPLOADS']
+    assert not os.path.exists(os.path.join(folder, '1.csv'))
+    assert os.path.getsize(os.path.join(folder, '1.csv.gz')) < len(content) / 2
+    auth.login()
+
+    response = client.get('/meal/1/download', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(response.data) == content
+    etag = response.headers['ETag']
+    response = client.get('/meal/1/download', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert response.status_code == 304
+
+    response = client.get('/meal/1/download')
+    assert 'Content-Encoding' not in response.headers
+    assert response.data == content
+    assert response.headers['ETag'] != etag
+    response = client.get('/meal/1/download', headers={'Range': 'bytes=6000-6009'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == 'bytes 6000-6009/{0}'.format(len(content))
+    assert response.data == content[6000:6010]
+
+
+def test_download_range(client, auth):
+    auth.login()
+    response = client.get('/meal/1/download', headers={'Range': 'bytes=2-3'})
+    assert response.status_code == 206
+    assert response.data == b'cd'
+    assert client.get('/meal/1/download', headers={'Range': 'bytes=20-30'}).status_code == 416
\ No newline at end of file
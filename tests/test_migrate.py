@@ -0,0 +1,119 @@
+import os
+import shutil
+import sqlite3
+
+import pytest
+from lsg_web import migrate
+from lsg_web.db import get_db
+
+
+@pytest.fixture
+def migrations(app, tmp_path):
+    # start from a database created before schema_version existed
+    with app.app_context():
+        get_db().execute('DROP TABLE schema_version')
+
+    (tmp_path / '0001_note.sql').write_text(
+        'ALTER TABLE meal ADD COLUMN note TEXT;\n'
+        'CREATE INDEX meal_note ON meal(note);\n'
+    )
+    (tmp_path / '0002_backfill.py').write_text(
+        'from lsg_web.migrate import run_in_batches\n\n\n'
+        'def upgrade(db):\n'
+        '    run_in_batches(db, "meal", "id_meal",\n'
+        '                   "UPDATE meal SET note = information WHERE id_meal > ? AND id_meal <= ?", 1)\n'
+    )
+    (tmp_path / 'README').write_text('not a migration')
+    return str(tmp_path)
+
+
+def test_find_migrations(migrations):
+    found = migrate.find_migrations(migrations)
+    assert [(version, name) for version, name, _ in found] == [(1, 'note'), (2, 'backfill')]
+
+
+def test_upgrade(app, migrations):
+    with app.app_context():
+        db = get_db()
+        db.execute(
+            'INSERT INTO meal (id_user, id_menu, id_tray, id_candidate, start, information, actif) '
+            'VALUES (1, 1, 2, 4, datetime("now"), "second meal", 1)'
+        )
+        db.commit()
+
+        steps = list(migrate.upgrade(db, path=migrations))
+        assert [step[:2] for step in steps] == [(1, 'note'), (2, 'backfill')]
+        assert all(step[2] >= 0 for step in steps)
+        assert migrate.current_version(db) == 2
+
+        meals = db.execute('SELECT information, note FROM meal ORDER BY id_meal').fetchall()
+        assert [(m['information'], m['note']) for m in meals] == [
+            ('information about Super-Meal', 'information about Super-Meal'),
+            ('second meal', 'second meal'),
+        ]
+        assert list(migrate.upgrade(db, path=migrations)) == []
+
+
+def test_upgrade_target(app, migrations):
+    with app.app_context():
+        db = get_db()
+        assert [step[0] for step in migrate.upgrade(db, 1, migrations)] == [1]
+        assert migrate.current_version(db) == 1
+        assert [step[0] for step in migrate.upgrade(db, path=migrations)] == [2]
+
+
+def test_upgrade_failure(app, migrations, tmp_path):
+    (tmp_path / '0003_broken.sql').write_text(
+        'CREATE TABLE broken (id INTEGER);\n'
+        'INSERT INTO missing VALUES (1);\n'
+    )
+    with app.app_context():
+        db = get_db()
+        with pytest.raises(sqlite3.OperationalError):
+            list(migrate.upgrade(db, path=migrations))
+
+        assert migrate.current_version(db) == 2
+        assert db.execute(
+            'SELECT name FROM sqlite_master WHERE name = "broken"'
+        ).fetchone() is None
+
+
+def test_duplicate_version(tmp_path):
+    (tmp_path / '0001_a.sql').write_text('')
+    (tmp_path / '0001_b.sql').write_text('')
+    with pytest.raises(RuntimeError):
+        migrate.find_migrations(str(tmp_path))
+
+
+def test_upgrade_command(runner, monkeypatch, migrations):
+    monkeypatch.setattr('lsg_web.migrate.MIGRATIONS', migrations)
+    result = runner.invoke(args=['db', 'upgrade'])
+    assert 'Applied 0001_note in' in result.output
+    assert 'Applied 0002_backfill in' in result.output
+    assert 'Database is at version 2.' in result.output
+
+    result = runner.invoke(args=['db', 'upgrade'])
+    assert 'Applied' not in result.output
+
+
+def test_duplicate_tray_names(app, runner, monkeypatch, tmp_path):
+    shutil.copy(os.path.join(migrate.MIGRATIONS, '0001_indexes.py'), str(tmp_path))
+    monkeypatch.setattr('lsg_web.migrate.MIGRATIONS', str(tmp_path))
+    with app.app_context():
+        db = get_db()
+        db.executescript('DROP TABLE schema_version; DROP INDEX tray_name;')
+        db.execute(
+            'INSERT INTO tray (name, id_version, information, ip, online, actif, on_use, timestamp) '
+            'VALUES ("Super-Tray", 1, "copy", "", 0, 1, 0, datetime("now"))'
+        )
+        db.commit()
+
+    result = runner.invoke(args=['db', 'upgrade'])
+    assert result.exit_code == 1
+    assert "'Super-Tray' are registered more than once" in result.output
+    with app.app_context():
+        assert migrate.current_version(get_db()) == 0
+
+        get_db().execute('UPDATE tray SET name = "Super-Tray III" WHERE information = "copy"')
+        get_db().commit()
+    assert 'Applied 0001_indexes in' in runner.invoke(args=['db', 'upgrade']).output
@@ -0,0 +1,104 @@
+import time
+
+import pytest
+from lsg_web import create_app
+from lsg_web.db import close_pool, get_db
+from lsg_web.outbox import enqueue, get_publisher
+
+
+@pytest.fixture
+def publisher(app, broker):
+    app.config.update({
+        'MQTT_PUBLISHER_ENABLED': True,
+        'MQTT_BROKER_URL': '127.0.0.1',
+        'MQTT_BROKER_PORT': broker.port,
+        'MQTT_ACK_TIMEOUT': 0.5,
+        'MQTT_RETRY_INTERVAL': 0.1,
+    })
+    with app.app_context():
+        publisher = get_publisher()
+    yield publisher
+    publisher.stop()
+
+
+def outbox(app):
+    with app.app_context():
+        return get_db().execute('SELECT topic, payload, attempts FROM outbox ORDER BY id_message').fetchall()
+
+
+def wait_for_empty_outbox(app, timeout=5):
+    deadline = time.monotonic() + timeout
+    while outbox(app) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return not outbox(app)
+
+
+def test_written_with_the_meal(client, auth, app):
+    auth.login()
+    client.post("/meal/create", data={"menu": "1", "person": "4", "tray": 1, "information": "created information"})
+    client.post('/meal/2/finished')
+
+    messages = [tuple(message) for message in outbox(app)]
+    assert messages == [
+        ('lsg/super-tray', 'SERVER\tSTART MEAL\t2.csv', 0),
+        ('lsg/super-tray', 'SERVER\tEND MEAL\t', 0),
+    ]
+
+
+def test_rolled_back_with_the_meal(app):
+    with app.app_context():
+        db = get_db()
+        enqueue(db, 'lsg/super-tray', 'SERVER\tEND MEAL\t')
+        db.rollback()
+
+    assert outbox(app) == []
+
+
+def test_left_over_delivered_with_the_first_request(app, broker):
+    with app.app_context():
+        db = get_db()
+        enqueue(db, 'lsg/super-tray', 'SERVER\tEND MEAL\t')
+        db.commit()
+
+    other = create_app({
+        'TESTING': True, 'DATABASE': app.config['DATABASE'], 'MQTT_BROKER_URL': '127.0.0.1',
+        'MQTT_BROKER_PORT': broker.port, 'MQTT_RETRY_INTERVAL': 0.1,
+    })
+    try:
+        # not by the commands of the command line, which serve no request
+        assert 'lsg_publisher' not in other.extensions
+        other.test_client().get('/auth/login')
+        assert broker.wait_for(1)
+        assert wait_for_empty_outbox(app)
+    finally:
+        other.extensions['lsg_publisher'].stop()
+        close_pool(other)
+
+
+def test_delivered(client, auth, app, broker, publisher):
+    auth.login()
+    client.post("/meal/create", data={"menu": "1", "person": "4", "tray": 1, "information": "created information"})
+
+    assert broker.wait_for(1)
+    assert broker.messages == [('lsg/super-tray', b'SERVER\tSTART MEAL\t2.csv')]
+    assert wait_for_empty_outbox(app)
+
+
+def test_retried_until_acknowledged(client, auth, app, broker, publisher):
+    broker.drop_acks = 2
+    auth.login()
+    client.post('/meal/1/finished')
+
+    assert broker.wait_for(1)
+    assert broker.messages == [('lsg/super-tray', b'SERVER\tEND MEAL\t')]
+    assert wait_for_empty_outbox(app)
+
+
+def test_broker_down(app, publisher):
+    app.config['MQTT_BROKER_PORT'] = 1
+    with app.app_context():
+        enqueue(get_db(), 'lsg/super-tray', 'SERVER\tEND MEAL\t')
+        get_db().commit()
+
+    assert publisher.deliver() == 0
+    assert [tuple(message) for message in outbox(app)] == [('lsg/super-tray', 'SERVER\tEND MEAL\t', 0)]
\ No newline at end of file
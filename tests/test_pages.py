@@ -0,0 +1,73 @@
+import pytest
+from lsg_web.db import get_db
+
+
+@pytest.mark.parametrize('path', ('/category/list', '/version/list', '/menu/1/info', '/food/list', '/changelog'))
+def test_repeat_view(client, auth, sql, path):
+    auth.login()
+    first = client.get(path)
+    assert first.status_code == 200
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+    del sql[:]
+    second = client.get(path)
+    assert second.data == first.data
+    assert second.headers['ETag'] == first.headers['ETag']
+    assert len(sql[0]) == 1 and 'FROM counter' in sql[0][0]
+
+    response = client.get(path, headers={'If-None-Match': first.headers['ETag']})
+    assert response.status_code == 304
+    assert response.data == b''
+
+
+def test_write_changes_page(client, auth, app):
+    auth.login()
+    etag = client.get('/category/list').headers['ETag']
+    client.post('/category/create', data={'name': 'Soup'})
+    response = client.get('/category/list', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert b'Soup' in response.data
+
+    etag = client.get('/menu/1/info').headers['ETag']
+    client.put('/api/menus/1/composed', json={'composed': [{'id_food': 5, 'quantity': 80}]})
+    response = client.get('/menu/1/info', headers={'If-None-Match': etag})
+    assert b'Super-Dessert' in response.data
+    assert b'Super-Meat' not in response.data
+
+    etag = client.get('/menu/1/info').headers['ETag']
+    with app.app_context():
+        get_db().execute('UPDATE food SET name = "Dessert of the day" WHERE id_food = 5')
+        get_db().commit()
+    assert b'Dessert of the day' in client.get('/menu/1/info', headers={'If-None-Match': etag}).data
+
+
+def test_key(client, auth):
+    auth.login()
+    admin = client.get('/food/list')
+    assert client.get('/food/list?length=2').headers['ETag'] != admin.headers['ETag']
+    assert client.get('/menu/1/info').headers['ETag'] != admin.headers['ETag']
+    auth.logout()
+
+    auth.login(mail='simple@user.be')
+    response = client.get('/food/list', headers={'If-None-Match': admin.headers['ETag']})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != admin.headers['ETag']
+    assert b'Simple User' in response.data
+    assert b'Simple User' not in admin.data
+
+
+def test_open_meals_badge(client, auth):
+    auth.login()
+    etag = client.get('/changelog').headers['ETag']
+    client.post('/meal/create', data={'menu': '1', 'person': '4', 'tray': 2, 'information': 'created'})
+    assert client.get('/changelog', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_flashed_message_renders(client, auth, sql):
+    auth.login()
+    client.get('/category/list')
+    with client.session_transaction() as session:
+        session['_flashes'] = [('message', 'Something happened.')]
+    del sql[:]
+    response = client.get('/category/list')
+    assert 'ETag' not in response.headers
+    assert any('FROM category' in statement for statement in sql[0])
\ No newline at end of file
@@ -0,0 +1,74 @@
+import threading
+import time
+
+from lsg_web.db import get_db
+from lsg_web.presence import PresenceRegistry, get_presence
+
+
+def test_transitions():
+    registry = PresenceRegistry(ttl=30)
+    events = []
+    registry.subscribe(lambda name, online: events.append((name, online)))
+
+    registry.beat('Super-Tray', '10.0.0.1')
+    registry.beat('Super-Tray', '10.0.0.2')
+    assert registry.is_online('Super-Tray')
+    assert registry.snapshot()['Super-Tray']['ip'] == '10.0.0.2'
+    assert events == [('Super-Tray', True)]
+
+    registry.beat('Super-Tray', '10.0.0.2', time.time() - 60)
+    assert registry.snapshot()['Super-Tray']['ip'] == '10.0.0.2'
+    registry._trays['Super-Tray']['seen'] -= 60
+    assert not registry.is_online('Super-Tray')
+    assert events == [('Super-Tray', True), ('Super-Tray', False)]
+
+    registry.sweep()
+    assert len(events) == 2
+    assert not registry.is_online('Unknown')
+    registry.stop()
+
+
+def test_merge(client, auth, app):
+    with app.app_context():
+        db = get_db()
+        db.execute('UPDATE tray SET timestamp = datetime("now"), ip = "10.0.0.9", on_use = 1 WHERE id_tray = 2')
+        db.commit()
+
+    # written by another process, the heartbeat reaches the registry with the rows of the page
+    auth.login()
+    assert b'10.0.0.9' in client.get('/tray/list').data
+    with app.app_context():
+        presence = get_presence().snapshot()
+    assert not presence['Super-Tray']['online']
+    assert presence['Super-Tray II']['online']
+    assert presence['Super-Tray II']['ip'] == '10.0.0.9'
+    assert presence['Super-Tray II']['on_use'] == 1
+
+
+def test_expiry_published():
+    registry = PresenceRegistry(ttl=0.2)
+    events = []
+    offline = threading.Event()
+    registry.subscribe(lambda name, online: events.append((name, online)) or online or offline.set())
+
+    registry.beat('Super-Tray', '10.0.0.1')
+    registry.beat('Super-Tray II', '10.0.0.2', time.time() - 0.1)
+    # nobody reads the registry, its own thread publishes the expiries
+    assert offline.wait(5)
+    deadline = time.time() + 5
+    while len(events) < 4 and time.time() < deadline:
+        time.sleep(0.01)
+    registry.stop()
+    assert events == [('Super-Tray', True), ('Super-Tray II', True), ('Super-Tray II', False), ('Super-Tray', False)]
+
+
+def test_listing(client, auth):
+    client.post('/tray/connect', data={"name": "Super-Tray II", "ip": "10.0.0.7"})
+    auth.login()
+    response = client.get('/tray/list')
+    assert response.data.count(b'fa-unlink') == 1
+    assert response.data.count(b'fa-link"') == 1
+    assert b'10.0.0.7' in response.data
+
+    response = client.get('/meal/create')
+    assert response.data.index(b'>Super-Tray II<') < response.data.index(b'>Super-Tray (offline)<')
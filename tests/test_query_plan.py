@@ -0,0 +1,61 @@
+import ast
+import os
+import re
+
+import pytest
+import lsg_web
+from lsg_web.db import get_db
+
+PACKAGE = os.path.dirname(lsg_web.__file__)
+
+# statements whose purpose is to read every row of the scanned table
+EXPECTED_SCANS = {
+    ('SELECT * FROM food WHERE id_food NOT IN', 'food'),
+    ('SELECT * FROM person p LEFT JOIN user u', 'p'),
+}
+
+
+def blueprint_statements():
+    """Yield the location and text of the SQL given as a string literal to ``execute`` in the blueprints.
+
+    Only ``ast.Constant`` arguments are seen: the SQL built at run time, with
+    ``format``, concatenation or helpers such as ``Listing``, is not covered
+    by this test.
+    """
+    for filename in sorted(os.listdir(PACKAGE)):
+        if not filename.endswith('.py'):
+            continue
+        with open(os.path.join(PACKAGE, filename), encoding='utf8') as f:
+            source = f.read()
+        if 'Blueprint(' not in source and filename != '__init__.py':
+            continue
+        for node in ast.walk(ast.parse(source)):
+            if (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                    and node.func.attr == 'execute' and node.args
+                    and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str)):
+                yield '{0}:{1}'.format(filename, node.lineno), node.args[0].value
+
+
+def unexpected_scans(sql, plan):
+    scans = []
+    for row in plan:
+        match = re.match(r'SCAN (\w+)$', row['detail'])
+        if match is None or match.group(1) == 'CONSTANT':
+            continue
+        if ' WHERE ' not in sql.upper():
+            continue
+        if any(sql.startswith(prefix) and match.group(1) == table for prefix, table in EXPECTED_SCANS):
+            continue
+        scans.append(row['detail'])
+    return scans
+
+
+@pytest.mark.parametrize('location, sql', list(blueprint_statements()))
+def test_query_plan(app, location, sql):
+    names = re.findall(r'(?<!:):(\w+)', sql)
+    params = {name: None for name in names} if names else (None,) * sql.count('?')
+
+    with app.app_context():
+        plan = get_db().execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+
+    assert unexpected_scans(sql, plan) == [], location
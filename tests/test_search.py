@@ -0,0 +1,93 @@
+import pytest
+from lsg_web.db import get_db
+from lsg_web.search import match_query, rebuild_search
+
+
+def hits(client, **args):
+    return client.get('/search', query_string=args).get_json()['hits']
+
+
+def test_login_required(client):
+    assert client.get('/search?q=super').headers['Location'] == 'http://localhost/auth/login'
+
+
+@pytest.mark.parametrize(('text', 'query'), (
+    ('', None),
+    ('  "* ', None),
+    ('super', '"super"*'),
+    ('Super-Water "OR" (x', '"Super" "Water" "OR" "x"*'),
+))
+def test_match_query(text, query):
+    assert match_query(text) == query
+
+
+def test_search(client, auth):
+    auth.login()
+    found = hits(client, q='information super-meat')
+    assert found[0] == {
+        'kind': 'food', 'id': 2, 'title': 'Super-Meat',
+        'snippet': '<mark>information</mark> <mark>Super</mark>-<mark>Meat</mark>', 'url': '/food/2/update',
+    }
+    assert {(hit['kind'], hit['id']) for hit in hits(client, q='about')} == {('menu', 1), ('bug', 1), ('meal', 1)}
+    assert hits(client, q='about', kind='meal') == [{
+        'kind': 'meal', 'id': 1, 'title': 'Meal 1',
+        'snippet': 'information <mark>about</mark> Super-Meal', 'url': '/meal/1/info',
+    }]
+    # the last word is a prefix
+    assert [hit['id'] for hit in hits(client, q='super-veg')] == [3]
+    assert hits(client, q='') == []
+
+
+def test_title_ranks_first(client, auth, app):
+    with app.app_context():
+        db = get_db()
+        db.execute('INSERT INTO food (name, id_category, information, id_person) VALUES ("Pasta", 4, "no sauce", 1)')
+        db.execute('INSERT INTO food (name, id_category, information, id_person) VALUES ("Sauce", 4, "tomato", 1)')
+        db.commit()
+    auth.login()
+    assert [hit['title'] for hit in hits(client, q='sauce')] == ['Sauce', 'Pasta']
+
+
+def test_snippet_escaped(client, auth, app):
+    with app.app_context():
+        db = get_db()
+        db.execute('UPDATE food SET information = "<b>hot</b> & spicy" WHERE id_food = 1')
+        db.commit()
+    auth.login()
+    assert hits(client, q='spicy')[0]['snippet'] == '&lt;b&gt;hot&lt;/b&gt; &amp; <mark>spicy</mark>'
+
+
+def test_kept_in_sync(client, auth, app):
+    auth.login()
+    client.post('/menu/1/delete')
+    assert hits(client, q='super-menu') == []
+
+    with app.app_context():
+        db = get_db()
+        db.execute('UPDATE food SET name = "Mega-Water" WHERE id_food = 1')
+        db.execute('DELETE FROM bug')
+        db.commit()
+    assert [hit['title'] for hit in hits(client, q='water')] == ['Mega-Water']
+    assert hits(client, q='super-bug') == []
+
+
+def test_limit(client, auth, app):
+    app.config['SEARCH_MAX_HITS'] = 2
+    auth.login()
+    assert len(hits(client, q='super')) == 2
+    assert len(hits(client, q='super', limit=1)) == 1
+
+
+def test_rebuild(client, auth, app, runner):
+    with app.app_context():
+        db = get_db()
+        db.execute('DELETE FROM search')
+        db.commit()
+    auth.login()
+    assert hits(client, q='super') == []
+
+    result = runner.invoke(args=['lsg', 'rebuild-search'])
+    assert 'Indexed 8 entries.' in result.output
+    assert len(hits(client, q='super', kind='food')) == 5
+    with app.app_context():
+        assert rebuild_search(get_db()) == 8
\ No newline at end of file
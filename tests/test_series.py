@@ -0,0 +1,133 @@
+import gzip
+import io
+import os
+import time
+
+import pytest
+from lsg_web.ingest import TelemetryIngestor
+from lsg_web.recording import compress_recording, uncompressed_size
+from lsg_web.series import Series, build_series, load_series, parse_csv, series_path, write_series
+
+
+def test_parse_csv():
+    names, columns = parse_csv(b"time,left,right\r\n0,500.5,300\r\n1,499,299.5\r\n")
+    assert names == ['time', 'left', 'right']
+    assert [list(column) for column in columns] == [[0, 1], [500.5, 499], [300, 299.5]]
+
+    names, columns = parse_csv(b"0;500\n1;499\n")
+    assert names == ['timestamp', 'sensor1']
+    assert list(columns[1]) == [500, 499]
+
+
+@pytest.mark.parametrize('data', (b"", b"abcdef", b"0,500\n1\n", b"0\n1\n", b"0,500\n1,abc\n"))
+def test_parse_csv_validate(data):
+    with pytest.raises(ValueError):
+        parse_csv(data)
+
+
+def test_load(tmp_path):
+    (tmp_path / '3.csv').write_bytes(b"time,left\n0,500\n1,499\n2,498\n")
+    with load_series(str(tmp_path), 3) as series:
+        assert series.names == ['time', 'left']
+        assert len(series) == 3
+        assert series.timestamps.tolist() == [0, 1, 2]
+        assert series.weights['left'].tolist() == [500, 499, 498]
+        assert series.timestamps.readonly
+
+    # the series follows a newer CSV
+    later = time.time() + 10
+    (tmp_path / '3.csv').write_bytes(b"time,left\n0,400\n")
+    os.utime(str(tmp_path / '3.csv'), (later, later))
+    with load_series(str(tmp_path), 3) as series:
+        assert series.weights['left'].tolist() == [400]
+
+
+def test_write_series_validate(tmp_path):
+    from array import array
+    path = str(tmp_path / '1.series')
+    with pytest.raises(ValueError):
+        write_series(path, ['time', 'left'], [array('d', [0, 1]), array('d', [500])])
+    assert os.listdir(str(tmp_path)) == []
+
+    (tmp_path / '2.series').write_bytes(b"not a series file")
+    with pytest.raises(ValueError):
+        Series(str(tmp_path / '2.series'))
+
+
+def test_built_on_upload(client, app, tmp_path):
+    app.config['DATA_UPLOADS'] = str(tmp_path)
+    client.post('/tray/data', content_type='multipart/form-data', data={
+        'image': (io.BytesIO(b"abcdef"), '7.jpg'), 'data': (io.BytesIO(b"0,500\n1,499\n"), '7.csv')
+    })
+    with Series(series_path(str(tmp_path), 7)) as series:
+        assert series.weights['sensor1'].tolist() == [500, 499]
+
+
+def test_build_command(runner, app, tmp_path):
+    app.config['DATA_UPLOADS'] = str(tmp_path)
+    (tmp_path / '1.csv').write_bytes(b"0,500\n1,499\n")
+    (tmp_path / '2.csv').write_bytes(b"abcdef")
+    result = runner.invoke(args=['lsg', 'build-series'])
+    assert 'Meal 1: 2 rows.' in result.output
+    assert 'Meal 2: ' in result.output
+    assert os.path.exists(series_path(str(tmp_path), 1))
+    assert build_series(str(tmp_path), 1) == 2
+
+
+def test_compress_command(runner, app, client, auth):
+    folder = app.config['DATA_UPLOADS']
+    with open(os.path.join(folder, '2.csv'), 'w') as f:
+        f.write('0,500\n' * 100)
+    auth.login()
+    client.post("/meal/create", data={"menu": "1", "person": "4", "tray": 1, "information": "created information"})
+
+    result = runner.invoke(args=['lsg', 'compress'])
+    assert 'Compressed 1.csv.' in result.output
+    assert '2.csv' not in result.output
+    assert sorted(os.listdir(folder)) == ['1.csv.gz', '1.csv.gz.size', '2.csv']
+    with load_series(folder, 2) as series:
+        assert len(series) == 100
+
+
+def test_compress_ingest_compress(runner, app, client, auth):
+    folder = app.config['DATA_UPLOADS']
+    upload = b'0,500\n1,499\n'
+    with open(os.path.join(folder, '1.csv'), 'wb') as f:
+        f.write(upload)
+    runner.invoke(args=['lsg', 'compress'])
+
+    # rows of the meal still received after its upload was compressed
+    ingestor = TelemetryIngestor(app, 0.1)
+    ingestor.handle('lsg/super-tray', b'Super-Tray\tDATA\t1.csv\n2,498\n')
+    with app.app_context():
+        ingestor.flush()
+    assert sorted(name for name in os.listdir(folder) if name.startswith('1.')) == ['1.csv', '1.csv.gz', '1.csv.gz.size']
+    with load_series(folder, 1) as series:
+        assert list(series.timestamps) == [0, 1, 2]
+    auth.login()
+    assert client.get('/meal/1/download').data == upload + b'2,498\n'
+
+    runner.invoke(args=['lsg', 'compress'])
+    assert not os.path.exists(os.path.join(folder, '1.csv'))
+    with open(os.path.join(folder, '1.csv.gz'), 'rb') as f:
+        assert gzip.decompress(f.read()) == upload + b'2,498\n'
+    assert client.get('/meal/1/download').data == upload + b'2,498\n'
+
+
+def test_uncompressed_size(tmp_path):
+    path = str(tmp_path / '1.csv')
+    with open(path, 'wb') as f:
+        f.write(b'0,500\n' * 100)
+    target = compress_recording(path)
+    with open(target + '.size') as f:
+        assert f.read().split() == ['600', str(os.path.getsize(target))]
+
+    # not the trailer, which wraps past 4 GiB
+    with open(target + '.size', 'w') as f:
+        f.write('{0} {1}'.format(2 ** 32 + 600, os.path.getsize(target)))
+    assert uncompressed_size(target) == 2 ** 32 + 600
+
+    # compressed before the sizes were kept
+    os.unlink(target + '.size')
+    assert uncompressed_size(target) == 600
+    assert os.path.exists(target + '.size')
\ No newline at end of file
@@ -1,6 +1,11 @@
 import pytest
 from lsg_web.db import get_db
+from lsg_web.heartbeat import get_heartbeats
+import gzip
+import hashlib
 import io
+import os
+import sqlite3
 
 
 def test_listing(client, auth):
@@ -105,6 +110,54 @@ def test_connect(client, app):
         assert tray['ip'] == "192.168.1.1"
 
 
+def test_connect_coalesced(client, app, query_budget):
+    app.config['TRAY_HEARTBEAT_INTERVAL'] = 3600
+    client.post('/tray/connect', data={"name": "Super-Tray", "ip": "10.0.0.1"})
+    # heartbeats of a known tray do not touch the database
+    with query_budget(0):
+        for ip in ("10.0.0.2", "10.0.0.3"):
+            assert client.post('/tray/connect', data={"name": "Super-Tray", "ip": ip}).status_code == 200
+    client.post('/tray/connect', data={"name": "Super-Tray II", "ip": "10.0.0.4"})
+
+    with app.app_context():
+        db = get_db()
+        assert db.execute('SELECT count(id_tray) FROM tray WHERE online = 1').fetchone()[0] == 0
+        assert get_heartbeats().flush() == 2
+        assert get_heartbeats().flush() == 0
+        trays = db.execute('SELECT * FROM tray ORDER BY id_tray').fetchall()
+        assert [(t['online'], t['ip']) for t in trays] == [(1, "10.0.0.3"), (1, "10.0.0.4")]
+
+    # once the names expired, the heartbeats written do not make the trays unknown
+    with app.app_context():
+        get_heartbeats().ttl = 0
+    with query_budget(1):
+        assert client.post('/tray/connect', data={"name": "Super-Tray", "ip": "10.0.0.5"}).status_code == 200
+
+
+def test_connect_renamed(client, auth, app):
+    app.config['TRAY_HEARTBEAT_INTERVAL'] = 0
+    assert client.post('/tray/connect', data={"name": "Super-Tray", "ip": "10.0.0.1"}).status_code == 200
+    auth.login()
+    client.post('/tray/1/update', data={"name": "Renamed", "version": "1", "information": "information", "actif": 1})
+    assert client.post('/tray/connect', data={"name": "Super-Tray", "ip": "10.0.0.1"}).status_code == 400
+    assert client.post('/tray/connect', data={"name": "Renamed", "ip": "10.0.0.1"}).status_code == 200
+
+
+def test_connect_renamed_elsewhere(client, app):
+    app.config['TRAY_HEARTBEAT_INTERVAL'] = 0
+    app.config['TRAY_NAMES_TTL'] = 0
+    assert client.post('/tray/connect', data={"name": "Super-Tray", "ip": "10.0.0.1"}).status_code == 200
+
+    # as another worker would, with its own connection
+    db = sqlite3.connect(app.config['DATABASE'])
+    db.execute("UPDATE tray SET name = 'Renamed' WHERE id_tray = 1")
+    db.commit()
+    db.close()
+
+    assert client.post('/tray/connect', data={"name": "Super-Tray", "ip": "10.0.0.1"}).status_code == 400
+    assert client.post('/tray/connect', data={"name": "Renamed", "ip": "10.0.0.1"}).status_code == 200
+
+
 def test_connect_validate(client):
     response = client.post('/tray/connect', data={"name": "Super-Mag II", "ip": "192.168.1.1"})
     assert response.status_code == 400
@@ -164,3 +217,91 @@ def test_data_validate(client):
     data['data'] = (io.BytesIO(b"abcdef"), '1.zc')
     response = client.post('/tray/data', data=data, follow_redirects=True, content_type='multipart/form-data')
     assert response.status_code == 404
+
+
+def upload(client, **extra):
+    data = {'image': (io.BytesIO(b"abcdef"), 'test.jpg'), 'data': (io.BytesIO(b"1,500\n2,499\n"), '7.csv')}
+    data.update(extra)
+    return client.post('/tray/data', data=data, content_type='multipart/form-data')
+
+
+def test_data_streamed(client, app, tmp_path):
+    app.config['DATA_UPLOADS'] = str(tmp_path)
+    response = upload(client, data_sha256=hashlib.sha256(b"1,500\n2,499\n").hexdigest())
+    assert response.status_code == 200
+    assert response.get_json()['data_sha256'] == hashlib.sha256(b"1,500\n2,499\n").hexdigest()
+    assert response.get_json()['image_sha256'] == hashlib.sha256(b"abcdef").hexdigest()
+    assert sorted(os.listdir(str(tmp_path))) == ['7.csv.gz', '7.csv.gz.size', '7.series', 'test.jpg']
+    assert gzip.decompress((tmp_path / '7.csv.gz').read_bytes()) == b"1,500\n2,499\n"
+
+
+def test_data_too_large(client, app, tmp_path):
+    app.config['DATA_UPLOADS'] = str(tmp_path)
+    app.config['UPLOAD_MAX_FILE_SIZE'] = 8
+    assert upload(client).status_code == 413
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_data_checksum_mismatch(client, app, tmp_path):
+    app.config['DATA_UPLOADS'] = str(tmp_path)
+    response = upload(client, data_sha256=hashlib.sha256(b"1,500\n").hexdigest())
+    assert response.status_code == 404
+    assert b'Checksum mismatch for 7.csv' in response.data
+    assert os.listdir(str(tmp_path)) == []
+
+
+def put_chunk(client, number, offset, data):
+    return client.put('/tray/upload/1/{0}?offset={1}'.format(number, offset), data=data)
+
+
+def test_chunked_upload(client, app, tmp_path):
+    app.config['DATA_UPLOADS'] = str(tmp_path)
+    assert client.post('/tray/upload/1').get_json() == {'id': 1, 'offset': 0, 'chunks': 0}
+    assert put_chunk(client, 1, 0, b"1,500\n").get_json()['offset'] == 6
+    assert put_chunk(client, 3, 12, b"3,498\n").get_json()['offset'] == 6
+    assert client.get('/tray/upload/1').get_json() == {'id': 1, 'offset': 6, 'chunks': 2}
+    assert put_chunk(client, 2, 6, b"2,499\n").get_json()['offset'] == 18
+
+    response = client.post('/tray/upload/1/finish', data={'sha256': hashlib.sha256(b"1,500\n2,499\n3,498\n").hexdigest()})
+    assert response.get_json()['size'] == 18
+    assert gzip.decompress((tmp_path / '1.csv.gz').read_bytes()) == b"1,500\n2,499\n3,498\n"
+    assert sorted(os.listdir(str(tmp_path))) == ['1.csv.gz', '1.csv.gz.size', '1.series']
+    assert client.get('/tray/upload/1').status_code == 404
+
+
+def test_chunk_retransmitted(client, app, tmp_path, monkeypatch):
+    app.config['DATA_UPLOADS'] = str(tmp_path)
+    writes = []
+    monkeypatch.setattr('lsg_web.tray.write_at', lambda *args: writes.append(args) or args[3])
+    client.post('/tray/upload/1')
+    put_chunk(client, 1, 0, b"1,500\n")
+    assert put_chunk(client, 1, 0, b"1,500\n").get_json()['offset'] == 6
+    assert len(writes) == 1
+
+
+def test_finish_without_chunks(client, app, tmp_path):
+    app.config['DATA_UPLOADS'] = str(tmp_path)
+    (tmp_path / '1.csv.gz').write_bytes(gzip.compress(b"1,500\n"))
+    client.post('/tray/upload/1')
+    assert client.post('/tray/upload/1/finish').status_code == 409
+    assert gzip.decompress((tmp_path / '1.csv.gz').read_bytes()) == b"1,500\n"
+    assert client.get('/tray/upload/1').get_json()['chunks'] == 0
+
+
+def test_chunked_upload_validate(client, app, tmp_path):
+    app.config['DATA_UPLOADS'] = str(tmp_path)
+    assert client.post('/tray/upload/25').status_code == 404
+    assert put_chunk(client, 1, 0, b"1,500\n").status_code == 404
+    assert client.post('/tray/upload/1/finish').status_code == 404
+
+    client.post('/tray/upload/1')
+    put_chunk(client, 1, 0, b"1,500\n")
+    assert client.put('/tray/upload/1/2', data=b"2,499\n").status_code == 400
+    assert put_chunk(client, 1, 6, b"1,500\n").status_code == 409
+    assert put_chunk(client, 2, 3, b"2,499\n").status_code == 409
+    put_chunk(client, 3, 12, b"3,498\n")
+    assert client.post('/tray/upload/1/finish').status_code == 409
+    put_chunk(client, 2, 6, b"2,499\n")
+    assert client.post('/tray/upload/1/finish', data={'sha256': 'abc'}).status_code == 409
+    app.config['UPLOAD_MAX_FILE_SIZE'] = 20
+    assert put_chunk(client, 4, 18, b"4,497\n").status_code == 413
\ No newline at end of file